@@ -0,0 +1,13 @@
+"""Benchmarks and self-checks, run with `python manage.py bench --<name> N`; see the README.
+Each module has a `run` function that takes the size of the run. The ones that drive fakes (a fake channel, a fake
+clock, a fake Discord) also check the results, with `check` rather than assert, so that the checks still run under
+`python -O`; a failed check makes `manage.py bench` exit non-zero."""
+
+
+class CheckFailed(Exception):
+    """Raised by `check`; the message says what was wrong."""
+
+
+def check(condition: bool, message: str) -> None:
+    if not condition:
+        raise CheckFailed(message)
@@ -0,0 +1,74 @@
+"""The job supervisor on a fake clock: alignment, jitter, backoff and leader_only jobs."""
+import asyncio
+import datetime
+import logging
+import time
+
+from benchmarks import check
+from internal.jobs import FakeClock, Job, JobSupervisor
+from utils.timezone import BOT_TZ
+
+
+def run(days: int) -> None:
+    """Drives the job supervisor through `days` days on a fake clock, and checks that aligned jobs run on the hour
+    they are aligned to, jitter stays within its fraction of the interval, failing jobs back off exponentially up to
+    their cap, and leader_only jobs only run while the process is the leader."""
+    logging.getLogger("internal.jobs").setLevel(logging.CRITICAL)    # the failing job fails on purpose
+    start = float(int(time.time()))
+    end = start + days * 86400
+    handover = start + days * 86400 / 2    # the process stops being the leader halfway through
+    runs = {name: [] for name in ("aligned", "jittered", "failing", "leader")}
+
+    def recorder(name, fail=False):
+        async def func():
+            runs[name].append(clock.time())
+            if fail:
+                raise RuntimeError("failing on purpose")
+        return func
+
+    async def main():
+        leader = True
+        supervisor = JobSupervisor(asyncio.get_running_loop(), clock)
+        supervisor.is_leader = lambda: leader
+        aligned = supervisor.add(Job("aligned", recorder("aligned"), interval=3 * 3600, align=True, tz=BOT_TZ))
+        jittered = supervisor.add(Job("jittered", recorder("jittered"), interval=600, jitter=0.1))
+        failing = supervisor.add(Job("failing", recorder("failing", fail=True), interval=60, min_backoff=5, max_backoff=80))
+        leader_job = supervisor.add(Job("leader", recorder("leader"), interval=60, leader_only=True))
+        supervisor.start()
+        await clock.run_until(handover)
+        leader = False
+        await clock.run_until(end)
+        supervisor.stop()
+        await clock.settle()
+        return aligned, jittered, failing, leader_job
+
+    clock = FakeClock(start)
+    started = time.perf_counter()
+    aligned, jittered, failing, leader_job = asyncio.run(main())
+    elapsed = time.perf_counter() - started
+
+    for moment in runs["aligned"]:
+        local = datetime.datetime.fromtimestamp(moment, BOT_TZ)
+        check(local.hour % 3 == 0 and (local.minute, local.second, local.microsecond) == (0, 0, 0), f"aligned run at {local}")
+    check(len(runs["aligned"]) in (days * 8, days * 8 + 1), f"{len(runs['aligned'])} aligned runs in {days} days")
+
+    gaps = [b - a for a, b in zip(runs["jittered"], runs["jittered"][1:])]
+    check(runs["jittered"][0] == start, "an unaligned job didn't run as soon as it started")
+    check(all(540 - 1e-6 <= gap <= 660 + 1e-6 for gap in gaps), "jitter outside 10% of the interval")
+    check(len(set(gaps)) > 1, "no jitter applied")
+
+    for failures, (a, b) in enumerate(zip(runs["failing"], runs["failing"][1:]), 1):
+        backoff = min(5 * 2 ** (failures - 1), 80)
+        check(backoff / 2 - 1e-6 <= b - a <= backoff + 1e-6, f"retry {failures} after {b - a:.1f}s, backoff is {backoff}s")
+    check(failing.consecutive_failures == len(runs["failing"]) and failing.runs == failing.failures,
+          f"{failing.runs} runs and {failing.failures} failures counted for {len(runs['failing'])} failed attempts")
+
+    check(runs["leader"] and all(moment <= handover for moment in runs["leader"]), "a leader_only job ran without being the leader")
+    check(leader_job.skipped >= days * 1440 / 2 - 1, f"only {leader_job.skipped} runs skipped after losing leadership")
+
+    print(f"{days} simulated days in {elapsed:.2f}s:")
+    for job in (aligned, jittered, failing, leader_job):
+        skipped = f", {job.skipped} skipped (not leader)" if job.skipped else ""
+        print(f"  {job.name}: {job.runs} runs, {job.failures} failed{skipped}")
+    print(f"Aligned runs on the hour, jitter within 10%, backoff doubling up to {failing.max_backoff}s, and leader_only "
+          f"runs stopped at the handover: all checked.")
@@ -0,0 +1,69 @@
+"""How long commands take to decide between replying and sending, and that they decide right."""
+import asyncio
+import itertools
+import random
+import time
+from types import SimpleNamespace
+
+from benchmarks import check
+from internal.context import CrajyContext
+from internal.stats import Histogram
+
+
+def run(commands: int) -> None:
+    """Runs `commands` simulated commands through CrajyContext.maybe_reply, against the sleep-and-compare it used to do,
+    and reports how long each takes to respond. In about a third of them another message arrives before the command
+    responds; each response is checked to be a reply exactly when the channel's newest message isn't the command's."""
+    buckets = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.06, 0.1, 0.5)
+    ids = itertools.count(1)
+    bot = SimpleNamespace(last_message_ids={})
+    channels = [SimpleNamespace(id=next(ids), last_message=None, history=[]) for _ in range(50)]
+
+    def receive(channel):
+        """A message arriving from the gateway; the bot records it as the channel's newest, like CrajyBot.dispatch."""
+        message = SimpleNamespace(id=next(ids), channel=channel)
+        channel.history.append(message)
+        bot.last_message_ids[channel.id] = message.id
+        channel.last_message = message
+        return message
+
+    def context(channel, message, responses):
+        async def reply(content=None, **kwargs):
+            responses.append((channel.history[-1] is not message, "reply"))
+
+        async def send(content=None, **kwargs):
+            responses.append((channel.history[-1] is not message, "send"))
+        return SimpleNamespace(bot=bot, channel=channel, message=message, reply=reply, send=send)
+
+    async def sleep_and_compare(ctx, content=None, mention_author=False, **kwargs):
+        """maybe_reply as it was: wait for the channel's cache to catch up, then compare its last message."""
+        await asyncio.sleep(0.05)
+        if getattr(ctx.channel, "last_message", False) != ctx.message:
+            return await ctx.reply(content, mention_author=mention_author, **kwargs)
+        return await ctx.send(content, **kwargs)
+
+    async def command(maybe_reply, timings, interleaved):
+        channel = random.choice(channels)
+        message = receive(channel)
+        responses = []
+        ctx = context(channel, message, responses)
+        if interleaved:
+            receive(channel)
+        start = time.perf_counter()
+        await maybe_reply(ctx, "pong")
+        timings.observe(time.perf_counter() - start)
+        (between, response), = responses
+        check(response == ("reply" if between else "send"), f"{response} with{'' if between else ' no'} message in between")
+        return between
+
+    async def run(maybe_reply):
+        timings = Histogram(buckets)
+        interleaved = [random.random() < 1 / 3 for _ in range(commands)]
+        start = time.perf_counter()
+        replies = sum(await asyncio.gather(*(command(maybe_reply, timings, i) for i in interleaved)))
+        return timings, time.perf_counter() - start, replies
+
+    for name, maybe_reply in (("maybe_reply", CrajyContext.maybe_reply), ("sleep and compare", sleep_and_compare)):
+        timings, elapsed, replies = asyncio.run(run(maybe_reply))
+        print(f"{name}: {commands} commands in {elapsed * 1000:.0f}ms, {replies} replies and {commands - replies} sends, all correct")
+        print(f"  time to respond: {timings.summary('µs', 1e6)}")
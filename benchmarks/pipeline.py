@@ -0,0 +1,78 @@
+"""Message throughput through the message pipeline, against one listener per handler."""
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from internal.pipeline import MessagePipeline, Stage
+
+
+def run(messages: int) -> None:
+    """Measures message throughput on synthetic chat through the message pipeline, with stages like the bot's, and
+    through one listener per handler, each scheduled as a task and checking the message itself (what on_message
+    listeners do)."""
+    words = "gg who is the impostor what is the code again lol 100 usd server is asia vent sus rs".split()
+    game_channels = {1, 2}
+    money_channels = frozenset({3})
+    channels = [SimpleNamespace(id=i) for i in range(1, 21)]
+    guild = SimpleNamespace(id=1)
+    users = [SimpleNamespace(id=i, bot=False) for i in range(50)] + [SimpleNamespace(id=99, bot=True)]
+    traffic = [SimpleNamespace(author=random.choice(users), channel=random.choice(channels), guild=guild,
+                               content=random.choice(("", ".")) + " ".join(random.choices(words, k=random.randint(1, 30))))
+               for _ in range(messages)]
+
+    async def noop(*args):
+        pass
+
+    async def get_prefix(message):
+        return ["<@1> ", "<@!1> ", "."]
+
+    async def listener_commands(message):
+        if message.author.bot:
+            return
+        prefix = next((p for p in await get_prefix(message) if message.content.startswith(p)), None)
+        if prefix is not None:
+            await noop()
+
+    async def listener_money(message):
+        if message.author.bot or message.guild is None:
+            return
+        if message.channel.id in money_channels:
+            await noop()
+
+    async def listener_currency(message):
+        if message.author.bot:
+            return
+        splitted = message.content.lower().replace("rs", "inr").split()
+        if any(word in ("usd", "omr", "inr", "eur") for word in splitted):
+            await noop()
+
+    async def listener_amongus(message):
+        if message.channel.id in game_channels and not message.author.bot and \
+                ("code" in message.content.lower() or "server" in message.content.lower()):
+            await noop()
+
+    async def main():
+        pipeline = MessagePipeline(get_prefix)
+        pipeline.add(Stage("commands", noop, commands=True))
+        pipeline.add(Stage("chat-money", noop, guild_only=True, channels=lambda message: money_channels))
+        pipeline.add(Stage("currency", noop, commands=False, keywords=frozenset(("usd", "omr", "inr", "eur", "rs"))))
+        pipeline.add(Stage("amongus", noop, channels=game_channels, keywords=frozenset(("code", "server"))))
+
+        start = time.perf_counter()
+        for message in traffic:
+            await asyncio.gather(*await pipeline.process(message))
+        piped = time.perf_counter() - start
+
+        listeners = (listener_commands, listener_money, listener_currency, listener_amongus)
+        start = time.perf_counter()
+        for message in traffic:
+            await asyncio.gather(*(asyncio.ensure_future(listener(message)) for listener in listeners))
+        listened = time.perf_counter() - start
+
+        print(f"pipeline: {messages / piped:.0f} messages/s, {pipeline.stats['scheduled'] / messages:.2f} stage tasks per message")
+        for name, stage in pipeline.stages.items():
+            print(f"  {name}: {stage.summary()}")
+        print(f"listeners: {messages / listened:.0f} messages/s, {len(listeners)} tasks per message ({listened / piped:.1f}x slower)")
+
+    asyncio.run(main())
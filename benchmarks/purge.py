@@ -0,0 +1,76 @@
+"""`.clear` on a fake channel: the requests it takes, and that it deletes exactly the matching messages."""
+import asyncio
+import bisect
+import datetime
+import random
+import time
+from types import SimpleNamespace
+
+from benchmarks import check
+from internal.jobs import FakeClock
+from internal.purge import BULK_LIMIT, Purge, PurgeFilter
+
+
+def run(messages: int) -> None:
+    """Clears a fake channel of `messages` messages, a third of them older than 14 days, with a filter; checks that
+    exactly the matching messages were deleted, and counts the requests it took."""
+    class FakeMessage(SimpleNamespace):
+        async def delete(self):
+            channel.delete(self)
+            channel.single_requests += 1
+
+    class FakeChannel:
+        def __init__(self, clock):
+            now = datetime.datetime.utcfromtimestamp(clock.time())
+            span = datetime.timedelta(days=21)
+            authors = [SimpleNamespace(id=i, bot=i >= 45) for i in range(50)]
+            self.messages = [FakeMessage(id=i, author=random.choice(authors), attachments=[None] if random.random() < 0.1 else [],
+                                         content=random.choice(("hi", "buy cheap nitro now", "gg", "lol")),
+                                         created_at=now - span + span * i / messages) for i in range(messages)]    # oldest first
+            self.ids = [m.id for m in self.messages]
+            self.bulk_requests = self.single_requests = self.history_requests = 0
+            self.cutoff = now - datetime.timedelta(days=14)
+
+        def history(self, limit, before=None):
+            self.history_requests += 1
+            end = bisect.bisect_left(self.ids, before.id) if before is not None else len(self.ids)
+            page = self.messages[max(0, end - limit):end][::-1]
+
+            async def flatten():
+                return page
+            return SimpleNamespace(flatten=flatten)
+
+        def delete(self, message):
+            index = bisect.bisect_left(self.ids, message.id)
+            check(index < len(self.ids) and self.ids[index] == message.id, "deleted a message twice")
+            del self.ids[index], self.messages[index]
+
+        async def delete_messages(self, batch):
+            check(len(batch) <= BULK_LIMIT, "bulk delete of more than 100 messages")
+            check(all(m.created_at > self.cutoff for m in batch), "bulk delete of a message older than 14 days")
+            self.bulk_requests += 1
+            for message in batch:
+                self.delete(message)
+
+    clock = FakeClock(time.time())
+    started_at = clock.time()
+    channel = FakeChannel(clock)
+    purge_filter = PurgeFilter.parse(None, ["author=" + ",".join(str(i) for i in range(0, 50, 2)), "match=nitro"])
+    predicate = purge_filter.compile(datetime.datetime.utcfromtimestamp(clock.time()))
+    expected = [m.id for m in channel.messages if predicate(m)]
+    reports = []
+
+    async def report(progress):
+        reports.append(progress.summary())
+
+    start = time.perf_counter()
+    progress = asyncio.run(clock.run(Purge(channel, predicate, messages, clock=clock, on_progress=report).run()))
+    elapsed = time.perf_counter() - start
+    left = [m.id for m in channel.messages if predicate(m)]
+    check(not left and progress.deleted == len(expected) and len(channel.messages) == messages - len(expected),
+          f"{progress.deleted} of {len(expected)} matching messages deleted, {len(left)} left, {len(channel.messages)} messages left in all")
+    recent = sum(1 for m in channel.messages if m.created_at > channel.cutoff)
+    print(progress.summary())
+    print(f"{elapsed:.2f}s of work for {messages} messages; {channel.history_requests} history pages, {channel.bulk_requests} bulk "
+          f"and {channel.single_requests} single deletes, {clock.time() - started_at:.0f}s throttled, {len(reports)} progress reports.")
+    print(f"Deleted exactly the {len(expected)} matching messages; {recent} recent and {len(channel.messages) - recent} old ones are left.")
@@ -0,0 +1,204 @@
+"""Reaction games against a fake Discord: the API calls each one makes, and the pacing of reactions."""
+import asyncio
+import contextlib
+import itertools
+import time
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+
+import cogs.games
+from benchmarks import check
+from internal import reactions
+from internal.context import CrajyContext
+from internal.router import InteractionRouter
+from internal.sessions import SessionManager
+from utils.embed import EmbedResource
+
+
+def run(games: int) -> None:
+    """Plays `games` confirmations, games of tictactoe and games of akinator against a fake Discord, and checks the
+    API calls each one makes: the reactions it adds, removes and clears (also counted by ReactionManager.calls), and the
+    messages it sends and edits. Also checks that reaction changes in a channel stay a quarter second apart."""
+    ids = itertools.count(1)
+    calls = defaultdict(Counter)    # channel id: API calls, by kind
+    reaction_times = defaultdict(list)    # channel id: when each reaction change was made
+    me = SimpleNamespace(id=0)
+    guild = SimpleNamespace(id=1, me=me)
+
+    class FakeMessage:
+        def __init__(self, channel):
+            self.id = next(ids)
+            self.channel = channel
+            self.reactions = set()
+
+        def _call(self, kind, reaction=False):
+            calls[self.channel.id][kind] += 1
+            if reaction:
+                reaction_times[self.channel.id].append(time.monotonic())
+
+        async def add_reaction(self, emoji):
+            self._call("add", reaction=True)
+            self.reactions.add(emoji)
+
+        async def remove_reaction(self, emoji, member):
+            self._call("remove", reaction=True)
+
+        async def clear_reaction(self, emoji):
+            self._call("clear", reaction=True)
+            self.reactions.discard(emoji)
+
+        async def clear_reactions(self):
+            self._call("clear", reaction=True)
+            self.reactions.clear()
+
+        async def edit(self, **fields):
+            self._call("edit")
+
+        async def delete(self):
+            self._call("delete")
+
+    class FakeChannel:
+        def __init__(self):
+            self.id = next(ids)
+            self.guild = guild
+            self.messages = []
+
+        def permissions_for(self, member):
+            return SimpleNamespace(manage_messages=True)
+
+        async def send(self, content=None, **fields):
+            calls[self.id]["send"] += 1
+            message = FakeMessage(self)
+            self.messages.append(message)
+            return message
+
+        def typing(self):
+            @contextlib.asynccontextmanager
+            async def typing():
+                yield
+            return typing()
+
+    class FakeAkinator:
+        QUESTIONS = 4    # answers until it guesses
+
+        def __init__(self):
+            self.progression = 0
+            self.first_guess = {"name": "Pikachu", "description": "Pokémon", "absolute_picture_path": "https://example.com/pikachu.png"}
+
+        async def start_game(self, client_session=None):
+            return "Is your character real?"
+
+        async def answer(self, answer):
+            self.progression += 100 / self.QUESTIONS
+            return "Is your character yellow?"
+
+        async def back(self):
+            return "Is your character real?"
+
+        async def win(self):
+            pass
+
+    def user():
+        number = next(ids)
+        return SimpleNamespace(id=number, name=f"user{number}", nick=f"user{number}", mention=f"<@{number}>",
+                               display_name=f"user{number}", avatar_url="https://example.com/avatar.png")
+
+    async def press(message, users, emoji):
+        """Reacts with `emoji` once the bot has added it and is waiting for it, as whichever of `users` it waits for.
+        Returns who reacted."""
+        while True:
+            if emoji in message.reactions:
+                for player in users:
+                    payload = SimpleNamespace(emoji=emoji, message_id=message.id, user_id=player.id)
+                    if bot.router.dispatch("reaction_add", message.channel.id, message.id, player.id, payload):
+                        return player
+            await asyncio.sleep(0.01)
+
+    def context(channel, author):
+        return SimpleNamespace(bot=bot, channel=channel, author=author, message=SimpleNamespace(author=author),
+                               send=channel.send, command=None)
+
+    async def confirmation():
+        channel, author = FakeChannel(), user()
+        question = await channel.send("Are you sure?")
+        answer = asyncio.ensure_future(CrajyContext.get_confirmation(context(channel, author), question))
+        await press(question, [author], EmbedResource.CHECK_EMOJI.value)
+        check(await answer, "the confirmation wasn't confirmed")
+        return channel
+
+    async def tictactoe():
+        channel, author, opponent = FakeChannel(), user(), user()
+        game = asyncio.ensure_future(cog.ttt.callback(cog, context(channel, author), opponent))
+        while len(channel.messages) < 4:
+            await asyncio.sleep(0.01)
+        rows = {emoji: message for message, emojis in zip(channel.messages[1:], (["↖", "⬆", "↗"], ["⬅", "⏺", "➡"], ["↙", "⬇", "↘"]))
+                for emoji in emojis}
+        first = await press(rows["↖"], [author, opponent], "↖")    # whoever goes first wins on the top row
+        second = opponent if first is author else author
+        for player, cell in zip(itertools.cycle((second, first)), ("⬅", "⬆", "⏺", "↗")):
+            await press(rows[cell], [player], cell)
+        await game
+        return channel
+
+    async def akinator():
+        channel, author = FakeChannel(), user()
+        game = asyncio.ensure_future(cog.akinator_game.callback(cog, context(channel, author)))
+        while not channel.messages:
+            await asyncio.sleep(0.01)
+        for _ in range(FakeAkinator.QUESTIONS):
+            await press(channel.messages[0], [author], "✅")
+        while len(channel.messages) < 2:
+            await asyncio.sleep(0.01)
+        await press(channel.messages[1], [author], "✅")
+        await game
+        return channel
+
+    class FakeLeaderboard:
+        async def update_one(self, *args, **kwargs):
+            pass
+
+    turns = FakeAkinator.QUESTIONS
+    expected = {
+        # the question is the bench's own message, and it's answered as soon as ✅ is there, before ❌ is added
+        "get_confirmation": (confirmation, {"send": 1, "add": 1, "clear": 1}),
+        "tictactoe": (tictactoe, {"send": 4, "add": 9, "clear": 5, "edit": 6}),
+        "akinator": (akinator, {"send": 3, "add": 7 + 2, "remove": turns, "edit": 1 + turns}),
+    }
+
+    bot = cog = None
+
+    async def main():
+        nonlocal bot, cog
+        bot = SimpleNamespace(loop=asyncio.get_running_loop(), router=InteractionRouter(), sessions=SessionManager(),
+                              session=None, games_leaderboard=FakeLeaderboard())
+        bot.reactions = reactions.ReactionManager(bot)
+        cog = cogs.games.Games(bot)
+        limit = asyncio.Semaphore(min(bot.sessions.limits[kind][1] for kind in ("tictactoe", "akinator")))
+
+        async def play(game):
+            async with limit:
+                return await game()
+
+        results = {}
+        start = time.perf_counter()
+        for name, (game, _) in expected.items():
+            results[name] = asyncio.gather(*(play(game) for _ in range(games)))
+        results = {name: await channels for name, channels in results.items()}
+        while len(asyncio.all_tasks()) > 1:    # reactions still being removed in the background
+            await asyncio.sleep(0.05)
+        return results, time.perf_counter() - start
+
+    cogs.games.new_akinator = FakeAkinator
+    results, elapsed = asyncio.run(main())
+    print(f"{games} of each game in {elapsed:.1f}s:")
+    for name, channels in results.items():
+        want = expected[name][1]
+        for channel in channels:
+            check(calls[channel.id] == want, f"{name} made {dict(calls[channel.id])}, expected {want}")
+        print(f"  {name}: " + ", ".join(f"{count} {kind}" for kind, count in want.items()) + " per game")
+    check(sum(bot.reactions.calls.values()) == sum(calls[c][kind] for c in calls for kind in ("add", "remove", "clear")),
+          "ReactionManager.calls doesn't match the reaction calls made")
+    gaps = [b - a for times in reaction_times.values() for a, b in zip(times, times[1:])]
+    check(min(gaps) >= reactions.REACTION_INTERVAL - 0.01, f"reaction changes {min(gaps):.3f}s apart in a channel")
+    print(f"ReactionManager.calls: {dict(bot.reactions.calls)}; reaction changes in a channel at least {min(gaps):.2f}s apart.")
+    print(f"akinator used to take {turns} deletes, {turns} sends and {7 * turns} reactions more for {turns} questions.")
@@ -0,0 +1,53 @@
+"""Cached command responses: how long a hit takes, and that every call gets a copy it can change."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+from benchmarks import check
+from internal.enumerations import EmbedType
+from internal.response_cache import ResponseCache, cached_response
+from internal.stats import Histogram
+from utils.embed import CrajyEmbed
+
+
+class Shop:
+    """A cog with a cached response like the shop's: an embed with a field per item."""
+    builds = 0
+
+    @cached_response(300, tags=["shop"], name="bench shop")
+    async def shop_embed(self, ctx):
+        self.builds += 1
+        embed = CrajyEmbed(title="Shop", embed_type=EmbedType.INFO)
+        for i in range(10):
+            embed.add_field(name=f"item {i}", value=f"{i * 100} coins", inline=False)
+        return embed
+
+
+def run(calls: int) -> None:
+    """Makes `calls` calls to a cached response, changing each embed it gets back the way commands do (author, an
+    extra field); checks that no change reaches the cache or the next caller, the first (a miss) included, and times
+    the hits."""
+    ctx = SimpleNamespace(bot=SimpleNamespace(response_cache=ResponseCache()))
+    shop = Shop()
+
+    def change(embed):
+        embed.add_field(name="changed", value="by the caller")
+        embed.set_field_at(0, name="item 0", value="changed")
+        embed.set_author(name="someone")
+
+    async def main():
+        for _ in range(calls):
+            start = time.perf_counter()
+            embed = await shop.shop_embed(ctx)
+            timings.observe(time.perf_counter() - start)
+            check(isinstance(embed, CrajyEmbed), f"a cached embed came back as {type(embed).__name__}")
+            check(len(embed.fields) == 10 and embed.fields[0].value == "0 coins" and not embed.author,
+                  f"a call got an embed changed by an earlier caller: {len(embed.fields)} fields, first is {embed.fields[0].value!r}")
+            change(embed)
+
+    timings = Histogram((0.00005, 0.0001, 0.0002, 0.0005, 0.001, 0.005))
+    asyncio.run(main())
+    check(shop.builds == 1, f"built {shop.builds} times in {calls} calls")
+    counter = ctx.bot.response_cache.counters["bench shop"]
+    print(f"{calls} calls, each changing the embed it got: every call got the original ({counter.summary()}).")
+    print(f"time per call, a fresh copy included: {timings.summary('µs', 1e6)}")
@@ -0,0 +1,39 @@
+"""Event dispatch through the interaction router, against a scan of every waiting predicate."""
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from internal.router import InteractionRouter
+
+
+def run(waiters: int, events: int = 10000) -> None:
+    """Measures how long dispatching an event takes with `waiters` commands waiting, through the interaction router
+    and through a scan of every predicate (what bot.wait_for does)."""
+    async def main():
+        router = InteractionRouter()
+        users = [(channel, 1000 + channel) for channel in range(waiters)]
+        tasks = [asyncio.ensure_future(router.wait("message", channel_id=c, user_id=u, check=lambda m: m.content == "go"))
+                 for c, u in users]
+        await asyncio.sleep(0)
+        print(f"{len(router)} live waiters")
+        messages = [SimpleNamespace(channel_id=c, author_id=u, content="no") for c, u in random.choices(users, k=events)]
+
+        start = time.perf_counter()
+        for m in messages:
+            router.dispatch("message", m.channel_id, None, m.author_id, m)
+        routed = (time.perf_counter() - start) / events
+
+        predicates = [lambda m, c=c, u=u: m.channel_id == c and m.author_id == u and m.content == "go" for c, u in users]
+        start = time.perf_counter()
+        for m in messages:
+            for predicate in predicates:
+                predicate(m)
+        scanned = (time.perf_counter() - start) / events
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        print(f"router: {routed * 1e6:.2f}µs per event, predicate scan: {scanned * 1e6:.2f}µs per event ({scanned / routed:.0f}x)")
+
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+"""Buys and sells against the database, for throughput and latency."""
+import asyncio
+import time
+
+from internal.config import load_config
+from internal.database import Database
+from internal.items import ItemCatalog
+from internal.queries import STATEMENTS
+from internal.stats import Histogram
+
+
+def run(operations: int, concurrency: int = 20) -> None:
+    """Runs `operations` buys and sells of a temporary item by temporary users against the database, concurrently,
+    and prints the throughput and latency. Everything it creates is deleted afterwards."""
+    async def main():
+        config = load_config()
+        db = Database(STATEMENTS)
+        await db.connect(config.db_connection_string, min_size=concurrency, max_size=concurrency)
+        users = list(range(-1, -concurrency - 1, -1))    # negative ids can't collide with discord users
+        try:
+            await db.pool.execute("INSERT INTO items(item_name, price) VALUES('benchmark item', 1)")
+            await db.pool.executemany("INSERT INTO economy(user_id, cash) VALUES($1, $2)", [(u, operations) for u in users])
+            items = ItemCatalog(db)
+            await items.reload()
+            item = items.get("benchmark item")
+            latency = Histogram()
+
+            async def worker(user_id, n):
+                for i in range(n):
+                    start = time.perf_counter()
+                    if i % 2:
+                        await items.sell(user_id, item, 1)
+                    else:
+                        await items.buy(user_id, item, 1)
+                    latency.observe(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(u, operations // concurrency) for u in users))
+            elapsed = time.perf_counter() - start
+            print(f"{latency.count} buys and sells in {elapsed:.2f}s ({latency.count / elapsed:.0f}/s) with {concurrency} concurrent users")
+            print(f"latency: {latency.summary()}")
+        finally:
+            await db.pool.execute("DELETE FROM items WHERE item_name = 'benchmark item'")
+            await db.pool.execute("DELETE FROM economy WHERE user_id = ANY($1::BIGINT[])", users)
+            await db.close()
+
+    asyncio.run(main())
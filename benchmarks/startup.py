@@ -0,0 +1,36 @@
+"""How long the bot takes to import, and to be ready."""
+import subprocess
+import sys
+from typing import List
+
+
+def import_profile(extensions: List[str], top: int = 15) -> None:
+    """Runs `python -X importtime` on the bot and `extensions`, and prints the slowest imports."""
+    script = "import bot, importlib; [importlib.import_module(e) for e in %r]" % extensions
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", script], capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    if result.returncode != 0:
+        print(result.stderr.splitlines()[-1])
+    total = sum(row[1] for row in rows)
+    print(f"Imported {len(rows)} modules in {total / 1e6:.2f}s. Slowest (cumulative):")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1e3:>9.1f}ms  (self {self_us / 1e3:>7.1f}ms)  {name.strip()}")
+
+
+def time_to_ready(extensions: List[str]) -> None:
+    """Starts the bot with `extensions`, prints how long each startup stage took, and shuts it down once ready."""
+    from bot import bot    # builds the bot; only when this runs
+    bot.initial_extensions.extend(extensions)
+
+    @bot.listen("on_ready")
+    async def report_and_close():
+        for stage, seconds in bot.startup_timings.items():
+            print(f"{stage:<12}{seconds:.3f}s")
+        await bot.close()
+
+    bot.run(bot.config.token)
@@ -0,0 +1,51 @@
+"""The text transforms, against the character-by-character concatenation they used to do."""
+import random
+import string
+import time
+
+from utils import text
+
+
+def run(length: int, rounds: int = 200) -> None:
+    """Times the text transforms on an input of `length` characters, against the character-by-character string
+    concatenation they used to do."""
+    sample = "".join(random.choices(string.ascii_letters + "     ,.!\n", k=length))
+
+    def concat_weird(message):
+        out = ""
+        for i, char in enumerate(message):
+            out += char.upper() if i % 2 else char.lower()
+        return out
+
+    def concat_emojify(message):
+        emojis = {letter: chr(0x1F1E6 + i) for i, letter in enumerate(string.ascii_lowercase)}
+        out = ""
+        for letter in message.lower():
+            out += f"{emojis[letter]} " if letter.isalpha() else letter
+        return out
+
+    def concat_owo(message):
+        out = ""
+        for char in message:
+            if char.lower() in ("l", "r"):
+                out += "W" if char.isupper() else "w"
+            else:
+                out += char
+        return out
+
+    def timed(func):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func(sample)
+        return (time.perf_counter() - start) / rounds
+
+    print(f"{length} characters:")
+    for name, old in (("weird", concat_weird), ("emojify", concat_emojify), ("owo", concat_owo)):
+        new, old = timed(text.compile_chain((name,))), timed(old)
+        print(f"  {name}: {new * 1e6:.0f}µs, concatenation {old * 1e6:.0f}µs ({old / new:.1f}x)")
+    chain = text.compile_chain(("owo", "emojify", "weird"))
+    chained = timed(chain)
+    old = timed(lambda message: concat_weird(concat_emojify(concat_owo(message))))
+    print(f"  owo | emojify | weird: {chained * 1e6:.0f}µs in {chain.passes} passes, concatenation {old * 1e6:.0f}µs ({old / chained:.1f}x)")
+    split = timed(lambda message: text.split_message(chain(message)))
+    print(f"  ...and split into messages: {split * 1e6:.0f}µs")
@@ -0,0 +1,31 @@
+"""How fast reminder times are read, scanning every text and with the scans cached."""
+import random
+import time
+
+from utils import timezone
+
+
+def run(expressions: int) -> None:
+    """Measures how many reminder times per second `utils.timezone.split_time` reads, scanning every text, and with
+    the scans cached (by the time at the start of the text, so "tomorrow 9am buy milk" and "tomorrow 9am call mom"
+    share one scan)."""
+    forms = ["{n}h{m}m", "{n} weeks", "in {n} days", "tomorrow {h}am", "2026-12-{d:02d} {h}:{m:02d}", "{h}pm",
+             "friday {h}pm", "tonight", "{n} months", "in {n} minutes and {m} seconds"]
+    texts = [random.choice(forms).format(n=random.randint(1, 9), m=random.randint(0, 59), h=random.randint(1, 12),
+                                         d=random.randint(1, 28)) + " buy milk" for _ in range(expressions)]
+
+    start = time.perf_counter()
+    for text in texts:
+        timezone.scan_expression.cache_clear()    # every text scanned, as without the cache
+        timezone.split_time(text)
+    uncached = time.perf_counter() - start
+    for text in texts:
+        timezone.split_time(text)
+    info = timezone.scan_expression.cache_info()
+    start = time.perf_counter()
+    for text in texts:
+        timezone.split_time(text)
+    cached = time.perf_counter() - start
+    print(f"scanning every text: {expressions / uncached:.0f} reminders/s")
+    print(f"cached: {expressions / cached:.0f} reminders/s ({uncached / cached:.1f}x; {info.currsize} distinct times, "
+          f"{info.hits} hits and {info.misses} misses filling the cache)")
@@ -2,40 +2,32 @@ import random
 import datetime
 
 import discord
-from discord.ext import commands, tasks
-
-from secret.constants import *
+from discord.ext import commands
 
 from utils.embed import CrajyEmbed
 
 from internal.bot import CrajyBot
+from internal.config import load_config
 from internal.enumerations import Table, EmbedType
+from internal.jobs import Job
+from internal.pipeline import Stage
 
 
 intents = discord.Intents.default()
 intents.members = True 
 intents.messages = True
-bot = CrajyBot(command_prefix=commands.when_mentioned_or("."),
+bot = CrajyBot(config=load_config(),
+               command_prefix=commands.when_mentioned_or("."),
                activity=discord.Activity(type=discord.ActivityType.watching, name="thug_sgt"),
                intents=intents,
                owner_id=271586885346918400)
 
-bot.task_loops = dict()    # add all task loops, across cogs to this.
-
 last_4 = []                # List for stock loop correction
 
-@bot.listen("on_message")
-async def chat_money_tracker(message):
-    if message.author.bot:
-        return
+async def chat_money_tracker(incoming):
+    bot.state.incr("chat_money", incoming.message.author.id)
 
-    if message.channel.id in CHAT_MONEY_CHANNELS:
-        bot.chat_money_cache[message.author.id] += 1
-
-@tasks.loop(hours=3)
 async def stock_price():
-    message_channel = bot.get_channel(BOT_ANNOUNCE_CHANNEL)
-
     rand_sign = random.choice(["+","-"])
     pos = 0
     neg = 0
@@ -63,35 +55,40 @@ async def stock_price():
         rand_val = -(rand_val)
         emb_type = EmbedType.SUCCESS
     
-    new = await bot.db_pool.fetchval(f"UPDATE shop SET price=price + $1 WHERE item_name='stock' RETURNING price", rand_val)
+    new = (await bot.items.change_price("stock", rand_val)).price
 
     embed = CrajyEmbed(title="Stock Price Updated!", embed_type=emb_type)
     embed.description = f"New price: {new}"
     embed.quick_set_author(bot.user)
-    await message_channel.send(embed=embed)
+    # every guild's announce channel, including guilds on other processes' shards
+    for settings in bot.guild_settings:
+        if settings.announce_channel is not None:
+            await bot.send_to_channel(settings.announce_channel, embed=embed)
 
-@stock_price.before_loop
-async def stock_price_before():
-    await bot.wait_until_ready()
-
-@tasks.loop(hours=24)
 async def birthday_loop():
-    guild = bot.get_guild(GUILD_ID)
-    wishchannel = guild.get_channel(GENERAL_CHAT)
-    data = await bot.db_pool.fetch("SELECT user_id FROM user_details WHERE EXTRACT(day FROM bday)=EXTRACT(day FROM current_date) AND EXTRACT(month FROM bday)=EXTRACT(month FROM current_date)")
-
-    for person in data:
-        person_obj = discord.utils.get(guild.members, id=person['user_id'])
-        embed = CrajyEmbed(title=f"Happy Birthday {person_obj.display_name}!", embed_type=EmbedType.SUCCESS)
-        embed.quick_set_author(person_obj)
-        await wishchannel.send(content="@here", embed=embed)
-
-@birthday_loop.before_loop
-async def birthdayloop_before():
-    await bot.wait_until_ready()
+    data = await bot.db.fetch("user_details.bdays_today")
+    if not data:
+        return
 
-bot.task_loops["stock"] = stock_price 
-bot.task_loops["birthday"] = birthday_loop
+    for guild in bot.guilds:    # only guilds on this process' shards; other processes wish theirs
+        wishchannel = guild.get_channel(bot.settings_for(guild).general_channel)
+        if wishchannel is None:
+            continue
+        for person in data:
+            person_obj = guild.get_member(person['user_id'])
+            if person_obj is None:
+                continue
+            embed = CrajyEmbed(title=f"Happy Birthday {person_obj.display_name}!", embed_type=EmbedType.SUCCESS)
+            embed.quick_set_author(person_obj)
+            await wishchannel.send(content="@here", embed=embed)
+
+bot.pipeline.add(Stage("chat-money", chat_money_tracker, guild_only=True,
+                       channels=lambda message: bot.settings_for(message.guild).chat_money_channels))
+
+# periodic jobs are started by the bot's job supervisor once the bot is ready.
+# the stock price is global, so only the leader process changes it. birthdays are wished by whichever process has the guild.
+bot.jobs.add(Job("stock", stock_price, interval=3 * 3600, align=True, leader_only=True))
+bot.jobs.add(Job("birthday", birthday_loop, interval=24 * 3600, align=True))    # runs at midnight, BOT_TZ
 
 if __name__ == "__main__":
     raise Exception("Use the manage.py interface to run the bot.")
@@ -2,25 +2,78 @@
 import discord
 from discord.ext import commands
 import asyncio
+import time
 
 from utils import embed as em
 from internal import enumerations as enums
+from internal.pipeline import Stage
+
+MENTION = frozenset({"code", "server"})    # someone asking for the code or server, in a channel with a game going on
+REPLY_COOLDOWN = 30    # seconds; the session embed is sent at most this often per channel, unless the game changed
+
 
 class AmongUs(commands.Cog):
+    """Every channel can have its own game going on. Sessions are kept in the bot's shared state, so that they survive
+    restarts, and mirrored in `self.sessions`, which is also the channel filter of the message stage that answers
+    "code?", so other channels never reach it."""
     def __init__(self, bot):
         self.bot = bot
-        self.status = False
-        self.data = {"user": None, "code": None, "server": None}
-        self.embed = None
-
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """Checks through chat and displays the current game room code, and server.
-        Responds whenever someone says 'code' or 'server' in chat."""
-        if self.status is False or message.author==self.bot.user:
+        self.sessions = {}    # channel id: session dict with the keys user_id, user_name, code and server
+        self.last_reply = {}    # channel id: (monotonic time, session) of the last time the session was sent there
+        self.bot.pipeline.add(Stage("amongus", self.on_code_mention, channels=self.sessions, keywords=MENTION))
+        self.bot.loop.create_task(self.load_sessions())
+
+    def cog_unload(self):
+        self.bot.pipeline.remove("amongus")
+
+    async def load_sessions(self):
+        for channel_id in await self.bot.state.get("amongus", "channels", []):
+            data = await self.bot.state.get("amongus", str(channel_id))
+            if data is not None:
+                self.sessions[channel_id] = data
+
+    async def update_index(self, channel_id, *, add):
+        """Keeps the list of channels with a game in the shared state, which other processes change too."""
+        async with self.bot.state.lock("amongus:channels"):
+            channels = set(await self.bot.state.get("amongus", "channels", []))
+            channels.add(channel_id) if add else channels.discard(channel_id)
+            await self.bot.state.set("amongus", "channels", sorted(channels))
+
+    def get_session(self, channel_id):
+        """Returns the channel's game as a dict with the keys user_id, user_name, code and server; or None."""
+        return self.sessions.get(channel_id)
+
+    async def save_session(self, channel_id, author, code, server):
+        data = {"user_id": author.id, "user_name": author.name, "code": code, "server": server}
+        await self.bot.state.set("amongus", str(channel_id), data)
+        if channel_id not in self.sessions:
+            await self.update_index(channel_id, add=True)
+        self.sessions[channel_id] = data
+
+    async def end_session(self, channel_id):
+        await self.bot.state.delete("amongus", str(channel_id))
+        self.sessions.pop(channel_id, None)
+        self.last_reply.pop(channel_id, None)
+        await self.update_index(channel_id, add=False)
+
+    def session_embed(self, data, embed_type):
+        embed = em.CrajyEmbed(title="Among Us time!", description=f"Code: {data['code']}\nServer: {data['server']}", embed_type=embed_type)
+        embed.set_author(name=data['user_name'])
+        return embed
+
+    async def on_code_mention(self, incoming):
+        """Displays the channel's game room code and server whenever someone says 'code' or 'server' in it.
+        The pipeline only calls this in channels with a game, for messages with one of those words."""
+        message = incoming.message
+        data = self.sessions.get(message.channel.id)
+        if data is None:    # ended while the message was on its way
             return
-        if "code" in message.content.lower() or "server" in message.content.lower():
-            await message.channel.send(embed=self.embed)
+        now = time.monotonic()
+        last_time, last_data = self.last_reply.get(message.channel.id, (0.0, None))
+        if last_data == data and now - last_time < REPLY_COOLDOWN:
+            return
+        self.last_reply[message.channel.id] = (now, data)
+        await message.channel.send(embed=self.session_embed(data, enums.EmbedType.INFO))
 
     @commands.group(name="among_us",
                     aliases=["amongus", "play", "among-us"],
@@ -28,73 +81,60 @@ class AmongUs(commands.Cog):
                     help="Command to save the room code and server when starting a new game.")
     async def among_us(self, ctx):
         """Command to save the room code and server when starting a new game."""
-        if self.status is True:
-            return await ctx.reply(f"{ctx.author.mention}, {self.data['user'].name} has already started a game.\nCode: ``{self.data['code']}``\nServer: ``{self.data['server']}``")
+        data = self.get_session(ctx.channel.id)
+        if data is not None:
+            return await ctx.reply(f"{ctx.author.mention}, {data['user_name']} has already started a game.\nCode: ``{data['code']}``\nServer: ``{data['server']}``")
         #checks
         def code_check(m):
-            return m.author==ctx.author and len(m.content)==6 and all([i.isalpha() for i in m.content])
+            return len(m.content)==6 and all([i.isalpha() for i in m.content])
         def server_check(m):
-            return m.author==ctx.author and m.content.lower() in ["asia", "europe", "north america", "na"]
+            return m.content.lower() in ["asia", "europe", "north america", "na"]
 
         await ctx.send("Enter the room code")
-        code = await self.bot.wait_for('message', check=code_check, timeout=25)
+        code = await ctx.wait_for_message(code_check, timeout=25)
         await ctx.send("Enter server: (Europe, Asia, North America)")
-        server = await self.bot.wait_for('message', check=server_check, timeout=25)
-
-        #updating data 
-        self.status = True
-        self.data['user'] = ctx.author
-        self.data['code'] = code.content.upper()
-        self.data['server'] = server.content.capitalize()
+        server = await ctx.wait_for_message(server_check, timeout=25)
 
-        self.embed = em.CrajyEmbed(title="Among Us time!", description=f"Code: {self.data['code']}\nServer: {self.data['server']}", embed_type=enums.EmbedType.INFO)
-        self.embed.quick_set_author(ctx.author)
-
-        await ctx.send(embed=self.embed)
+        #updating data
+        await self.save_session(ctx.channel.id, ctx.author, code.content.upper(), server.content.capitalize())
+        await ctx.send(embed=self.session_embed(self.get_session(ctx.channel.id), enums.EmbedType.INFO))
 
     @among_us.command(name="end",
                       help="Command to end the game session, and have the bot stop responding to messages that contain 'code' or 'server'.")
     async def end(self, ctx):
         """Command to end the game session, and have the bot stop responding to messages that contain 'code' or 'server'."""
-        if self.status is False:
+        data = self.get_session(ctx.channel.id)
+        if data is None:
             raise Exception("What are you trying to end? No one is playing now.")
-        
-        if ctx.author == self.data['user'] or ctx.author.guild_permissions.administrator:
-            self.status = False
-            self.data = {"user": None, "code": None, "server": None}
-            self.embed = None  
 
-            return await ctx.send("Game session ended ggwp") 
+        if ctx.author.id == data['user_id'] or ctx.author.guild_permissions.administrator:
+            await self.end_session(ctx.channel.id)
+            return await ctx.send("Game session ended ggwp")
 
     @among_us.command(name="update",
                       help="Command to update the room code and/or server of the game.")
     async def update(self, ctx):
         """Command to update the room code and/or server of the game."""
-        if self.status is False:
+        data = self.get_session(ctx.channel.id)
+        if data is None:
             raise Exception("What are you trying to update? No one is playing now.")
 
         #checks
         def code_check(m):
-            return m.author==ctx.author and len(m.content)==6 and all([i.isalpha() for i in m.content])
+            return len(m.content)==6 and all([i.isalpha() for i in m.content])
         def server_check(m):
-            return m.author==ctx.author and m.content.lower() in ["asia", "europe", "north america"]
+            return m.content.lower() in ["asia", "europe", "north america"]
 
-        if ctx.author == self.data['user'] or ctx.author.guild_permissions.administrator:
+        if ctx.author.id == data['user_id'] or ctx.author.guild_permissions.administrator:
             await ctx.send("Enter the room code")
-            code = await self.bot.wait_for('message', check=code_check, timeout=25)
+            code = await ctx.wait_for_message(code_check, timeout=25)
             await ctx.send("Enter server: (Europe, Asia, North America)")
-            server = await self.bot.wait_for('message', check=server_check, timeout=25)
-
-            self.data['user'] = ctx.author
-            self.data['code'] = code.content.upper()
-            self.data['server'] = server.content.capitalize()
+            server = await ctx.wait_for_message(server_check, timeout=25)
 
-            self.embed = em.CrajyEmbed(title="Among Us time!", description=f"Code: {self.data['code']}\nServer: {self.data['server']}", embed_type=enums.EmbedType.SUCCESS)
-            self.embed.quick_set_author(ctx.author)
+            await self.save_session(ctx.channel.id, ctx.author, code.content.upper(), server.content.capitalize())
 
             await ctx.check_mark()
-            return await ctx.send(embed=self.embed)
+            return await ctx.send(embed=self.session_embed(self.get_session(ctx.channel.id), enums.EmbedType.SUCCESS))
 
 def setup(bot):
     bot.add_cog(AmongUs(bot))
-
@@ -9,9 +9,11 @@ class Betting(commands.Cog):
         self.bot = bot
 
     async def cog_check(self, ctx):
-        """Restricts these commands to some specific channels. This is server specific, so change the list according to what you need.
-        Or you can entirely remove this function."""
-        return ctx.channel.name in ["botspam", "bot-test", "admin-botspam"]
+        """Restricts these commands to the guild's betting channels, set with the `settings` command."""
+        if ctx.guild is None:
+            return False
+        settings = self.bot.settings_for(ctx.guild)
+        return settings.allows(settings.betting_channels, ctx.channel.id)
 
     @commands.command(name="roulette",
                       help="Starts a game of roulette.")
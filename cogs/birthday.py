@@ -4,6 +4,7 @@ from discord.ext import commands
 import datetime
 
 from internal import enumerations as enums
+from internal.response_cache import cached_response
 from utils import embed as em
 
 class Birthday(commands.Cog):
@@ -17,7 +18,7 @@ class Birthday(commands.Cog):
     async def bday(self, ctx, person: discord.Member = None):
         if person is None:
             person = ctx.author
-        date = await self.bot.db_pool.fetchval("SELECT bday FROM user_details WHERE user_id=$1", person.id)
+        date = await self.bot.db.fetchval("user_details.bday", person.id)
         embed = em.CrajyEmbed(title=f"{person.display_name}'s birthday", description=date.strftime('%d %B %Y'), embed_type=enums.EmbedType.INFO)
         embed.set_thumbnail(url=em.EmbedResource.BDAY.value)
         embed.quick_set_author(person)
@@ -45,14 +46,12 @@ class Birthday(commands.Cog):
 
         ask_message = await ctx.maybe_reply(embed=ask_embed)
 
-        def check(m):
-            return m.author == ctx.author and len(m.content.split("-")) == 3 and m.guild is not None
-
-        reply = await self.bot.wait_for('message', check=check, timeout=30)
+        reply = await ctx.wait_for_message(lambda m: len(m.content.split("-")) == 3, timeout=30)
         date_vals =[int(i) for i in reply.content.split("-")]
         kwargs = ("day", "month", "year")
 
-        await self.bot.db_pool.execute("INSERT INTO user_details(bday, user_id) VALUES($1, $2) ON CONFLICT (user_id) DO UPDATE SET bday=$1", datetime.date(**dict(zip(kwargs, date_vals))), person.id)
+        await self.bot.db.execute("user_details.set_bday", datetime.date(**dict(zip(kwargs, date_vals))), person.id)
+        self.bot.response_cache.invalidate("birthdays")
         
         out = em.CrajyEmbed(title=f"Birthday Set!", embed_type=enums.EmbedType.SUCCESS)
         out.description = f"{person.display_name}'s birthday is saved. They shall be wished."
@@ -64,17 +63,21 @@ class Birthday(commands.Cog):
     @bday.command(name="all", aliases=["list"],
                   help="Get a list of all birthdays saved.")
     async def bday_all(self, ctx):
+        await ctx.maybe_reply(embed=await self.all_birthdays(ctx))
+
+    @cached_response(600, tags=["birthdays"], key=lambda self, ctx: ctx.guild.id, name="bday all")
+    async def all_birthdays(self, ctx):
         response = em.CrajyEmbed(title="Everyone's birthdays", embed_type=enums.EmbedType.INFO)
         response.set_thumbnail(url=em.EmbedResource.BDAY.value)
 
-        all_data = await self.bot.db_pool.fetch("SELECT user_id, bday FROM user_details ORDER BY bday ASC")
+        all_data = await self.bot.db.fetch("user_details.all_bdays")
         
         for person in all_data:    
             person_obj = discord.utils.get(ctx.guild.members, id=person['user_id'])
             if person_obj is None:
                 continue
             response.add_field(name=person_obj.display_name, value=person['bday'].strftime('%d %B %Y'), inline=False)
-        await ctx.maybe_reply(embed=response)
+        return response
 
     def find_horoscope_sign(self, date: datetime.datetime) -> str:
         """WIP for future functionality."""
@@ -3,24 +3,41 @@ import discord
 from discord.ext import commands
 
 import utils.tictactoe as tictactoe
+from internal.sessions import SessionLimitReached
 from secret.KEY import *
 
 import random
 import asyncio
 import datetime
+import functools
 
-from random_word import RandomWords
-from PyDictionary import PyDictionary
+# random_word, PyDictionary and akinator are slow to import, and only needed by a couple of commands;
+# they're imported on first use instead of when the cog loads.
 
-from akinator.async_aki import Akinator
 
+@functools.lru_cache(maxsize=None)
+def dictionary():
+    """PyDictionary instance; needed for the word guess game's random word generator."""
+    from PyDictionary import PyDictionary
+    return PyDictionary()
 
-d = PyDictionary()    # needed for the word guess game's random word generator.
-r = RandomWords()
+
+@functools.lru_cache(maxsize=None)
+def random_words():
+    from random_word import RandomWords
+    return RandomWords()
+
+
+def new_akinator():
+    """A new game of akinator; each game has its own."""
+    from akinator.async_aki import Akinator
+    return Akinator()
 
 class Games(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.bot.sessions.set_limit("tictactoe", per_channel=1, total=20)
+        self.bot.sessions.set_limit("akinator", per_channel=2, total=10)    # each one holds an akinator.com session
 
     @commands.command(name="tictactoe", 
                       aliases=["ttt"],
@@ -33,56 +50,62 @@ class Games(commands.Cog):
             ctx.command.reset_cooldown(ctx)
             return await ctx.send("you moron, trying to play with yourself.")
 
-        board = tictactoe.initial_state()
-        player = random.choice([tictactoe.X, tictactoe.O])
-        next_player = tictactoe.X if player == tictactoe.O else tictactoe.O
-        players = {tuple(tictactoe.X): ctx.author, tuple(tictactoe.O): opponent} #check cause of error because tuple() is unnecesary
-
-        main_message_embed = discord.Embed(title="TicTacToe Game!",
-                                            description=f"{ctx.author.mention} has challenged {opponent.mention}!\n {players[tuple(player)]} makes the first move.",
-                                            timestamp=datetime.datetime.utcnow())
-        main_message_embed.set_thumbnail(url=r"https://media.discordapp.net/attachments/749227065512820736/755093446263439540/download.png")
-        main_message_embed.set_author(name=ctx.author.name, icon_url=ctx.author.avatar_url)
-        main_message_embed.set_footer(text=opponent.display_name, icon_url=opponent.avatar_url)
-        main_message_embed.color = discord.Color.blue()
-        main_message = await ctx.send(embed=main_message_embed)
-        main_message_embed.set_thumbnail(url=discord.Embed.Empty)
-
-        top_row_message = await ctx.send("*top row*")
-        for i in ["↖", "⬆", "↗"]:
-            await top_row_message.add_reaction(i)
-
-        middle_row_message = await ctx.send(content="*middle row*")
-        for i in ["⬅", "⏺", "➡"]:
-            await middle_row_message.add_reaction(i)
-
-        bottom_row_message = await ctx.send(content="*bottom row*")
-        for i in["↙", "⬇", "↘"]:
-            await bottom_row_message.add_reaction(i)
-
-        def player_check(reaction, user):
-            if str(reaction.emoji) in ["↖", "⬆", "↗", "⬅", "⏺", "➡", "↙", "⬇", "↘"] and user == players[player]:
-                return True
-
-            return False
-
-        while not tictactoe.terminal(board):
-            reaction, _ = await self.bot.wait_for("reaction_add", check=player_check, timeout=180)
-            message_of_reaction = reaction.message
-
-            if reaction:
-                main_message_embed.color = discord.Color.red()
-                await message_of_reaction.clear_reaction(reaction.emoji)
-                main_message_embed = tictactoe.update_board(main_message_embed, reaction.emoji, player)
-                player, next_player = next_player, player
-                main_message_embed.description += f"\n{players[player]}'s turn"  # maybe move to better place
-                await main_message.edit(embed=main_message_embed)
-
-        main_message_embed.description = f"{players[next_player]} destroyed {players[player]}!\n Good Game!"
-        await self.bot.games_leaderboard.update_one({"user":players[next_player].id}, {"$inc":{"wins":1}}, upsert=True)
-        main_message_embed.color = discord.Color.green()
-        await main_message.edit(embed=main_message_embed)
-        tictactoe.reset_board()
+        async with self.bot.sessions.open("tictactoe", ctx.channel.id, ctx.author.id, idle_timeout=240) as session:
+            board = tictactoe.new_board()
+            session.state = board
+            player = random.choice([tictactoe.X, tictactoe.O])
+            next_player = tictactoe.X if player == tictactoe.O else tictactoe.O
+            players = {tuple(tictactoe.X): ctx.author, tuple(tictactoe.O): opponent} #check cause of error because tuple() is unnecesary
+
+            main_message_embed = discord.Embed(title="TicTacToe Game!",
+                                                description=f"{ctx.author.mention} has challenged {opponent.mention}!\n {players[tuple(player)]} makes the first move.",
+                                                timestamp=datetime.datetime.utcnow())
+            main_message_embed.set_thumbnail(url=r"https://media.discordapp.net/attachments/749227065512820736/755093446263439540/download.png")
+            main_message_embed.set_author(name=ctx.author.name, icon_url=ctx.author.avatar_url)
+            main_message_embed.set_footer(text=opponent.display_name, icon_url=opponent.avatar_url)
+            main_message_embed.color = discord.Color.blue()
+            main_message = await ctx.send(embed=main_message_embed)
+            main_message_embed.set_thumbnail(url=discord.Embed.Empty)
+
+            # reactions are added in the background, so the first move can be made before they're all there
+            rows = {}    # row message: its emojis
+            for label, emojis in (("*top row*", ["↖", "⬆", "↗"]), ("*middle row*", ["⬅", "⏺", "➡"]), ("*bottom row*", ["↙", "⬇", "↘"])):
+                row_message = await ctx.send(label)
+                rows[row_message] = emojis
+                self.bot.reactions.add(row_message, emojis)
+
+            async def next_move():
+                """Waits for the current player to react on any row; returns the row message and the emoji."""
+                waiters = {asyncio.ensure_future(self.bot.reactions.wait(message, players[player], emojis, timeout=180)): message
+                           for message, emojis in rows.items()}
+                try:
+                    done, _ = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    for waiter in waiters:
+                        waiter.cancel()
+                waiter = done.pop()
+                return waiters[waiter], waiter.result()    # raises asyncio.TimeoutError after 180 seconds
+
+            while not tictactoe.terminal(board):
+                message_of_reaction, emoji = await next_move()
+                rows[message_of_reaction] = [e for e in rows[message_of_reaction] if e != emoji]    # a cell can't be played twice
+
+                if emoji:
+                    main_message_embed.color = discord.Color.red()
+                    await self.bot.reactions.clear(message_of_reaction, emoji)
+                    main_message_embed = tictactoe.update_board(main_message_embed, board, emoji, player)
+                    session.touch()
+                    player, next_player = next_player, player
+                    main_message_embed.description += f"\n{players[player]}'s turn"  # maybe move to better place
+                    await main_message.edit(embed=main_message_embed)
+
+            if tictactoe.winner(board):
+                main_message_embed.description = f"{players[next_player]} destroyed {players[player]}!\n Good Game!"
+                await self.bot.games_leaderboard.update_one({"user":players[next_player].id}, {"$inc":{"wins":1}}, upsert=True)
+            else:
+                main_message_embed.description = "It's a draw!"
+            main_message_embed.color = discord.Color.green()
+            await main_message.edit(embed=main_message_embed)
 
     @ttt.error
     async def ttt_error(self, ctx, error):
@@ -96,7 +119,10 @@ class Games(commands.Cog):
             message_embed.color = discord.Color.red()
             return await ctx.send(embed=message_embed)
 
-        elif isinstance(getattr(error, 'original'), asyncio.TimeoutError):
+        elif isinstance(error, SessionLimitReached):
+            ctx.command.reset_cooldown(ctx)    # no game was started; the bot's error handler says why
+
+        elif isinstance(getattr(error, 'original', None), asyncio.TimeoutError):
             message_embed = discord.Embed(title="TicTacToe Game!",
                                           description="The player did not play a move in time, the match is ended.",
                                           timestamp=datetime.datetime.utcnow())
@@ -105,7 +131,6 @@ class Games(commands.Cog):
             message_embed.set_author(name=ctx.author.name, icon_url=ctx.author.avatar_url)
             message_embed.color = discord.Color.red()
             ctx.command.reset_cooldown(ctx)
-            tictactoe.reset_board()
             return await ctx.send(embed=message_embed)
 
     @commands.command(name="guess",
@@ -113,24 +138,20 @@ class Games(commands.Cog):
     async def guess(self, ctx):
         await ctx.send(f"{ctx.author.mention}, check your DMs!")
         #wait_for checks
-        def reply_check(m):
-            if m.author == ctx.message.author and m.guild is None:
-                return True
-
         def answer_check(m):
             nonlocal answer
             if m.author != ctx.message.author and m.content.lower() == answer_val.lower():
                 return True
 
-        await ctx.author.send("Send the word that everyone has to guess! Send 'plshelp' if you don't have a word.")
+        dm = await ctx.author.send("Send the word that everyone has to guess! Send 'plshelp' if you don't have a word.")
         try:
-            answer = await self.bot.wait_for('message', check=reply_check, timeout=30)
+            answer = await ctx.wait_for_message(channel=dm.channel, timeout=30)
             if answer.content == 'plshelp':
                 await ctx.author.send("Note: the auto word picking thing may not always work (no word might be sent to the channel, incorrect meaning) etc so, dont blame me too much :(")
                 try:
                     async with ctx.author.dm_channel.typing():
-                        answer_val = r.get_random_word(hasDictionaryDef="true", maxLength=6)
-                        clue_dict = d.meaning(answer_val)
+                        answer_val = random_words().get_random_word(hasDictionaryDef="true", maxLength=6)
+                        clue_dict = dictionary().meaning(answer_val)
                         answer_val = answer_val.lower()
                     clue_val = list(clue_dict.values())
                     await ctx.author.dm_channel.send(f"Chosen a word! The word is **{answer_val}**")
@@ -140,7 +161,7 @@ class Games(commands.Cog):
                 await ctx.send(f"{ctx.author.mention} has chosen a word! Everyone has 1 minute to guess it.")
                 await ctx.send(f"Clue - **{clue_val}**")
                 try:
-                    reply = await self.bot.wait_for('message', check=answer_check, timeout=60)
+                    reply = await ctx.wait_for_message(answer_check, timeout=60, anyone=True)
                 except asyncio.TimeoutError:
                     return await ctx.send(f"Time up! No one guessed the word. The word was **{answer_val}**")
         
@@ -149,7 +170,7 @@ class Games(commands.Cog):
 
             else:
                 await ctx.author.send("Send a clue for your word!")
-                clue = await self.bot.wait_for('message', check=reply_check, timeout=30)
+                clue = await ctx.wait_for_message(channel=dm.channel, timeout=30)
         except asyncio.TimeoutError:
             return await ctx.author.send("Time up!")
         
@@ -159,7 +180,7 @@ class Games(commands.Cog):
         await ctx.send(f"Clue - **{clue_val}**")
 
         try:
-            reply = await self.bot.wait_for('message', check=answer_check, timeout=60)
+            reply = await ctx.wait_for_message(answer_check, timeout=60, anyone=True)
         except asyncio.TimeoutError:
             return await ctx.send(f"Time up! No one guessed the word. The word was **{answer_val}**")
         
@@ -171,67 +192,66 @@ class Games(commands.Cog):
                       aliases=["aki"],
                       help="Start a game of Akinator.")
     async def akinator_game(self, ctx):
+        async with self.bot.sessions.open("akinator", ctx.channel.id, ctx.author.id, idle_timeout=180) as session:
+            aki = new_akinator()
+            session.state = aki
+
+            async def close_http_session():
+                # the game borrows the bot's HTTP session; only close one that akinator made for itself
+                client_session = getattr(aki, "client_session", None)
+                if client_session is not None and client_session is not self.bot.session:
+                    await client_session.close()
+            session.add_cleanup(close_http_session)
+
+            first = await ctx.send("Processing... \n**This command is in beta, don't complain.**")
+            q = await aki.start_game(client_session=self.bot.session)
+
+            game_embed = discord.Embed(title=f"{str(ctx.author.nick)}'s game of Akinator", description=q, url=r"https://en.akinator.com/", color=discord.Color.blurple())
+            game_embed.set_footer(text=f"You have 10 seconds to add a reaction")
+
+            option_map = {'✅': 'y', '❌':'n', '🤷‍♂️':'p', '😕':'pn', '⁉️': 'i'}
+            options = ['◀️', '✅', '❌', '🤷‍♂️', '😕', '⁉️', '😔']
+            # one message for the whole game: each question edits it, and only the player's reaction is removed
+            game_message = first
+            await game_message.edit(content=None, embed=game_embed)
+            self.bot.reactions.add(game_message, options)
+
+            while aki.progression <= 80:
+                try:
+                    emoji = await self.bot.reactions.choose(game_message, ctx.author, options, timeout=120)
+                except asyncio.TimeoutError:
+                    return await ctx.send("Game ended, nobody answered for 2 minutes.")
+                if emoji == '😔':
+                    return await ctx.send("Game ended.")
+                session.touch()
+                async with ctx.channel.typing():
+                    if emoji == '◀️':   #to go back to previous question
+                        try:
+                            q = await aki.back()
+                        except:   #excepting trying to go beyond 1 first question
+                            pass
+                    else:
+                        q = await aki.answer(option_map[emoji])
+                #editing embed for next question
+                game_embed.description = q
+                await game_message.edit(embed=game_embed)
         
-        aki = Akinator()
-        first = await ctx.send("Processing... \n**This command is in beta, don't complain.**")
-        q = await aki.start_game()
-
-        game_embed = discord.Embed(title=f"{str(ctx.author.nick)}'s game of Akinator", description=q, url=r"https://en.akinator.com/", color=discord.Color.blurple())
-        game_embed.set_footer(text=f"You have 10 seconds to add a reaction")
-
-        option_map = {'✅': 'y', '❌':'n', '🤷‍♂️':'p', '😕':'pn', '⁉️': 'i'}
-        count = 0
-
-        def option_check(reaction, user):
-                return user==ctx.author and reaction.emoji in ['◀️', '✅', '❌', '🤷‍♂️', '😕', '⁉️', '😔']
-
-        while aki.progression <= 80:
-            if count == 0:
-                await first.delete()
-                game_message = await ctx.send(embed=game_embed)
-                count += 1
-            else:
-                await game_message.delete()
-                game_message = await ctx.send(content=None, embed=game_embed)
-
-            for emoji in ['◀️', '✅', '❌', '🤷‍♂️', '😕', '⁉️', '😔']:
-                await game_message.add_reaction(emoji)
-
-            option, _ = await self.bot.wait_for('reaction_add', check=option_check) 
-            if option.emoji == '😔':
-                return await ctx.send("Game ended.")
-            async with ctx.channel.typing():
-                if option.emoji == '◀️':   #to go back to previous question
-                    try:
-                        q = await aki.back()
-                    except:   #excepting trying to go beyond 1 first question
-                        pass
-                    #editing embed for next question
-                    game_embed = discord.Embed(title=f"{str(ctx.author.nick)}'s game of Akinator", description=q, url=r"https://en.akinator.com/", color=discord.Color.blurple())
-                    continue
-                else:
-                    q = await aki.answer(option_map[option.emoji])
-                    #editing embed for next question
-                    game_embed = discord.Embed(title=f"{str(ctx.author.nick)}'s game of Akinator", description=q, url=r"https://en.akinator.com/", color=discord.Color.blurple())
-                    continue
-        
-        await aki.win()
-
-        result_embed = discord.Embed(title="My guess....", colour=discord.Color.dark_blue())
-        result_embed.add_field(name=f"My first guess is **{aki.first_guess['name']}**", value=aki.first_guess['description'], inline=False)
-        result_embed.set_footer(text="Was I right? Add the reaction accordingly.")
-        result_embed.set_image(url=aki.first_guess['absolute_picture_path'])
-        result_message = await ctx.send(embed=result_embed)
-        for emoji in ['✅', '❌']:
-            await result_message.add_reaction(emoji)
-
-        option, _ = await self.bot.wait_for('reaction_add', check=option_check, timeout=10)
-        if option.emoji ==  '✅':
-            final_embed = discord.Embed(title="I'm a fuckin genius", color=discord.Color.green())
-        elif option.emoji == '❌':
-            final_embed = discord.Embed(title="Oof", description="Maybe try again?", color=discord.Color.red())
+            await aki.win()
+
+            result_embed = discord.Embed(title="My guess....", colour=discord.Color.dark_blue())
+            result_embed.add_field(name=f"My first guess is **{aki.first_guess['name']}**", value=aki.first_guess['description'], inline=False)
+            result_embed.set_footer(text="Was I right? Add the reaction accordingly.")
+            result_embed.set_image(url=aki.first_guess['absolute_picture_path'])
+            result_message = await ctx.send(embed=result_embed)
+            self.bot.reactions.add(result_message, ['✅', '❌'])
+
+            emoji = await self.bot.reactions.wait(result_message, ctx.author, ['✅', '❌'], timeout=10)
+            if emoji ==  '✅':
+                final_embed = discord.Embed(title="I'm a fuckin genius", color=discord.Color.green())
+            elif emoji == '❌':
+                final_embed = discord.Embed(title="Oof", description="Maybe try again?", color=discord.Color.red())
         
-        return await ctx.send(content=None, embed=final_embed)
+            return await ctx.send(content=None, embed=final_embed)
 
 
     @commands.command(name="games-leaderboard", 
@@ -11,13 +11,18 @@ import datetime
 import random
 import asyncio
 import typing
-
-from tabulate import tabulate
+import more_itertools as mitertools
 
 from secret.webhooks import *
 from utils import embed as em
-from utils import converters
+from utils import text as text_tools
 from internal import enumerations as enums
+from internal.database import column
+from internal.guild_settings import ID_FIELDS, LIST_FIELDS
+from internal.purge import FILTER_HELP, Purge, PurgeFilter
+from internal import sql_console
+from internal.queries import BALANCE_COLUMNS, ITEM_COLUMNS
+from internal.response_cache import cached_response
 
 channels_available = ["bot-test","botspam-v2","botspam"]
 
@@ -30,8 +35,11 @@ class Moderator(commands.Cog):
         self.env = {}
 
     async def cog_check(self, ctx):
-        """Restricts commands to administrators only"""
-        return ctx.author.guild_permissions.administrator
+        """Restricts commands to administrators, and members with one of the guild's bot commander roles."""
+        if ctx.author.guild_permissions.administrator:
+            return True
+        commander_roles = self.bot.settings_for(ctx.guild).commander_roles
+        return any(role.id in commander_roles for role in ctx.author.roles)
 
     @commands.group(name="change-money",
                     aliases=["c-money","cm"],
@@ -41,7 +49,8 @@ class Moderator(commands.Cog):
 
     @change_money.command(name="add")
     async def add_money(self, ctx, baltype: str, user: discord.Member, amt: int):
-        await self.bot.db_pool.execute(f"UPDATE economy SET {baltype}={baltype} + $1 WHERE user_id=$2", amt, user.id)
+        baltype = column(baltype, BALANCE_COLUMNS)
+        await self.bot.db.execute(f"economy.add_{baltype}", amt, user.id)
         response = em.CrajyEmbed(title="Updating User Balance", description=f"Added {amt} to {user.display_name}\'s {baltype}.", embed_type=enums.EmbedType.SUCCESS)
         response.quick_set_author(ctx.author)
         response.set_thumbnail(url=em.EmbedResource.GREEN_UPDATE.value)
@@ -49,7 +58,8 @@ class Moderator(commands.Cog):
 
     @change_money.command(name="remove")
     async def remove_money(self, ctx, baltype: str, user: discord.Member, amt: int):
-        await self.bot.db_pool.execute(f"UPDATE economy SET {baltype}={baltype} - $1 WHERE user_id=$2", amt, user.id)
+        baltype = column(baltype, BALANCE_COLUMNS)
+        await self.bot.db.execute(f"economy.add_{baltype}", -amt, user.id)
         response = em.CrajyEmbed(title="Updating User Balance", description=f"Removed {amt} from {user.display_name}\'s {baltype}.", embed_type=enums.EmbedType.FAIL)
         response.quick_set_author(ctx.author)
         response.set_thumbnail(url=em.EmbedResource.RED_UPDATE.value)
@@ -57,7 +67,8 @@ class Moderator(commands.Cog):
 
     @change_money.command(name="set")
     async def set_money(self, ctx, baltype: str, user: discord.Member, amt: int):
-        await self.bot.db_pool.execute(f"UPDATE economy SET {baltype}=$1 WHERE user_id=$2", amt, user.id)
+        baltype = column(baltype, BALANCE_COLUMNS)
+        await self.bot.db.execute(f"economy.set_{baltype}", amt, user.id)
         response = em.CrajyEmbed(title="Updating User Balance", description=f"Set {user.display_name}\'s {baltype} to {amt}.", embed_type=enums.EmbedType.BOT)
         response.quick_set_author(ctx.author)
         response.set_thumbnail(url=em.EmbedResource.GREEN_UPDATE.value)
@@ -93,24 +104,28 @@ class Moderator(commands.Cog):
 
     @change_inventory.command(name="add")
     async def add_inv(self, ctx, amt: int, item: str, user: discord.Member):
-        await self.bot.db_pool.execute(f"UPDATE inventories SET {item}={item} + $1 WHERE user_id=$2", amt, user.id)
-        response = em.CrajyEmbed(title="Updating User Inventory", description=f"Added {amt} {item} to {user.display_name}\'s inventory.", embed_type=enums.EmbedType.SUCCESS)
+        item = self.bot.items.get(item)
+        await self.bot.items.give([(user.id, item, amt)])
+        response = em.CrajyEmbed(title="Updating User Inventory", description=f"Added {amt} {item.name} to {user.display_name}\'s inventory.", embed_type=enums.EmbedType.SUCCESS)
         response.quick_set_author(ctx.author)
         response.set_thumbnail(url=em.EmbedResource.GREEN_UPDATE.value)
         await ctx.reply(embed=response)
 
     @change_inventory.command(name="remove")
     async def remove_inv(self, ctx, amt: int, item: str, user: discord.Member):
-        await self.bot.db_pool.execute(f"UPDATE inventories SET {item}={item} - $1 WHERE user_id=$2", amt, user.id)
-        response = em.CrajyEmbed(title="Updating User Inventory", description=f"Remove {amt} {item} from {user.display_name}\'s inventory.", embed_type=enums.EmbedType.FAIL)
+        item = self.bot.items.get(item)
+        if not await self.bot.items.take(user.id, item, amt):
+            raise ValueError(f"{user.display_name} doesn't have {amt} {item.name}.")
+        response = em.CrajyEmbed(title="Updating User Inventory", description=f"Remove {amt} {item.name} from {user.display_name}\'s inventory.", embed_type=enums.EmbedType.FAIL)
         response.quick_set_author(ctx.author)
         response.set_thumbnail(url=em.EmbedResource.RED_UPDATE.value)
         await ctx.reply(embed=response)
 
     @change_inventory.command(name="set")
     async def set_inv(self, ctx, item: str, user: discord.Member, amt: int):
-        await self.bot.db_pool.execute(f"UPDATE inventories SET {item}=$1 WHERE user_id=$2", amt, user.id)
-        response = em.CrajyEmbed(title="Updating User Inventory", description=f"Set {amt} {item} to {user.display_name}\'s inventory.", embed_type=enums.EmbedType.BOT)
+        item = self.bot.items.get(item)
+        await self.bot.items.set_quantity(user.id, item, amt)
+        response = em.CrajyEmbed(title="Updating User Inventory", description=f"Set {amt} {item.name} to {user.display_name}\'s inventory.", embed_type=enums.EmbedType.BOT)
         response.quick_set_author(ctx.author)
         response.set_thumbnail(url=em.EmbedResource.GREEN_UPDATE.value)
         await ctx.reply(embed=response)
@@ -118,7 +133,8 @@ class Moderator(commands.Cog):
     @commands.command(name="edit-item", 
                     aliases=["edititem"],help="Edit an item on the shop.")
     async def edit_item(self, ctx, item: str, attribute: str, value: int):
-        await self.bot.db_pool.execute(f"UPDATE shop SET {attribute}=$1 WHERE item_name=$2", value, item)
+        attribute = column(attribute, ITEM_COLUMNS)
+        await self.bot.items.update(self.bot.items.get(item), **{attribute: value})
         response = em.CrajyEmbed(title="Updating Shop", description=f"Set {item} {attribute} to {value}.", embed_type=enums.EmbedType.BOT)
         response.quick_set_author(ctx.author)
         response.set_thumbnail(url=em.EmbedResource.GREEN_UPDATE.value)
@@ -126,9 +142,13 @@ class Moderator(commands.Cog):
 
     @commands.command(name="versions", aliases=['ver'], help="Returns CrajyBot and discord.py versions being used.")
     async def versions(self, ctx):
+        return await ctx.reply(embed=await self.versions_embed(ctx))
+
+    @cached_response(3600, name="versions")
+    async def versions_embed(self, ctx):
         embed = em.CrajyEmbed(title="Versions", description=f"[discord.py version: {discord.__version__}](https://github.com/Rapptz/discord.py)\n[Bot version: {self.bot.__version__}](https://github.com/anand2312/CrajyBot-private)", embed_type=enums.EmbedType.INFO)
         embed.set_thumbnail(url=self.bot.user.avatar_url)
-        return await ctx.reply(embed=embed)
+        return embed
 
     @commands.command(name="clear-pin", aliases=["clearpins", "clear-pins", "unpin"])
     async def remove_pins(self, ctx, identifiers: commands.Greedy[typing.Union[int, str]]):
@@ -154,9 +174,9 @@ class Moderator(commands.Cog):
             return await ask.edit(embed=confirm_embed)
         else:
             if len(identifiers) == 1 and identifiers[0].lower() == "all":
-                await self.bot.db_pool.execute("DELETE FROM pins")
+                await self.bot.db.execute("pins.delete_all")
             else:
-                await self.bot.db_pool.execute("DELETE FROM pins WHERE name=ANY($1) OR pin_id=ANY($2)", names, ids)
+                await self.bot.db.execute("pins.delete_some", names, ids)
 
     @commands.command(name="pin", help="Pins a message to the bot's database. Pins can be viewed with the `pins` command.")
     async def pin(self, ctx, id_: discord.Message, name_: str=None):
@@ -165,7 +185,7 @@ class Moderator(commands.Cog):
         author = id_.author
         date = datetime.date.today()
 
-        await self.bot.db_pool.fetchval("INSERT INTO pins(synopsis, jump_url, author, pin_date, name) VALUES($1, $2, $3, $4, $5)", synopsis, url, author.id, date, name_)
+        await self.bot.db.execute("pins.create", synopsis, url, author.id, date, name_)
         await id_.add_reaction("📌")
         reply_embed = em.CrajyEmbed(title=f"Pinned!", description=f"_{synopsis[:10]+'...'}_\n", embed_type=enums.EmbedType.SUCCESS)
         reply_embed.set_thumbnail(url=em.EmbedResource.PIN.value)
@@ -173,32 +193,171 @@ class Moderator(commands.Cog):
         reply_embed.set_footer(text=f"Pinned by {ctx.author.display_name}", icon_url=ctx.author.avatar_url)
         await ctx.send(embed=reply_embed)
 
-    @commands.command(name="query", aliases=["db"], help="Query the database. Don't mess with this if you don't know what it is doing.")
+    @commands.command(name="query", aliases=["db"],
+                      help="Runs a read-only query. Shows the first rows, and attaches the whole result as a gzipped CSV.")
     @commands.is_owner()
-    async def sql_query(self, ctx, table: str, query: str):
-        # wrap query in quotes
-        columns =  enums.Table[table.upper()].value
-        data = await self.bot.db_pool.fetch(query)
-        tabulated = tabulate(data, headers=columns)
-        out = "```" + tabulated + "```"
-        return await ctx.reply(out, mention_author=True)
+    async def sql_query(self, ctx, *, query: str):
+        result = await sql_console.run_query(self.bot.db_pool, sql_console.strip_code_block(query))
+        try:
+            summary = result.summary()
+            # the table goes in a code block, after the summary line
+            table = result.table(text_tools.DISCORD_LIMIT - len(summary) - 10)
+            await ctx.reply(f"{summary}\n```{table}```", mention_author=True,
+                            file=discord.File(result.file, filename="result.csv.gz") if result.rows else None)
+        finally:
+            result.file.close()
                                     
-    @commands.command(name="clear")
-    async def clear(self, ctx, amount: int, filter: commands.Greedy[converters.KwargConverter] = None):
-        if filter:
-            def check(message):
-                merged_kwargs = {key: value for inner in filter for key, value in inner.items()}
-                results = []
-                for key, value in merged_kwargs.items():
-                    attr = getattr(message, key, None)
-                    check_result = attr.name == value or str(attr.id) == value
-                    results.append(check_result)
-                return any(results)
-        else:
-            check = None
-        deleted = await ctx.channel.purge(limit=amount, check=check)
-        return await ctx.send(f"{em.EmbedResource.CHECK_EMOJI.value} Cleared {len(deleted)} messages.", delete_after=5)
-    
+    @commands.command(name="jobs", help="Shows the health of every periodic job the bot runs.")
+    @commands.is_owner()
+    async def jobs(self, ctx):
+        embed = em.CrajyEmbed(title="Periodic Jobs", embed_type=enums.EmbedType.BOT)
+        embed.quick_set_author(self.bot.user)
+        for job in self.bot.jobs:
+            embed.add_field(name=job.name, value=job.summary(), inline=False)
+        if not self.bot.jobs.jobs:
+            embed.description = "No jobs are registered."
+        return await ctx.reply(embed=embed)
+
+    @commands.command(name="feeds", help="Shows the health and cache stats of every cached API feed.")
+    @commands.is_owner()
+    async def feeds(self, ctx):
+        embed = em.CrajyEmbed(title="Cached Feeds", embed_type=enums.EmbedType.BOT)
+        embed.quick_set_author(self.bot.user)
+        for name, feed in self.bot.feeds.items():
+            embed.add_field(name=name, value=feed.summary(), inline=False)
+        if not self.bot.feeds:
+            embed.description = "No feeds are registered."
+        return await ctx.reply(embed=embed)
+
+    @commands.command(name="sessions", help="Shows every live game session, and roughly how much memory each holds.")
+    @commands.is_owner()
+    async def sessions(self, ctx):
+        manager = self.bot.sessions
+        embed = em.CrajyEmbed(title="Game Sessions", description=f"{len(manager)} live, {manager.evicted} evicted for being idle.", embed_type=enums.EmbedType.BOT)
+        embed.quick_set_author(self.bot.user)
+        for kind, sessions in manager.sessions.items():
+            if sessions:
+                per_channel, total = manager.limits.get(kind, (1, 50))
+                embed.add_field(name=f"{kind} ({len(sessions)}/{total}, {per_channel} per channel)",
+                                value="\n".join(session.summary() for session in sessions)[:1024], inline=False)
+        return await ctx.reply(embed=embed)
+
+    @commands.command(name="typing-stats", help="Shows how many typing indicator requests were saved, and which commands are slow.")
+    @commands.is_owner()
+    async def typing_stats(self, ctx):
+        scheduler = self.bot.typing
+        embed = em.CrajyEmbed(title="Typing Indicator", description=scheduler.summary(), embed_type=enums.EmbedType.BOT)
+        embed.quick_set_author(self.bot.user)
+        slowest = sorted(scheduler.latency.items(), key=lambda item: item[1], reverse=True)[:10]
+        if slowest:
+            embed.add_field(name="Slowest commands (EWMA)", value="\n".join(f"`{name}` {seconds * 1000:.0f}ms" for name, seconds in slowest), inline=False)
+        return await ctx.reply(embed=embed)
+
+    @commands.command(name="pipeline", help="Shows how many messages each message stage ran for or skipped, and how long it took.")
+    @commands.is_owner()
+    async def pipeline(self, ctx):
+        pipeline = self.bot.pipeline
+        embed = em.CrajyEmbed(title="Message Pipeline", embed_type=enums.EmbedType.BOT,
+                              description=f"{pipeline.stats['messages']} messages, {pipeline.stats['scheduled']} stage runs, {pipeline.stats['failed']} failed.\n"
+                                          f"Filtering: {pipeline.filtering.summary('µs', 1e6)}")
+        embed.quick_set_author(self.bot.user)
+        for name, stage in pipeline.stages.items():
+            embed.add_field(name=name, value=stage.summary(), inline=False)
+        return await ctx.reply(embed=embed)
+
+    @commands.command(name="response-cache", aliases=["rcache"], help="Shows the hit rate of every cached command response.")
+    @commands.is_owner()
+    async def response_cache(self, ctx):
+        cache = self.bot.response_cache
+        embed = em.CrajyEmbed(title="Response Cache", description=f"{len(cache)} cached responses.", embed_type=enums.EmbedType.BOT)
+        embed.quick_set_author(self.bot.user)
+        for name, counter in sorted(cache.counters.items()):
+            embed.add_field(name=name, value=counter.summary(), inline=False)
+        return await ctx.reply(embed=embed)
+
+    @commands.group(name="settings", invoke_without_command=True,
+                    help="Shows this server's bot settings. Use the subcommands to change them.")
+    async def settings(self, ctx):
+        settings = self.bot.settings_for(ctx.guild)
+        embed = em.CrajyEmbed(title="Server Settings", embed_type=enums.EmbedType.BOT)
+        embed.quick_set_author(self.bot.user)
+        for name in ID_FIELDS:
+            value = getattr(settings, name)
+            embed.add_field(name=name, value="-" if value is None else f"`{value}`")
+        for name in LIST_FIELDS:
+            ids = getattr(settings, name)
+            embed.add_field(name=name, value=", ".join(f"`{i}`" for i in sorted(ids)) or "-", inline=False)
+        embed.set_footer(text="Empty economy/betting channel lists allow those commands in every channel.")
+        return await ctx.reply(embed=embed)
+
+    @settings.command(name="set", help=f"Sets one of {', '.join(ID_FIELDS)} to a channel or role ID, or `none`.")
+    async def settings_set(self, ctx, name: str, value: str):
+        if name not in ID_FIELDS:
+            raise commands.BadArgument(f"Setting must be one of {', '.join(ID_FIELDS)}.")
+        new_value = None if value.lower() == "none" else int(value.strip("<#@&!>"))
+        await self.bot.guild_settings.update(ctx.guild.id, **{name: new_value})
+        await ctx.check_mark()
+
+    @settings.command(name="add", help=f"Adds channels or roles to one of {', '.join(LIST_FIELDS)}.")
+    async def settings_add(self, ctx, name: str, targets: commands.Greedy[typing.Union[discord.TextChannel, discord.Role]]):
+        if name not in LIST_FIELDS:
+            raise commands.BadArgument(f"Setting must be one of {', '.join(LIST_FIELDS)}.")
+        current = getattr(self.bot.settings_for(ctx.guild), name)
+        await self.bot.guild_settings.update(ctx.guild.id, **{name: current | {i.id for i in targets}})
+        await ctx.check_mark()
+
+    @settings.command(name="remove", help=f"Removes channels or roles from one of {', '.join(LIST_FIELDS)}.")
+    async def settings_remove(self, ctx, name: str, targets: commands.Greedy[typing.Union[discord.TextChannel, discord.Role]]):
+        if name not in LIST_FIELDS:
+            raise commands.BadArgument(f"Setting must be one of {', '.join(LIST_FIELDS)}.")
+        current = getattr(self.bot.settings_for(ctx.guild), name)
+        await self.bot.guild_settings.update(ctx.guild.id, **{name: current - {i.id for i in targets}})
+        await ctx.check_mark()
+
+    @commands.command(name="dbstats", help="Shows latency and row counts for every database statement that has been run.")
+    @commands.is_owner()
+    async def dbstats(self, ctx):
+        config = self.bot.config
+        used = sorted((s for s in self.bot.db.statements.values() if s.latency.count), key=lambda s: s.latency.total, reverse=True)
+        embeds = []
+        for chunk in mitertools.chunked(used, 6):
+            embed = em.CrajyEmbed(title="Database Statements", embed_type=enums.EmbedType.BOT)
+            embed.quick_set_author(self.bot.user)
+            embed.description = (f"Pool size {config.db_min_size}-{config.db_max_size}, statement cache {config.db_statement_cache_size}. "
+                                 f"Slow query threshold: {self.bot.db.slow_query_threshold * 1000:.0f}ms.")
+            for statement in chunk:
+                embed.add_field(name=statement.name, value=statement.summary(), inline=False)
+            embeds.append(embed)
+        if not embeds:
+            return await ctx.reply("No statements have been run yet.")
+        pages = em.quick_embed_paginate(embeds)
+        await pages.start(ctx)
+
+    @commands.command(name="clear",
+                      help=f"Deletes the messages among the last `amount` that match every filter given. Filters: {FILTER_HELP}.")
+    async def clear(self, ctx, amount: int, *filters: str):
+        purge_filter = PurgeFilter.parse(ctx.guild, filters)
+        channel = purge_filter.channel or ctx.channel
+        if not channel.permissions_for(ctx.author).manage_messages:
+            raise ValueError(f"You can't delete messages in {channel.mention}.")
+        predicate = purge_filter.compile(datetime.datetime.utcnow())
+
+        embed = em.CrajyEmbed(title=f"Clearing #{channel.name}", description="Starting...", embed_type=enums.EmbedType.INFO)
+        embed.quick_set_author(ctx.author)
+        status = await ctx.send(embed=embed)
+
+        async def report(progress):
+            embed.description = progress.summary()
+            await status.edit(embed=embed)
+
+        # the status message stays; history starts right before it, so the command message can be cleared too
+        purge = Purge(channel, predicate, amount, before=status if channel == ctx.channel else None, on_progress=report)
+        progress = await purge.run()
+        embed.colour = (enums.EmbedType.WARNING if progress.failed else enums.EmbedType.SUCCESS).value
+        embed.title = f"{em.EmbedResource.CHECK_EMOJI.value} Cleared {progress.deleted} messages in #{channel.name}"
+        embed.description = progress.summary()
+        await status.edit(embed=embed, delete_after=10)
+
     @commands.is_owner()
     @commands.command(name="internal-eval", aliases=["int-eval"])
     async def internal_eval(self, ctx, *, code: str):
@@ -1,14 +1,15 @@
 """Some commands to store user notes."""
-from datetime import datetime
+import datetime
 from typing import Optional
 import more_itertools as mitertools
+import pytz
 
 import discord
 from discord.ext import commands, menus
 
-from utils.converters import CustomTimeConverter
 from internal.enumerations import EmbedType
 from utils import embed as em
+from utils import timezone
 
 
 class Notes(commands.Cog):
@@ -17,13 +18,19 @@ class Notes(commands.Cog):
 
     async def remind(self, user: discord.Member, about: int) -> None:
         """Function that will remind the user about the note with ID `about`."""
-        data = await self.bot.db_pool.fetchval("DELETE FROM notes WHERE note_id = $1 RETURNING raw_note", about)
+        data = await self.bot.db.fetchval("notes.pop_reminder", about)
+        if data is None:    # already reminded, by this or another process
+            return
         embed = em.CrajyEmbed(title=f"You reminder is here.", embed_type=EmbedType.INFO)
         embed.description = data
         embed.quick_set_author(user)
         embed.set_thumbnail(url=em.EmbedResource.NOTES.value)
         return await user.send(embed=embed)
 
+    async def user_timezone(self, user: discord.abc.User) -> datetime.tzinfo:
+        name = await self.bot.db.fetchval("user_details.timezone", user.id)
+        return pytz.timezone(name) if name else timezone.BOT_TZ
+
     @commands.group(help="Note making commands.")
     async def notes(self, ctx):
         if ctx.invoked_subcommand is None:
@@ -33,22 +40,28 @@ class Notes(commands.Cog):
                    aliases=["-c"],
                    help="Saves a note. Notes are personal; only you can retrieve your notes. You can invoke these commands in"
                         "DMs with the bot as well."
-                        "You can also specify a `time`, after which the bot should remind you about a note.")
-    async def notes_create(self, ctx, time: commands.Greedy[CustomTimeConverter], *, content):
-        is_reminder = False if time == [] else True
-        note_id = await self.bot.db_pool.fetchval("INSERT INTO notes(user_id, raw_note, reminder) VALUES($1, $2, $3) RETURNING note_id", ctx.author.id, content, is_reminder)
+                        "You can also start the note with a time, at which the bot should remind you about it: `1h30m`, "
+                        "`in 2 weeks`, `tomorrow 9am` or `2026-12-01 18:00`. Times are in your `.remind timezone`.")
+    async def notes_create(self, ctx, *, content):
+        tz = await self.user_timezone(ctx.author)
+        when, content = timezone.split_time(content, tz=tz)
+        if not content:
+            raise ValueError("What should the note say?")
+        if when is not None and when <= datetime.datetime.now(datetime.timezone.utc):
+            raise ValueError(f"{when:%H:%M, %d %B %Y} has already passed.")
+        note_id = await self.bot.db.fetchval("notes.create", ctx.author.id, content, when is not None)
         embed = em.CrajyEmbed(title=f"Note Creation: ID {note_id}", embed_type=EmbedType.SUCCESS)
         embed.quick_set_author(ctx.author)
         embed.set_thumbnail(url=em.EmbedResource.NOTES.value)
 
-        if time == []:
+        if when is None:
             # don't schedule
             embed.description = f"Added to your notes! Use `.notes return` to get all your stored notes."
         else:
-            now = datetime.utcnow()
-            self.bot.scheduler.schedule(self.remind(ctx.author, note_id), now + time)
-            self.bot.db_pool.execute("INSERT INTO tasks(task_id, exec_time) VALUES($1, $2)", note_id, now + time)
-            embed.description =  f"You will be reminded about this in {time}. Use `.notes return` to get all your stored notes."
+            exec_time = when.astimezone(pytz.utc).replace(tzinfo=None)    # the scheduler and tasks table use naive UTC
+            self.bot.scheduler.schedule(self.remind(ctx.author, note_id), exec_time)
+            await self.bot.db.execute("tasks.create", note_id, exec_time)
+            embed.description =  f"You will be reminded about this at {when:%H:%M, %d %B %Y} ({when.tzname()}). Use `.notes return` to get all your stored notes."
 
         await ctx.maybe_reply(embed=embed)
 
@@ -57,9 +70,9 @@ class Notes(commands.Cog):
                    help="DMs you all the notes that you have saved, or the specific note that you asked for. ")
     async def notes_return(self, ctx, note_id: commands.Greedy[int] = None):
         if note_id is None:
-            data = await self.bot.db_pool.fetch("SELECT note_id, raw_note FROM notes WHERE user_id=$1", ctx.author.id)
+            data = await self.bot.db.fetch("notes.all", ctx.author.id)
         else:
-            data = await self.bot.db_pool.fetch("SELECT note_id, raw_note FROM notes WHERE user_id=$1 AND note_id=ANY($2::INT[])", ctx.author.id, note_id)
+            data = await self.bot.db.fetch("notes.some", ctx.author.id, note_id)
         if not data:     # if no records
             embed = em.CrajyEmbed(title="Fetched Notes", embed_type=EmbedType.WARNING)
             embed.quick_set_author(self.bot.user)
@@ -95,9 +108,9 @@ class Notes(commands.Cog):
 
         if decision:
             if note_id is None:
-                await self.bot.db_pool.execute("DELETE FROM notes WHERE user_id=$1", ctx.author.id)
+                await self.bot.db.execute("notes.delete_all", ctx.author.id)
             else:
-                await self.bot.db_pool.execute("DELETE FROM notes WHERE user_id=$1 AND note_id=ANY($2::INT[])", ctx.author.id, note_id)
+                await self.bot.db.execute("notes.delete_some", ctx.author.id, note_id)
             out = em.CrajyEmbed(title="Deleted Notes", embed_type=EmbedType.SUCCESS)
             out.description = "Deleted notes."
         else:
@@ -109,13 +122,30 @@ class Notes(commands.Cog):
         return await ask.edit(embed=out)
 
     @commands.group(name="remind", aliases=["reminder", "remindme"], invoke_without_command=True,
-                      help="Alias for `.notes create`, but the `time` argument is compulsory now.")
-    async def create_reminder(self, ctx, time: CustomTimeConverter, *, content):
-        return await self.notes_create(ctx, time, content=content)
+                      help="Alias for `.notes create`, but the note has to start with a time now.")
+    async def create_reminder(self, ctx, *, content):
+        when, _ = timezone.split_time(content)
+        if when is None:
+            raise ValueError("When should I remind you? Start with a time, like `.remind tomorrow 9am buy milk` or `.remind 1h30m stretch`.")
+        return await self.notes_create(ctx, content=content)
+
+    @create_reminder.command(name="timezone", aliases=["tz"],
+                             help="Shows or sets the time zone your reminders are in, like `Europe/London` or `Asia/Kolkata`.")
+    async def reminder_timezone(self, ctx, name: str = None):
+        if name is None:
+            tz = await self.user_timezone(ctx.author)
+            return await ctx.reply(f"Your reminders are in `{tz.zone}`.")
+        try:
+            tz = pytz.timezone(name)
+        except pytz.UnknownTimeZoneError:
+            raise ValueError(f"There's no time zone called `{name}`. Use a name like `Europe/London` or `Asia/Kolkata`.")
+        await self.bot.db.execute("user_details.set_timezone", tz.zone, ctx.author.id)
+        await ctx.check_mark()
+        return await ctx.reply(f"Your reminders are in `{tz.zone}` now; it's {datetime.datetime.now(tz):%H:%M} there.")
                               
     @create_reminder.command(name="list", help="Returns a list of all reminders you have.")
     async def reminder_list(self, ctx):
-        data = await self.bot.db_pool.fetch("SELECT note_id, raw_note FROM notes WHERE user_id = $1 AND reminder", ctx.author.id)    # retrieve only those notes that have been marked as reminders.
+        data = await self.bot.db.fetch("notes.reminders", ctx.author.id)    # retrieve only those notes that have been marked as reminders.
         chunked = mitertools.chunked(data, 4)
         embeds = []
         for chunk in chunked:
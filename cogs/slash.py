@@ -21,7 +21,7 @@ class CrajySlashCommands(commands.Cog):
                             option_type=3,
                             required=True)])
     async def slash_wat(self, ctx: SlashContext, use: str):
-        existing = await self.bot.db_pool.fetchval("SELECT content FROM tags WHERE LOWER(tag_name)=$1", use)
+        existing = await self.bot.db.fetchval("tags.content_insensitive", use)
         await ctx.send(content=existing)
 
 def setup(bot):
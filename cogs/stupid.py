@@ -1,19 +1,22 @@
 """Some fun commands."""
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 
 from typing import Optional, Union
-import random
+import datetime
 
 from contextlib import suppress
 import more_itertools as mitertools
 
-from secret.constants import GUILD_ID, ROLE_NAME
 from secret.KEY import *  
-from secret.TOKEN import *  
 
 from utils import embed as em
+from utils import text as text_tools
+from utils.shufflebag import ShuffleBag
 from internal import enumerations as enums
+from internal.feeds import CachedFeed, DiskFeedStore
+from internal.pipeline import Stage
+from internal.response_cache import cached_response
 
 #API requests headers and URLs
 fancy_url = "https://ajith-fancy-text-v1.p.rapidapi.com/text"
@@ -30,16 +33,38 @@ love_headers = {
     'x-rapidapi-key': KEY
     }
 
+currency_url = "https://free.currconv.com/api/v7/convert"
+
+CURRENCIES = ("usd", "omr", "inr", "eur")
+CURRENCY_ALIASES = {"euro": "eur", "euros": "eur", "rial": "omr", "rials": "omr", "rupees": "inr", "rs": "inr"}
+CURRENCY_WORDS = frozenset(CURRENCIES) | frozenset(CURRENCY_ALIASES)
+
+ROLE_RENAME_INTERVAL = datetime.timedelta(hours=12)
+# discord rate limits role edits fairly aggressively; never rename the role more often than this.
+ROLE_EDIT_COOLDOWN = datetime.timedelta(minutes=10)
+
 class Stupid(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
         self.pin_cache = set()
         self.pin_vote_threshold = 4
-        # a loop that changes the name of a role, based on names saved in the database. Names are added with the `role-name` command
 
-        self.bot.task_loops['role_name'] = self.role_name_loop  
-        self.bot.task_loops['qotd_cache'] = self.qotd_cache_loop
+        # the name of a role is changed periodically, based on names saved in the database. Names are added with the `role-name` command.
+        # names are cached in a shuffle-bag (so that names don't repeat until all of them have been used), along with their author's ID.
+        self.role_names = ShuffleBag()
+        self.role_name_authors = {}
+        self.role_names_loaded = False
+        self.last_role_edit = None
+        self.role_rename_task = None
+        self.bot.loop.create_task(self.start_role_rotation())
+
+        # the quotes.rest API has a very strict limit on the number of free requests, and the currency API isn't much better,
+        # so both are fetched periodically and cached instead of being requested every time they're needed.
+        self.qotd_feed = self.bot.add_feed(CachedFeed("qotd", self.fetch_qotd, ttl=3600, store=DiskFeedStore()))
+        self.fx_feed = self.bot.add_feed(CachedFeed("fx_rates", self.fetch_fx_rates, ttl=3600, store=DiskFeedStore()))
+
+        self.bot.pipeline.add(Stage("currency", self.convert_currency, commands=False, keywords=CURRENCY_WORDS))
 
         try:
             self.anotherchat_webhook = discord.Webhook.partial(ANOTHERCHAT_HOOK['id'], ANOTHERCHAT_HOOK['token'], adapter=discord.AsyncWebhookAdapter(self.bot.session))
@@ -47,48 +72,52 @@ class Stupid(commands.Cog):
         except:
             pass
 
-        self.cached_qotd = None
-
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        # REWRITE THIS.
-        if message.author.bot: return
-        currencies = {"usd", "omr", "inr", "eur"}
-        message_string = message.content.lower().replace("euro", "eur")
-        message_string = message_string.replace("rial", "omr")
-        message_string = message_string.replace("rupees", "inr")
-        message_string = message_string.replace("rs", "inr")
-
-        converted = []
-        splitted = message_string.split()
-
-        for index, word in enumerate(splitted):
-            if word in currencies:
-                init_cur = word
-                number = int(splitted[index-1])
+    def cog_unload(self):
+        self.bot.pipeline.remove("currency")
+        self.bot.remove_feed(self.qotd_feed.name)
+        self.bot.remove_feed(self.fx_feed.name)
+        if self.role_rename_task is not None:
+            self.bot.scheduler.cancel(self.role_rename_task)
+
+    async def convert_currency(self, incoming):
+        """Converts amounts like "100 usd" in chat to the other currencies. Only messages with a currency word reach this
+        (see the stage's keywords); the amount is the number right before a currency word."""
+        tokens = incoming.tokens
+        for index, word in enumerate(tokens):
+            if word in CURRENCY_WORDS and index > 0 and tokens[index-1][0].isdigit():
+                init_cur = CURRENCY_ALIASES.get(word, word)
+                number = float(tokens[index-1])
                 break
         else:
             return
-        
-        url1 = f"https://free.currconv.com/api/v7/convert?apiKey={CURRENCY_KEY}&q={init_cur}_OMR,{init_cur}_INR"
-        url2 = f"https://free.currconv.com/api/v7/convert?apiKey={CURRENCY_KEY}&q={init_cur}_USD,{init_cur}_EUR"
-        async with self.bot.session.get(url1) as resp1, self.bot.session.get(url2) as resp2:
-            data1 = await resp1.json()
-            data2 = await resp2.json()
-            rates = {}
-            for key, value in data1["results"].items():
-                if value["val"] != 1:
-                    rates[key] = value["val"]
-            for key, value in data2["results"].items():
-                if value["val"] != 1:
-                    rates[key] = value["val"]
-
-        for key, value in rates.items():
-            res_string = f"{key[4:]} {value * number}"
-            converted.append(res_string)
+
+        rates = await self.fx_feed.get()    # units of each currency per USD
+        in_usd = number / rates[init_cur]
+        converted = [f"{cur.upper()} {in_usd * rates[cur]:.2f}" for cur in CURRENCIES if cur != init_cur]
         joined = "\n".join(converted)
-        out = f"{number} {init_cur} is:\n{joined}"
-        return await message.reply(out)
+        out = f"{number:g} {init_cur} is:\n{joined}"
+        return await incoming.message.reply(out)
+
+    async def fetch_fx_rates(self) -> dict:
+        """Fetches USD exchange rates for all currencies in CURRENCIES. The free API allows 2 conversions per request;
+        conversions between other pairs are calculated from these."""
+        pairs = [f"USD_{cur.upper()}" for cur in CURRENCIES if cur != "usd"]
+        rates = {"usd": 1.0}
+        for chunk in mitertools.chunked(pairs, 2):
+            params = {"apiKey": CURRENCY_KEY, "q": ",".join(chunk)}
+            async with self.bot.session.get(currency_url, params=params) as response:
+                response.raise_for_status()
+                data = await response.json()
+            for key, value in data["results"].items():
+                rates[key[4:].lower()] = value["val"]
+        return rates
+
+    async def fetch_qotd(self) -> str:
+        async with self.bot.session.get(r"http://quotes.rest/qod.json") as response:
+            response.raise_for_status()
+            data = await response.json()
+        quote = data['contents']['quotes'][0]
+        return f"{quote['quote']}\n~{quote['author']}"
                 
     async def on_reaction_add(self, reaction, user):
         if str(reaction) == "📌" and user != self.bot.user:
@@ -143,43 +172,32 @@ class Stupid(commands.Cog):
             sent_message = await ctx.maybe_reply(embed=embed)
             await ctx.check_mark(sent_message)
 
-    @commands.command(name="weird", aliases=["w"])
+    async def send_transformed(self, ctx, name: str, text: str):
+        """Runs the text through a transform, and any chained after it (`.owo | weird text`), and sends the result."""
+        names, text = text_tools.parse_chain(name, text)
+        if not text:
+            raise ValueError("Give me some text to transform.")
+        chain = text_tools.compile_chain(names)
+        pieces = text_tools.split_message(chain(text[:text_tools.DISCORD_LIMIT]))
+        await ctx.maybe_reply(pieces[0])
+        for piece in pieces[1:text_tools.MAX_MESSAGES]:
+            await ctx.send(piece)
+
+    @commands.command(name="weird", aliases=["w"], help="hElLo WoRlD. Chain other transforms after it: `.weird | emojify text`.")
     async def weird(self, ctx, *, message):
-        out = ''
-        curr_func = "lower"
-        for i in message:
-            if curr_func == "lower":
-                out += i.lower()
-                curr_func = "upper"
-            else:
-                out += i.upper()
-                curr_func = "lower"
-        await ctx.maybe_reply(out)
+        await self.send_transformed(ctx, "weird", message)
     
-    @commands.command(name="emojify", aliases=['e'])
+    @commands.command(name="emojify", aliases=['e'], help="Spells the text in letter emojis. Chain other transforms after it: `.emojify | weird text`.")
     async def emojify(self, ctx, *, message):
-        emojis = {'a':'🇦', 'b': '🇧', 'c':'🇨', 'd':'🇩', 'e':'🇪', 'f': '🇫', 'g': '🇬', 'h':'🇭', 'i': '🇮', 'j':'🇯', 'k':'🇰', 'l':'🇱', 'm':'🇲', 'n':'🇳', 'o':'🇴', 'p':'🇵', 'q':'🇶', 'r':'🇷', 's':'🇸', 't':'🇹', 'u':'🇺', 'v':'🇻', 'w':'🇼', 'x':'🇽', 'y':'🇾', 'z':'🇿'}
-        out = ""
-        for letter in message.lower():
-            if letter.isalpha():
-                out += f"{emojis[letter]} "
-            else:
-                out += letter
-        await ctx.maybe_reply(out)
+        await self.send_transformed(ctx, "emojify", message)
 
-    @commands.command(name="owo", aliases=["uwu"])
+    @commands.command(name="owo", aliases=["uwu"], help="Makes the text owo. Chain other transforms after it: `.owo | weird text`.")
     async def owo(self, ctx, *, text):
-        out = ""
-        for i in text:
-            case = "upper" if i.isupper() else "lower"
-            if i.lower() in ["l","r"]: out += "w" if case=="lower" else "W"
-            else: out+=i
-
-        await ctx.maybe_reply(out)
+        await self.send_transformed(ctx, "owo", text)
         
     @commands.command(name="pins", help="Display the messages pinned in the bot database. Useful if your channel has already reached the 50 pin limit.")
     async def pins(self, ctx): 
-        data = await self.bot.db_pool.fetch("SELECT pin_id, synopsis, jump_url, author, pin_date FROM pins")
+        data = await self.bot.db.fetch("pins.list")
 
         embeds = []
 
@@ -202,15 +220,17 @@ class Stupid(commands.Cog):
         await pages.start(ctx)
 
     @commands.command(name="fetch-pin", aliases=["fetchpin"], help="Return a pin based on the ID provided. WIP.")
-    async def fetch_pin(self, ctx, identifier: Union[str, int]):
+    async def fetch_pin(self, ctx, identifier: Union[int, str]):
 
-        if identifier.isalpha():
-            data = await self.bot.db_pool.execute("SELECT pin_id, synopsis, jump_url, pin_date FROM pins WHERE name=$1", identifier)
-        elif identifier.isdigit():
-            data = await self.bot.db_pool.execute("SELECT pin_id, synopsis, jump_url, pin_date FROM pins WHERE pin_id=$1", identifier)
+        if isinstance(identifier, int):
+            data = await self.bot.db.fetchrow("pins.by_id", identifier)
+        else:
+            data = await self.bot.db.fetchrow("pins.by_name", identifier)
+        if data is None:
+            raise ValueError(f"No pin found for {identifier}.")
 
-        embed = em.CrajyEmbed(title=f"Pin **{data['_id']}**", url=data["jump_url"], embed_type=enums.EmbedType.INFO)
-        embed.description = f"**{data['synopsis']}**\n  _by {data['author']} on {data['pin_date']}_"
+        embed = em.CrajyEmbed(title=f"Pin **{data['pin_id']}**", url=data["jump_url"], embed_type=enums.EmbedType.INFO)
+        embed.description = f"**{data['synopsis']}**\n  _by <@{data['author']}> on {data['pin_date']}_"
         embed.set_thumbnail(url=em.EmbedResource.TAG)
         embed.set_footer(text=f"Requested by {ctx.author.nick}. Click on the embed title to go to the message.", icon_url=ctx.author.avatar_url)
         return await ctx.maybe_reply(embed=embed)
@@ -224,7 +244,11 @@ class Stupid(commands.Cog):
     @commands.group(name="role-name", aliases=["rolename", "rolenames"], invoke_without_command=True)
     async def role_name(self, ctx, *, name: str):
 
-        await self.bot.db_pool.execute("INSERT INTO role_names(role_name, author) VALUES ($1, $2)", name, ctx.author.id)
+        await self.bot.db.execute("role_names.create", name, ctx.author.id)
+        if self.role_names_loaded:
+            self.role_names.add(name)
+            self.role_name_authors[name] = ctx.author.id
+        self.bot.response_cache.invalidate("role_names")
 
         embed = em.CrajyEmbed(title="Added!", description=f"`{name}` was added to the database. It will be picked randomly.", embed_type=enums.EmbedType.SUCCESS, url=r"https://www.youtube.com/watch?v=DLzxrzFCyOs")
         embed.quick_set_author(ctx.author)
@@ -234,26 +258,42 @@ class Stupid(commands.Cog):
 
     @role_name.command(name="list", aliases=["all"])
     async def role_name_list(self, ctx):
-        data = await self.bot.db_pool.fetch("SELECT role_name, author FROM role_names")
-        embed = em.CrajyEmbed(title="Role names", embed_type=enums.EmbedType.BOT)
-        embed.set_thumbnail(url=em.EmbedResource.PIN.value)
-        out = []
-        for i in data:
-            author = ctx.guild.get_member(i['author'])
-            line = f"• **{i['role_name']}**, _by {author.display_name}_"
-            out.append(line)
-        embed.description = "\n".join(out)
-        return await ctx.maybe_reply(embed=embed)
+        embeds = await self.role_name_pages(ctx)
+        if len(embeds) == 1:
+            return await ctx.maybe_reply(embed=embeds[0])
+        pages = em.quick_embed_paginate(embeds)
+        await pages.start(ctx)
+
+    @cached_response(600, tags=["role_names"], name="role-name list")
+    async def role_name_pages(self, ctx):
+        await self.load_role_names()
+        embeds = []
+        for chunk in mitertools.chunked(self.role_names, 10):
+            embed = em.CrajyEmbed(title="Role names", embed_type=enums.EmbedType.BOT)
+            embed.set_thumbnail(url=em.EmbedResource.PIN.value)
+            # mentions render as the user's name without having to look up the member
+            embed.description = "\n".join(f"• **{name}**, _by <@{self.role_name_authors[name]}>_" for name in chunk)
+            embeds.append(embed)
+
+        if not embeds:
+            embed = em.CrajyEmbed(title="Role names", description="No role names saved yet. Add one with `.role-name <name>`.", embed_type=enums.EmbedType.WARNING)
+            embed.set_thumbnail(url=em.EmbedResource.PIN.value)
+            embeds.append(embed)
+        return embeds
 
     @role_name.command(name="remove", aliases=["delete"])
     @commands.has_guild_permissions(administrator=True)
     async def role_name_remove(self, ctx, *names: str):      # can pass multiple role names to bulk delete. each arg must be wrapped in quotes.
-        await self.bot.db_pool.execute("DELETE FROM role_names WHERE LOWER(role_name) = ANY($1)", names)
+        deleted = await self.bot.db.fetch("role_names.delete", [i.lower() for i in names])
+        for record in deleted:
+            self.role_names.remove(record['role_name'])
+            self.role_name_authors.pop(record['role_name'], None)
+        self.bot.response_cache.invalidate("role_names")
 
         embed = em.CrajyEmbed(title="Deleting Role Names", embed_type=enums.EmbedType.BOT)
         listed_names = '\n'.join(f'• {i}' for i in names)
         embed.description = f"Deleted:\n ```{listed_names}```"
-        embed.set_thumbnail(url=em.EmbedType.TRASHCAN.value)
+        embed.set_thumbnail(url=em.EmbedResource.TRASHCAN.value)
         embed.quick_set_author(self.bot.user)
         embed.set_footer(text="Note: Names are deleted if they existed in the database in the first place.")
 
@@ -261,7 +301,7 @@ class Stupid(commands.Cog):
 
     @commands.command(name="quote", aliases=["qotd"], help="Displays a random quote.")
     async def qotd(self, ctx):
-        await ctx.reply(self.cached_qotd, mention_author=False)
+        await ctx.reply(await self.qotd_feed.get(), mention_author=False)
 
     @commands.command(name="change-presence", aliases=["changepresence", "changestatus", "change-status"], help="Change the bot's status.")
     @commands.cooldown(1, 600, type=commands.BucketType.guild)
@@ -287,32 +327,43 @@ class Stupid(commands.Cog):
         await ctx.check_mark()
         return await self.bot.change_presence(status=discord.Status.online, activity=discord_activity)
 
-    @tasks.loop(hours=1)
-    async def qotd_cache_loop(self):
-        # DOES THIS STILL WORK?
-        """The quotes.rest API has a very strict limit on number of requests that are given for free, so
-        instead of making requests everytime the command is called, this loop does the request once an hour and 
-        caches it for further use."""
-        async with self.bot.session.get(r"http://quotes.rest/qod.json") as response:
-            data = await response.json()
-        self.cached_qotd = f"{data['contents']['quotes'][0]['quote']}\n~{data['contents']['quotes'][0]['author']}"
-        return
+    async def load_role_names(self) -> None:
+        """Fills the role name cache from the database. Only hits the database once; the cache is kept in sync by the
+        add/remove commands after that."""
+        if self.role_names_loaded:
+            return
+        data = await self.bot.db.fetch("role_names.all")
+        for record in data:
+            self.role_names.add(record['role_name'])
+            self.role_name_authors[record['role_name']] = record['author']
+        self.role_names_loaded = True
 
-    @qotd_cache_loop.before_loop
-    async def before_qotd_cache(self):
-        await self.bot.wait_until_ready()
-        
-    @tasks.loop(hours=12)
-    async def role_name_loop(self):
-        guild = self.bot.get_guild(GUILD_ID)
-        role = guild.get_role(ROLE_NAME)
-        existing = await self.bot.db_pool.fetch("SELECT role_name FROM role_names")
-        new_name_data = random.choice(data)
-        await role.edit(name=new_name_data['role_name'])
-
-    @role_name_loop.before_loop
-    async def rolename_before(self):
+    async def start_role_rotation(self) -> None:
         await self.bot.wait_until_ready()
+        await self.load_role_names()
+        self.schedule_role_rename(datetime.datetime.utcnow() + ROLE_RENAME_INTERVAL)
+
+    def schedule_role_rename(self, when: datetime.datetime) -> None:
+        """Schedules the next role rename on the bot's scheduler, no earlier than the role edit cooldown allows."""
+        if self.last_role_edit is not None:
+            when = max(when, self.last_role_edit + ROLE_EDIT_COOLDOWN)
+        self.role_rename_task = self.bot.scheduler.schedule(self.rename_role(), when)
+
+    async def rename_role(self) -> None:
+        next_run = datetime.datetime.utcnow() + ROLE_RENAME_INTERVAL
+        try:
+            # only guilds on this process' shards; other processes rename their own guilds' roles
+            for guild in self.bot.guilds:
+                role = guild.get_role(self.bot.settings_for(guild).rotating_role)
+                if role is not None and len(self.role_names) > 0:
+                    await role.edit(name=self.role_names.pick())
+                    self.last_role_edit = datetime.datetime.utcnow()
+        except discord.HTTPException as e:
+            if e.status == 429:
+                # rate limited; try again once the cooldown has passed instead of waiting for the whole interval
+                next_run = datetime.datetime.utcnow() + ROLE_EDIT_COOLDOWN
+        finally:
+            self.schedule_role_rename(next_run)
 
 def setup(bot):
     bot.add_cog(Stupid(bot))
@@ -16,7 +16,7 @@ class Tags(commands.Cog):
 
     @wat.command(name="add", aliases=["-a"])
     async def add_to_wat(self, ctx, key, *, output):
-        await self.bot.db_pool.execute("INSERT INTO tags(tag_name, content, author) VALUES($1, $2, $3)", key, output, ctx.author.id)
+        await self.bot.db.execute("tags.create", key, output, ctx.author.id)
         embed = em.CrajyEmbed(title="Added tag.", embed_type=enums.EmbedType.BOT)
         embed.quick_set_author(ctx.author)
         embed.set_thumbnail(url=em.EmbedResource.TAG.value)
@@ -39,10 +39,10 @@ class Tags(commands.Cog):
             embed.set_thumbnail(url=em.EmbedResource.TAG.value)
             return await ask.edit(embed=embed)
 
-        owner = await self.bot.db_pool.fetchval("SELECT author FROM tags WHERE tag_name=$1", key)
+        owner = await self.bot.db.fetchval("tags.author", key)
 
         if ctx.author.guild_permissions.administrator or owner == ctx.author.id:
-            await self.bot.db_pool.execute("DELETE FROM tags WHERE tag_name=$1", key)
+            await self.bot.db.execute("tags.delete", key)
             embed = em.CrajyEmbed(title="Tag Deleted.", embed_type=enums.EmbedType.BOT)
             embed.description = f"Tag named `{key}` has been removed from the database."
             embed.quick_set_author(ctx.author)
@@ -61,7 +61,7 @@ class Tags(commands.Cog):
         embed.description = f"Edited `{key}` tag output."
         embed.quick_set_author(ctx.author)
         embed.set_thumbnail(url=em.EmbedResource.TAG.value)
-        await self.bot.db_pool.execute("UPDATE tags SET content=$1 WHERE tag_name=$2", output, key)
+        await self.bot.db.execute("tags.edit_content", output, key)
         await ctx.maybe_reply(embed=embed)
 
     @wat.command(name="edit-key", aliases=["edit-name"])
@@ -70,17 +70,17 @@ class Tags(commands.Cog):
         embed.description = f"Edited `{key}` tag output."
         embed.quick_set_author(ctx.author)
         embed.set_thumbnail(url=em.EmbedResource.TAG.value)
-        await self.bot.db_pool.execute("UPDATE tags SET tag_name=$1 WHERE tag_name=$2", new_key, key)
+        await self.bot.db.execute("tags.rename", new_key, key)
         await ctx.maybe_reply(embed=embed) 
 
     @wat.command(name="use", aliases=["-u"])
     async def use(self, ctx, *, key):
-        content = await self.bot.db_pool.fetchval("SELECT content FROM tags WHERE tag_name=$1", key)
+        content = await self.bot.db.fetchval("tags.content", key)
         await ctx.reply(content)
 
     @wat.command(name="list", aliases=["-l"])
     async def list_(self, ctx):
-        all_tags = await self.bot.db_pool.fetch("SELECT tag_name FROM tags")
+        all_tags = await self.bot.db.fetch("tags.list")
         chunked_tags = mitertools.chunked(all_tags, 6)
         embeds = []
         for chunk in chunked_tags:
@@ -93,7 +93,7 @@ class Tags(commands.Cog):
 
     @wat.command(name="search", aliases=["-s"])
     async def wat_search(self, ctx, key):
-        matches = await self.bot.db_pool.fetch("SELECT tag_name FROM tags WHERE LOWER(tag_name) LIKE %$1%", key.lower())
+        matches = await self.bot.db.fetch("tags.search", key.lower())
         embeds = []
 
         if len(matches) == 0:
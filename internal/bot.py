@@ -1,35 +1,202 @@
 import asyncio
-from collections import defaultdict
+import os
+import time
 
 from aiohttp import ClientSession
 from aioscheduler import TimedScheduler
-import asyncpg
+import discord
 from discord.ext import commands
 
+from internal.config import Config
+from internal.database import Database
+from internal.edits import ResponseTracker, could_be_command
+from internal.feeds import CachedFeed
+from internal.guild_settings import GuildSettings, GuildSettingsCache
 from internal.help_class import HelpCommand
+from internal.help_index import HelpIndex
+from internal.items import ItemCatalog
+from internal import migrations
+from internal.jobs import Job, JobSupervisor
+from internal.pipeline import MessagePipeline, Stage
+from internal.queries import STATEMENTS
+from internal.reactions import ReactionManager
+from internal.router import InteractionRouter
+from internal.sessions import SessionLimitReached, SessionManager
+from internal.response_cache import ResponseCache
+from internal.state import MemoryBackend, create_backend
+from internal.typing_indicator import TypingScheduler
 from internal.enumerations import EmbedType
 from internal.context import CrajyContext
-from secret.constants import *
 from utils.embed import CrajyEmbed
 
 
-class CrajyBot(commands.Bot):
-    """Subclass of commands.Bot with some attributes set."""
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, help_command=HelpCommand(), case_insensitive=True, **kwargs)
-        self.chat_money_cache = defaultdict(lambda: 0)
-        self.db_pool = self.loop.run_until_complete(asyncpg.create_pool(DB_CONNECTION_STRING))
+class CrajyBot(commands.AutoShardedBot):
+    """Subclass of commands.AutoShardedBot with some attributes set.
+    The bot's shards can be split across several processes (see internal.cluster); state that has to be the same in
+    every process lives in `self.state`."""
+    def __init__(self, *args, config: Config, **kwargs):
+        # set before super().__init__, which already adds the help command
+        self.help_index = HelpIndex()    # rebuilt whenever commands are added or removed
+        self.response_cache = ResponseCache()    # embeds built by read-only commands; see internal.response_cache
+        super().__init__(*args, help_command=HelpCommand(), case_insensitive=True,
+                         shard_ids=config.shard_ids or None, shard_count=config.shard_count, **kwargs)
+        self.config = config
+        self.launch_time = time.perf_counter()
+        self.startup_timings = {}    # startup stage: seconds since launch_time
+        self.initial_extensions = []    # loaded by `start`, once the database pool and HTTP session exist
+        self.state = MemoryBackend()    # replaced with the configured backend in `start`
+        self.guild_settings = None    # GuildSettingsCache, loaded in `start`
+        self.db = Database(STATEMENTS, slow_query_threshold=config.slow_query_ms / 1000)    # named, prepared statements
+        self.db_pool = None    # the asyncpg pool behind `db`, created in `start`; for queries that aren't registered
+        self.items = ItemCatalog(self.db)    # cached item catalog and inventories; loaded in `start`
+        self.items.on_change.append(lambda: self.response_cache.invalidate("shop"))
         self.__version__ = "3.0a"
         self.scheduler = TimedScheduler()    # task scheduler for reminders/notes 
-        self.session = ClientSession()     # aiohttp clientsession for API interactions
+        self.session = None     # aiohttp clientsession for API interactions, created in `start`
+        self.jobs = JobSupervisor(self.loop)    # owns every periodic job; started once the bot is ready
+        self.feeds = {}    # name: CachedFeed, for periodically refreshed API content
+        self.router = InteractionRouter()    # messages and reactions that commands are waiting for
+        self.sessions = SessionManager()    # live games; idle ones are evicted by the game-sessions job
+        self.reactions = ReactionManager(self)    # paced reaction menus; see internal.reactions
+        self.typing = TypingScheduler()    # typing indicator for slow commands only
+        self.responses = ResponseTracker()    # first response to each recent command message, for edits
+        self.last_message_ids = {}    # channel id: id of the newest message seen in it; see `dispatch`
+        self.pipeline = MessagePipeline(self.get_prefix)    # every on_message handler; see internal.pipeline
+        self.pipeline.add(Stage("commands", self.command_stage, commands=True))
+        self.jobs.is_leader = lambda: self.state.is_leader
+        self.jobs.add(Job("leader-election", self.state_elect, interval=15))
+        self.jobs.add(Job("game-sessions", self.sessions.evict_idle, interval=30))
+        if config.heartbeat_file:
+            self.jobs.add(Job("heartbeat", self.touch_heartbeat, interval=config.heartbeat_interval))
+        self._tasks_rescheduled = False
+
+    async def start(self, *args, **kwargs):
+        """Startup pipeline: creates the database pool and HTTP session concurrently, loads the initial extensions, then
+        connects to the gateway. Caches (feeds, role names, unfinished tasks) are warmed once the bot is ready, so that
+        they don't delay connecting."""
+        pool = self.db.connect(self.config.db_connection_string, min_size=self.config.db_min_size, max_size=self.config.db_max_size,
+                               statement_cache_size=self.config.db_statement_cache_size)
+        self.db_pool, self.session = await asyncio.gather(pool, self._create_session())
+        await self.check_migrations()
+        self.state = create_backend(self.config.state_backend, self.db_pool)
+        await self.state.start()
+        self.guild_settings = GuildSettingsCache(self.db_pool)
+        await asyncio.gather(self.guild_settings.start(), self.items.start())
+        if self.config.state_backend != "memory":
+            # buffered counter increments are written to the shared backend periodically
+            self.jobs.add(Job("state-flush", self.state.flush, interval=5))
+        self.mark_startup("resources")
+        for extension in self.initial_extensions:
+            self.load_extension(extension)
+        self.help_index.build(self)
+        self.mark_startup("extensions")
+        await super().start(*args, **kwargs)
+
+    def dispatch(self, event_name, *args, **kwargs):
+        # recorded here, in gateway order, rather than in a listener task, so that it's always up to date by the time
+        # a command that was invoked earlier replies
+        if event_name == "message":
+            message = args[0]
+            self.last_message_ids[message.channel.id] = message.id
+            self.router.dispatch("message", message.channel.id, None, message.author.id, message)
+        elif event_name in ("raw_reaction_add", "raw_reaction_remove"):
+            payload = args[0]
+            self.router.dispatch(event_name[4:], payload.channel_id, payload.message_id, payload.user_id, payload)
+        super().dispatch(event_name, *args, **kwargs)
+
+    def add_command(self, command):
+        super().add_command(command)
+        self.commands_changed()
+
+    def remove_command(self, name):
+        command = super().remove_command(name)
+        self.commands_changed()
+        return command
+
+    def commands_changed(self) -> None:
+        """Marks the help index stale, so that it is rebuilt the next time help is asked for. Cogs add and remove
+        their commands one at a time, so rebuilding here would rebuild it once per command."""
+        self.help_index.invalidate()
+        self.response_cache.invalidate("help")
+
+    async def close(self):
+        await super().close()
+        await self.state.close()
+        if self.guild_settings is not None:
+            await self.guild_settings.close()
+        await self.items.close()
+        if self.session is not None:
+            await self.session.close()
+        if self.db_pool is not None:
+            await self.db_pool.close()
+
+    @staticmethod
+    async def _create_session() -> ClientSession:
+        # ClientSession should be created inside a coroutine
+        return ClientSession()
+
+    async def check_migrations(self) -> None:
+        if self.config.auto_migrate:
+            for migration in await migrations.migrate(self.db_pool):
+                print(f"Applied migration {migration.version:04d}_{migration.name}")
+        elif await migrations.pending(self.db_pool):
+            raise RuntimeError("The database schema is out of date. Run `python manage.py migrate`.")
+
+    def mark_startup(self, stage: str) -> None:
+        """Records how long it took to reach a stage of startup. Only the first time a stage is reached counts."""
+        self.startup_timings.setdefault(stage, time.perf_counter() - self.launch_time)
+
+    async def state_elect(self) -> None:
+        await self.state.elect()
+
+    def settings_for(self, guild: discord.Guild) -> GuildSettings:
+        return self.guild_settings.get(guild.id)
+
+    async def send_to_channel(self, channel_id: int, content: str = None, *, embed: CrajyEmbed = None) -> None:
+        """Sends a message to a channel, even if the channel's guild belongs to a shard run by another process."""
+        channel = self.get_channel(channel_id)
+        if channel is not None:
+            await channel.send(content, embed=embed)
+        else:
+            await self.http.send_message(channel_id, content, embed=embed.to_dict() if embed else None)
+
+    async def touch_heartbeat(self) -> None:
+        """Tells the process supervisor that this shard is alive and connected."""
+        if self.is_ready() and not self.is_closed():
+            with open(self.config.heartbeat_file, "a"):
+                os.utime(self.config.heartbeat_file)
+
+    def add_feed(self, feed: CachedFeed) -> CachedFeed:
+        """Registers a feed and a job that keeps it refreshed. Replaces any existing feed with the same name,
+        so reloading a cog doesn't leave the old feed running."""
+        self.feeds[feed.name] = feed
+        self.jobs.add(Job(f"feed:{feed.name}", feed.refresh_if_stale, interval=feed.ttl, jitter=feed.jitter,
+                          min_backoff=feed.min_backoff, max_backoff=feed.max_backoff))
+        return feed
+
+    def remove_feed(self, name: str) -> None:
+        self.feeds.pop(name, None)
+        self.jobs.remove(f"feed:{name}")
+
+    async def on_connect(self):
+        self.mark_startup("connected")
 
     async def on_ready(self):
+        if "ready" not in self.startup_timings:
+            self.mark_startup("ready")
+            print("Ready in {:.2f}s ({})".format(self.startup_timings["ready"], ", ".join(f"{stage} {t:.2f}s" for stage, t in self.startup_timings.items())))
         self.scheduler.start()
+        await self.state.elect()
+        self.jobs.start()
         embed = CrajyEmbed(embed_type=EmbedType.BOT, description="Ready!")
         embed.quick_set_author(self.user)
-        m = await self.get_channel(BOT_ANNOUNCE_CHANNEL).send(embed=embed)
-        ctx = await self.get_context(m)
-        await self.reschedule_tasks(ctx)
+        for guild in self.guilds:    # only the guilds on this process' shards
+            announce_channel = guild.get_channel(self.settings_for(guild).announce_channel)
+            if announce_channel is not None:
+                await announce_channel.send(embed=embed)
+        if self.state.is_leader and not self._tasks_rescheduled:
+            self._tasks_rescheduled = True
+            await self.reschedule_tasks()
 
     async def on_member_join(self, member):
         """When a new member joins, add them to the database and greet them in DMs."""
@@ -44,11 +211,16 @@ class CrajyBot(commands.Bot):
         await self.delete_member(member)
         
     async def on_message_edit(self, before, after):
-        """If a message is edited, reprocess it for commands."""
-        if before.author.bot:
+        """If a command message is edited, re-run it; its first response edits the earlier one (see internal.edits)."""
+        if not could_be_command(before, after, await self.get_prefix(after)):
+            self.responses.stats["rejected"] += 1
             return
-        
         ctx = await self.get_context(after)
+        if not ctx.valid:
+            self.responses.stats["rejected"] += 1
+            return
+        ctx.rerun = True
+        self.responses.stats["rerun"] += 1
         await self.invoke(ctx)
 
     async def on_command_error(self, ctx, error):
@@ -63,12 +235,15 @@ class CrajyBot(commands.Bot):
             if ctx.message.content.startswith(".."):
                 pass
             else:
-                tag = await self.db_pool.fetchval("SELECT content FROM tags WHERE tag_name=$1", ctx.invoked_with)
+                tag = await self.db.fetchval("tags.content", ctx.invoked_with)
                 if tag:
                     return await ctx.reply(tag)
                 else:
                     embed.description = f"Command {ctx.invoked_with} not found."
                     return await ctx.send(embed=embed)
+        elif isinstance(error, SessionLimitReached):
+            embed.description = str(error)
+            return await ctx.send(embed=embed)
         elif isinstance(error, asyncio.TimeoutError):
             embed.description = f"You took too long to respond for: {ctx.invoked_with}"
             return await ctx.message.edit(embed=embed)
@@ -86,37 +261,46 @@ class CrajyBot(commands.Bot):
         """Overriding get_context to use custom context."""
         return await super().get_context(message, cls=CrajyContext)
 
-    async def reschedule_tasks(self, ctx):
-        """Reschedule unfinished tasks that were stored in the database.
-        Bot gets_context from the ready message it sends which can be used to get the guild object for get_member."""
+    async def reschedule_tasks(self):
+        """Reschedule unfinished tasks that were stored in the database. Only the leader process does this.
+        Reminders are sent by DM, so users are looked up globally rather than through a guild that may belong to
+        another process."""
         print("Loading unfinished tasks from database.")
         notes_cog = self.get_cog("Notes")
         #this query assumes that the only tasks are going to be reminders from the notes table. update as necessary.
-        remaining_tasks = await self.db_pool.fetch("SELECT user_id, note_id, exec_time FROM notes NATURAL JOIN tasks")
+        remaining_tasks = await self.db.fetch("tasks.pending_reminders")
         for record in remaining_tasks:
-            author = ctx.guild.get_member(record["user_id"])
+            author = self.get_user(record["user_id"]) or await self.fetch_user(record["user_id"])
             self.scheduler.schedule(notes_cog.remind(author, record["note_id"]), record["exec_time"])
         print("Loaded unfinished tasks.")
 
+    async def on_message(self, message):
+        await self.pipeline.process(message)
+
+    async def command_stage(self, incoming):
+        await self.process_commands(incoming.message)
+
     async def process_commands(self, message):
-        """Triggers typing in channels before sending a message."""
+        """Runs commands, triggering typing for the ones that are slow to respond."""
         if message.author.bot:
             return
 
         ctx = await self.get_context(message)
-        if ctx.valid and getattr(ctx.cog, "qualified_name", None) != "Jishaku":
-            await ctx.trigger_typing()
-        await self.invoke(ctx)
+        if not ctx.valid or getattr(ctx.cog, "qualified_name", None) == "Jishaku":
+            return await self.invoke(ctx)
+        typing = self.typing.start(ctx)
+        try:
+            await self.invoke(ctx)
+        finally:
+            self.typing.finish(ctx, typing)
 
     async def register_new_member(self, member):
-        async with self.db_pool.acquire() as connection:
-            async with connection.transaction():
-                await connection.execute("INSERT INTO economy VALUES($1)", member.id)
-                await connection.execute("INSERT INTO user_details VALUES($1)", member.id)
-                await connection.execute("INSERT INTO inventories VALUES($1)", member.id)
+        async with self.db.transaction() as session:
+            await session.execute("economy.register", member.id)
+            await session.execute("user_details.register", member.id)
         
     async def delete_member(self, member):
-        async with self.db_pool.acquire() as connection:
-            async with connection.transaction():
-                await connection.execute("DELETE FROM economy WHERE user_id=$1", member.id)
+        async with self.db.transaction() as session:
+            await session.execute("economy.delete", member.id)
+            await session.execute("loans.delete", member.id)
     
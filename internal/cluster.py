@@ -0,0 +1,120 @@
+"""A small process supervisor that splits the bot's shards across several processes, and restarts them when they
+die or stop reporting healthy."""
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+
+class ShardProcess:
+    """One child bot process, running the shards in `shard_ids`."""
+    def __init__(self, index: int, shard_ids: List[int], shard_count: int, argv: List[str], heartbeat_file: str) -> None:
+        self.index = index
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.argv = argv
+        self.heartbeat_file = heartbeat_file
+        self.process = None
+        self.started_at = None
+        self.restarts = 0
+        self.consecutive_failures = 0
+        self.restart_at = 0.0    # don't restart before this time; used for backoff
+
+    def env(self) -> Dict[str, str]:
+        env = dict(os.environ)
+        env["CRAJY_SHARD_IDS"] = ",".join(map(str, self.shard_ids))
+        env["CRAJY_SHARD_COUNT"] = str(self.shard_count)
+        env["CRAJY_PROCESSES"] = "1"    # children run their shards themselves
+        env.setdefault("CRAJY_STATE_BACKEND", "postgres")    # state has to be shared between the processes
+        env["CRAJY_HEARTBEAT_FILE"] = self.heartbeat_file
+        return env
+
+    def start(self) -> None:
+        with open(self.heartbeat_file, "w"):    # a fresh heartbeat gives the process time to start up
+            pass
+        self.process = subprocess.Popen(self.argv, env=self.env())
+        self.started_at = time.monotonic()
+        print(f"[supervisor] started process {self.index} with shards {self.shard_ids} (pid {self.process.pid})")
+
+    def stop(self, timeout: float = 15) -> None:
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.send_signal(signal.SIGINT)    # lets discord.py log out cleanly
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def heartbeat_age(self) -> float:
+        try:
+            return time.time() - os.path.getmtime(self.heartbeat_file)
+        except OSError:
+            return float("inf")
+
+
+class ProcessSupervisor:
+    """Runs `processes` child processes of `argv`, splitting `shard_count` shards between them, and keeps them running.
+    A child that exits, or doesn't touch its heartbeat file for `health_timeout` seconds, is restarted after a
+    backoff that doubles with every consecutive failure (up to `max_backoff`). A child that stays up for
+    `stable_after` seconds has its backoff reset."""
+    def __init__(self, argv: List[str], shard_count: int, processes: int, *, health_timeout: float = 180, heartbeat_dir: str = os.path.join("cache", "heartbeat"),
+                 min_backoff: float = 5, max_backoff: float = 300, stable_after: float = 600, poll_interval: float = 5) -> None:
+        os.makedirs(heartbeat_dir, exist_ok=True)
+        self.shards = [ShardProcess(i, list(range(i, shard_count, processes)), shard_count, argv, os.path.join(heartbeat_dir, f"process-{i}"))
+                       for i in range(min(processes, shard_count))]
+        self.health_timeout = health_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.poll_interval = poll_interval
+
+    def backoff(self, shard: ShardProcess) -> float:
+        backoff = min(self.min_backoff * 2 ** (shard.consecutive_failures - 1), self.max_backoff)
+        return random.uniform(backoff / 2, backoff)
+
+    def check(self, shard: ShardProcess) -> None:
+        now = time.monotonic()
+        if shard.alive:
+            if shard.heartbeat_age() <= self.health_timeout:
+                if now - shard.started_at >= self.stable_after:
+                    shard.consecutive_failures = 0
+                return
+            print(f"[supervisor] process {shard.index} hasn't reported healthy for {int(shard.heartbeat_age())}s, restarting it")
+            shard.stop()
+        elif shard.process is not None:
+            print(f"[supervisor] process {shard.index} exited with code {shard.process.returncode}")
+        else:    # never started
+            shard.start()
+            return
+
+        shard.process = None
+        shard.consecutive_failures += 1
+        shard.restarts += 1
+        shard.restart_at = now + self.backoff(shard)
+
+    def run(self) -> None:
+        try:
+            while True:
+                for shard in self.shards:
+                    if shard.process is None and shard.restarts and time.monotonic() < shard.restart_at:
+                        continue    # waiting out the backoff
+                    self.check(shard)
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            print("[supervisor] shutting down")
+        finally:
+            for shard in self.shards:
+                shard.stop()
+
+
+def child_argv(*args: str) -> List[str]:
+    """The command line for a child process running `manage.py` with `args`."""
+    return [sys.executable, os.path.abspath(sys.argv[0]), *args]
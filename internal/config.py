@@ -0,0 +1,109 @@
+"""Typed bot configuration.
+Values are read, in increasing order of priority, from the legacy `secret` modules, `config.toml`, and `CRAJY_*`
+environment variables (for eg; `CRAJY_SHARD_COUNT=4`, `CRAJY_DEFAULT_COGS=economy,stupid`)."""
+import dataclasses
+import os
+import typing
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+CONFIG_FILE = "config.toml"
+ENV_PREFIX = "CRAJY_"
+
+
+@dataclass
+class Config:
+    token: str = ""
+    db_connection_string: str = ""
+    db_min_size: int = 2    # connections the pool keeps open
+    db_max_size: int = 10
+    db_statement_cache_size: int = 100    # per connection; for queries that aren't registered in internal/queries.py
+    slow_query_ms: float = 250.0    # queries slower than this are logged
+    auto_migrate: bool = True    # apply pending schema migrations when the bot starts
+    default_cogs: List[str] = field(default_factory=list)    # names of files in cogs/, without the .py; empty loads all of them
+    shard_count: Optional[int] = None    # None lets discord pick the number of shards
+    shard_ids: List[int] = field(default_factory=list)    # shards this process runs; empty runs all of them
+    processes: int = 1    # number of processes to split the shards across
+    state_backend: str = "memory"    # "memory" for a single process, "postgres" to share state between processes
+    heartbeat_file: Optional[str] = None    # touched periodically while the bot is healthy; set by the process supervisor
+    heartbeat_interval: float = 30.0
+    health_timeout: float = 180.0    # a shard process that hasn't touched its heartbeat file for this long is restarted
+
+
+def _coerce(value: str, type_):
+    """Converts an environment variable string to `type_`."""
+    if typing.get_origin(type_) is typing.Union:    # Optional[X]
+        if value.lower() in ("", "none"):
+            return None
+        type_ = next(i for i in typing.get_args(type_) if i is not type(None))
+    if typing.get_origin(type_) is list:
+        inner = typing.get_args(type_)[0]
+        return [inner(i.strip()) for i in value.split(",") if i.strip()]
+    if type_ is bool:
+        return value.lower() in ("1", "true", "yes", "on")
+    return type_(value)
+
+
+def _load_toml(path: str) -> dict:
+    try:
+        import tomllib    # python 3.11+
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    except ImportError:
+        import toml
+        with open(path) as f:
+            return toml.load(f)
+
+
+def _legacy_values() -> dict:
+    """Values from the `secret` modules written by older versions of `manage.py setup`."""
+    values = {}
+    try:
+        from secret.TOKEN import TOKEN
+        values["token"] = TOKEN
+    except ImportError:
+        pass
+    try:
+        from secret import constants
+    except ImportError:
+        return values
+    if hasattr(constants, "DB_CONNECTION_STRING"):
+        values["db_connection_string"] = constants.DB_CONNECTION_STRING
+    if hasattr(constants, "DEFAULT_COGS"):
+        values["default_cogs"] = list(constants.DEFAULT_COGS)
+    return values
+
+
+def load_config(path: str = CONFIG_FILE) -> Config:
+    values = _legacy_values()
+    if os.path.exists(path):
+        values.update(_load_toml(path).get("bot", {}))
+
+    types = typing.get_type_hints(Config)
+    for f in dataclasses.fields(Config):
+        env_value = os.environ.get(ENV_PREFIX + f.name.upper())
+        if env_value is not None:
+            values[f.name] = _coerce(env_value, types[f.name])
+
+    unknown = set(values) - set(types)
+    if unknown:
+        raise ValueError(f"Unknown config keys: {', '.join(sorted(unknown))}")
+    return Config(**values)
+
+
+def dump_toml(config: Config) -> str:
+    """Serializes the config into a `config.toml` file's contents. Only simple values are supported."""
+    def fmt(value):
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, str):
+            return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+        if isinstance(value, list):
+            return "[" + ", ".join(fmt(i) for i in value) + "]"
+        return str(value)
+
+    lines = ["[bot]"]
+    for key, value in dataclasses.asdict(config).items():
+        if value is not None:
+            lines.append(f"{key} = {fmt(value)}")
+    return "\n".join(lines) + "\n"
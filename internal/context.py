@@ -3,6 +3,8 @@ import discord
 from discord.ext import commands
 import contextlib
 import asyncio
+import time
+from internal.edits import EDITABLE_KWARGS
 from internal.enumerations import Table
 from utils.embed import EmbedResource
 
@@ -11,6 +13,48 @@ class CrajyContext(commands.Context):
         - maybe_reply: replies to a message if there's a message between invocation message and reply
         - DB interaction; to easily get data from the db; the context has methods built to fetch the ctx.author's data.
     """
+    rerun = False    # set by the bot when this invocation re-runs a command message that was edited
+    _responded = False
+    invoked_at = None    # perf_counter timestamps, for the typing indicator; see internal.typing_indicator
+    responded_at = None
+
+    async def send(self, content=None, **kwargs):
+        return await self._respond(super().send, content, kwargs)
+
+    async def reply(self, content=None, **kwargs):
+        return await self._respond(super().reply, content, kwargs)
+
+    async def _respond(self, send, content, kwargs):
+        """Sends a response, and remembers the first one to each command message. When the command is re-run because
+        its message was edited, the first response edits that earlier message instead."""
+        responses = self.bot.responses
+        first, self._responded = not self._responded, True
+        if first:
+            self.responded_at = time.perf_counter()
+        if first and self.rerun:
+            previous = responses.get(self.message.id)
+            if previous is not None and set(kwargs) <= EDITABLE_KWARGS:
+                fields = {k: v for k, v in kwargs.items() if k in ("allowed_mentions", "delete_after")}
+                try:
+                    await previous.edit(content=content, embed=kwargs.get("embed"), **fields)
+                except discord.NotFound:    # the old response was deleted; send a new one
+                    responses.forget(self.message.id)
+                else:
+                    responses.stats["reused"] += 1
+                    return previous
+        message = await send(content, **kwargs)
+        if first:
+            responses.remember(self.message.id, message)
+        return message
+
+    async def wait_for_message(self, check=None, *, timeout: float = None, channel: discord.abc.Messageable = None,
+                               anyone: bool = False) -> discord.Message:
+        """Waits for the next message from the command's author (or `anyone`) in the command's channel (or `channel`)
+        that passes `check`. See internal.router."""
+        channel = channel or self.channel
+        return await self.bot.router.wait("message", channel_id=channel.id, user_id=None if anyone else self.author.id,
+                                          check=check, timeout=timeout)
+
     async def check_mark(self, target_message: discord.Message = None):
         if target_message is None:
             target_message = self.message
@@ -32,29 +76,17 @@ class CrajyContext(commands.Context):
         Returns :: bool."""
         if target_message is None:
             target_message = self.message
-        await self.check_mark(target_message)
-        await self.x_mark(target_message)
-
-        def check(reaction, member):
-            if str(reaction.emoji) in (EmbedResource.CHECK_EMOJI.value, EmbedResource.XMARK_EMOJI.value) and member == self.author:
-                return True
-
+        options = (EmbedResource.CHECK_EMOJI.value, EmbedResource.XMARK_EMOJI.value)
+        reactions = self.bot.reactions
+        adding = reactions.add(target_message, options)    # the user can answer before both are added
         try:
-            reaction, _ = await self.bot.wait_for("reaction_add", check=check, timeout=30)
-            await target_message.clear_reactions()
-            if str(reaction.emoji) == EmbedResource.CHECK_EMOJI.value:
-                return True
-            else:
-                return False
-        except Exception as e:
-            if isinstance(e, asyncio.TimeoutError):
-                await target_message.clear_reactions()
-                return False
-            elif isinstance(e, discord.errors.Forbidden):
-                if str(reaction.emoji) == EmbedResource.CHECK_EMOJI.value:
-                    return True
-                else:
-                    return False
+            emoji = await reactions.wait(target_message, self.author, options, timeout=30)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            adding.cancel()
+            await reactions.clear(target_message)
+        return emoji == EmbedResource.CHECK_EMOJI.value
 
     async def get_user_data(self, *, member: discord.Member = None, table: Table) -> dict:
         """Returns `user`s data from the `table` specified.
@@ -63,12 +95,11 @@ class CrajyContext(commands.Context):
         if member is None:
             member = self.author
 
-        return await self.bot.db_pool.fetchrow(f"SELECT * FROM {table.name} WHERE user_id=$1", member.id)
+        return await self.bot.db.fetchrow(f"{table.name.lower()}.get", member.id)
 
     async def maybe_reply(self, content: str = None, mention_author: bool = False, **kwargs):
         """Replies if there is a message in between the command invoker and the bot's message."""
-        await asyncio.sleep(0.05)
         with contextlib.suppress(discord.HTTPException):
-            if getattr(self.channel,"last_message", False) != self.message:
+            if self.bot.last_message_ids.get(self.channel.id) != self.message.id:
                 return await self.reply(content, mention_author=mention_author, **kwargs)
         return await self.send(content, **kwargs)
@@ -0,0 +1,159 @@
+"""Data-access layer over the asyncpg pool.
+Queries are registered once by name (see internal/queries.py) and prepared on every pooled connection, so each call
+skips parsing and planning, and no SQL is assembled from user input at call time. Every statement keeps its own
+latency and row count histograms; calls slower than `slow_query_threshold` seconds are logged."""
+import contextlib
+import logging
+import time
+from typing import Dict, Iterable, Sequence
+
+import asyncpg
+
+from internal.stats import Histogram
+
+log = logging.getLogger(__name__)
+
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class CrajyConnection(asyncpg.Connection):
+    """Connection that keeps the statements prepared on it, by name."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared: Dict[str, asyncpg.prepared_stmt.PreparedStatement] = {}
+
+
+class Statement:
+    def __init__(self, name: str, sql: str) -> None:
+        self.name = name
+        self.sql = sql
+        self.latency = Histogram()
+        self.rows = Histogram(ROW_BUCKETS)
+        self.errors = 0
+        self.slow = 0
+
+    def summary(self) -> str:
+        return f"{self.latency.summary()}\nrows: {self.rows.summary(unit='', scale=1)}, {self.errors} errors, {self.slow} slow"
+
+
+def column(value: str, allowed: Sequence[str]) -> str:
+    """Returns `value` if it is one of the `allowed` column names. Used wherever a column name comes from a command
+    argument, so that it can never be interpolated into SQL."""
+    value = value.lower()
+    if value not in allowed:
+        raise ValueError(f"{value!r} isn't one of: {', '.join(allowed)}")
+    return value
+
+
+class Database:
+    def __init__(self, statements: Dict[str, str] = None, *, slow_query_threshold: float = 0.25) -> None:
+        self.pool = None
+        self.statements: Dict[str, Statement] = {}
+        self.slow_query_threshold = slow_query_threshold
+        for name, sql in (statements or {}).items():
+            self.register(name, sql)
+
+    def register(self, name: str, sql: str) -> None:
+        """Registers a statement. Statements registered after the pool exists are prepared on first use."""
+        if name in self.statements and self.statements[name].sql != sql:
+            raise ValueError(f"A different statement is already registered as {name!r}.")
+        self.statements.setdefault(name, Statement(name, sql))
+
+    async def connect(self, dsn: str, *, min_size: int = 2, max_size: int = 10, statement_cache_size: int = 100) -> asyncpg.pool.Pool:
+        self.pool = await asyncpg.create_pool(dsn, min_size=min_size, max_size=max_size, statement_cache_size=statement_cache_size,
+                                              connection_class=CrajyConnection, init=self._prepare_all)
+        return self.pool
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+
+    async def _prepare_all(self, connection: CrajyConnection) -> None:
+        for statement in list(self.statements.values()):
+            try:
+                connection.prepared[statement.name] = await connection.prepare(statement.sql)
+            except asyncpg.PostgresError as e:    # for eg; its table doesn't exist yet. it's prepared on first use instead
+                log.debug("Couldn't prepare %s: %s", statement.name, e)
+
+    async def _prepared(self, connection, name: str):
+        try:
+            return connection.prepared[name]
+        except KeyError:
+            statement = self.statements[name]
+            prepared = connection.prepared[name] = await connection.prepare(statement.sql)
+            return prepared
+
+    async def _run(self, connection, method: str, name: str, args: Iterable):
+        statement = self.statements[name]
+        start = time.perf_counter()
+        try:
+            if method == "executemany":
+                # prepared statements only have executemany from asyncpg 0.22; the connection's own statement cache
+                # still prepares this once per connection
+                result = await connection.executemany(statement.sql, args)
+                rows = len(args)
+            else:
+                prepared = await self._prepared(connection, name)
+                result = await getattr(prepared, method)(*args)
+                rows = len(result) if method == "fetch" else int(result is not None)
+        except Exception:
+            statement.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            statement.latency.observe(elapsed)
+        statement.rows.observe(rows)
+        if elapsed >= self.slow_query_threshold:
+            statement.slow += 1
+            log.warning("Slow query %s took %.0fms (%s rows)", name, elapsed * 1000, rows)
+        return result
+
+    async def _call(self, method: str, name: str, args):
+        async with self.pool.acquire() as connection:
+            return await self._run(connection, method, name, args)
+
+    async def execute(self, name: str, *args) -> None:
+        """Runs a statement that returns no rows. Named `execute` for symmetry with asyncpg, but runs through fetch
+        since prepared statements don't have an execute method."""
+        await self._call("fetch", name, args)
+
+    async def fetch(self, name: str, *args) -> list:
+        return await self._call("fetch", name, args)
+
+    async def fetchrow(self, name: str, *args):
+        return await self._call("fetchrow", name, args)
+
+    async def fetchval(self, name: str, *args):
+        return await self._call("fetchval", name, args)
+
+    async def executemany(self, name: str, args: list) -> None:
+        await self._call("executemany", name, args)
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        """Yields a session whose calls all run in one transaction, on one connection."""
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                yield Session(self, connection)
+
+
+class Session:
+    """Runs registered statements on one connection; see `Database.transaction`."""
+    def __init__(self, db: Database, connection) -> None:
+        self.db = db
+        self.connection = connection
+
+    async def execute(self, name: str, *args) -> None:
+        await self.db._run(self.connection, "fetch", name, args)
+
+    async def fetch(self, name: str, *args) -> list:
+        return await self.db._run(self.connection, "fetch", name, args)
+
+    async def fetchrow(self, name: str, *args):
+        return await self.db._run(self.connection, "fetchrow", name, args)
+
+    async def fetchval(self, name: str, *args):
+        return await self.db._run(self.connection, "fetchval", name, args)
+
+    async def executemany(self, name: str, args: list) -> None:
+        await self.db._run(self.connection, "executemany", name, args)
@@ -0,0 +1,44 @@
+"""Re-running commands when their message is edited.
+The bot remembers the first response to each recent command message, in a bounded LRU. When a command message is
+edited (to fix a typo, say), the command runs again and its first response edits that earlier message instead of
+sending a new one. Edits that can't be commands are rejected before any parsing: Discord also sends an edit event
+when it unfurls a link's embed, and then the content hasn't changed."""
+from collections import Counter, OrderedDict
+from typing import Optional
+
+import discord
+
+# send/reply keyword arguments that Message.edit can apply too; a response that uses any other (files, tts) is sent anew
+EDITABLE_KWARGS = {"embed", "allowed_mentions", "delete_after", "mention_author"}
+
+
+class ResponseTracker:
+    def __init__(self, maxsize: int = 500) -> None:
+        self.maxsize = maxsize
+        self._responses: "OrderedDict[int, discord.Message]" = OrderedDict()    # invoking message id: response
+        self.stats = Counter()    # rejected, rerun, reused
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def get(self, message_id: int) -> Optional[discord.Message]:
+        return self._responses.get(message_id)
+
+    def remember(self, message_id: int, response: discord.Message) -> None:
+        """Records the first response to a command message, replacing the one from an earlier run."""
+        self._responses[message_id] = response
+        self._responses.move_to_end(message_id)
+        while len(self._responses) > self.maxsize:
+            self._responses.popitem(last=False)
+
+    def forget(self, message_id: int) -> None:
+        self._responses.pop(message_id, None)
+
+
+def could_be_command(before: discord.Message, after: discord.Message, prefixes) -> bool:
+    """Cheap checks, done before the command is parsed."""
+    if after.author.bot or before.content == after.content:
+        return False
+    if isinstance(prefixes, str):
+        prefixes = (prefixes,)
+    return after.content.startswith(tuple(prefixes))
@@ -14,9 +14,9 @@ class Table(enum.Enum):
     """Enum for tables in the database."""
     ECONOMY = ("id", "bank", "cash", "debt")
     USER_DETAILS = ("id", "zodiac", "bday")
-    INVENTORIES = ("id", "stock", "chicken", "heist tools")    # actual name in table is `heist`
+    INVENTORY = ("user_id", "item_id", "qty")
     NOTES = ("id", "raw_text")
-    SHOP = ("item_id", "item_name", "stock", "price")
+    ITEMS = ("item_id", "item_name", "price", "stock")
     PINS = ("pin_id", "synopsis", "jump_url", "author", "pin_date", "name")
     TAGS = ("tag_name", "tag_content", "tag_author")
     ROLE_NAMES = ("name_id", "role_name", "author")
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""Query plan regression check, run with `python manage.py explain`.
+Runs EXPLAIN ANALYZE on every registered statement with sequential scans disabled, inside a transaction that is
+rolled back, and reports any statement whose plan still has a Seq Scan; that means no index can serve it. Statements
+that read whole tables by design are listed in `internal.queries.FULL_SCANS`."""
+import datetime
+import json
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+# sample values for statement parameters, by postgres type name
+SAMPLE_VALUES = {
+    "int2": 1, "int4": 1, "int8": 1, "float8": 1.0, "numeric": 1, "bool": True,
+    "text": "a", "varchar": "a", "jsonb": "{}",
+    "date": datetime.date(2000, 1, 1), "timestamp": datetime.datetime(2000, 1, 1), "timestamptz": datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc),
+    "_int4": [1], "_int8": [1], "_text": ["a"],
+}
+
+# fills the core tables so that plans and timings look like a real server's. runs inside the rolled back transaction.
+SEED = """
+INSERT INTO economy(user_id, bank, cash, debt) SELECT i, i % 1000, i % 777, 0 FROM generate_series(1, {n}) i ON CONFLICT DO NOTHING;
+INSERT INTO user_details(user_id, bday) SELECT i, DATE '2000-01-01' + (i % 365) FROM generate_series(1, {n}) i ON CONFLICT DO NOTHING;
+INSERT INTO inventory(user_id, item_id, qty) SELECT i, item_id, i % 5 FROM generate_series(1, {n}) i CROSS JOIN items ON CONFLICT DO NOTHING;
+INSERT INTO loans(user_id, principal, due_at) SELECT user_id, 100, now() + user_id * INTERVAL '1 minute' FROM economy WHERE user_id % 10 = 0 ON CONFLICT DO NOTHING;
+INSERT INTO notes(user_id, raw_note, reminder) SELECT i % 500, 'note ' || i, i % 3 = 0 FROM generate_series(1, {n}) i;
+INSERT INTO tasks(task_id, exec_time) SELECT note_id, now() + note_id * INTERVAL '1 minute' FROM notes WHERE reminder ON CONFLICT DO NOTHING;
+INSERT INTO tags(tag_name, content, author) SELECT 'tag' || i, 'content', i FROM generate_series(1, {n}) i ON CONFLICT DO NOTHING;
+INSERT INTO pins(synopsis, jump_url, author, pin_date, name) SELECT 'pin', 'https://discord.com', i, DATE '2021-01-01', 'pin' || i FROM generate_series(1, {n}) i;
+INSERT INTO role_names(role_name, author) SELECT 'role ' || i, i FROM generate_series(1, {n}) i;
+ANALYZE;
+"""
+
+
+class PlanResult(NamedTuple):
+    name: str
+    seq_scans: List[str]    # tables read with a sequential scan
+    milliseconds: Optional[float]
+    error: Optional[str] = None
+
+
+class _Rollback(Exception):
+    pass
+
+
+def seq_scans(plan: dict) -> List[str]:
+    """Returns the relations that a JSON query plan reads with a sequential scan."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name", "?"))
+    for child in plan.get("Plans", ()):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def _explain(connection, name: str, sql: str) -> PlanResult:
+    try:
+        async with connection.transaction():    # a savepoint; EXPLAIN ANALYZE really runs writes, so undo them
+            parameters = (await connection.prepare(sql)).get_parameters()
+            args = [SAMPLE_VALUES.get(parameter.name) for parameter in parameters]
+            output = await connection.fetchval(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", *args)
+            raise _Rollback(output)
+    except _Rollback as rollback:
+        output = rollback.args[0]
+    except Exception as e:
+        return PlanResult(name, [], None, f"{type(e).__name__}: {e}")
+    plan = (json.loads(output) if isinstance(output, str) else output)[0]
+    return PlanResult(name, seq_scans(plan["Plan"]), plan.get("Execution Time"))
+
+
+async def explain_all(pool, statements: Dict[str, str], *, seed: int = 0) -> List[PlanResult]:
+    results = []
+    async with pool.acquire() as connection:
+        transaction = connection.transaction()
+        await transaction.start()
+        try:
+            if seed:
+                await connection.execute(SEED.format(n=int(seed)))
+            await connection.execute("SET LOCAL enable_seqscan = off")
+            for name, sql in sorted(statements.items()):
+                results.append(await _explain(connection, name, sql))
+        finally:
+            await transaction.rollback()
+    return results
+
+
+def failures(results: Iterable[PlanResult], allowed: Iterable[str]) -> List[PlanResult]:
+    allowed = set(allowed)
+    return [r for r in results if r.error or (r.seq_scans and r.name not in allowed)]
@@ -0,0 +1,183 @@
+"""Periodically refreshed, cached content from external APIs (quote of the day, exchange rates etc).
+A feed always serves the last good value it has; failed refreshes are retried with exponential backoff (by the job
+supervisor) while the stale value keeps being served. The last good value is persisted so that a restart can serve
+it immediately."""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from internal.stats import Histogram, HitCounter
+
+log = logging.getLogger(__name__)
+
+
+class FeedStore:
+    """Where a feed persists its last good value. Values must be JSON serializable."""
+    async def load(self, name: str) -> Optional[Tuple[Any, float]]:
+        """Returns a (value, fetched_at) tuple, or None if nothing was stored. `fetched_at` is a UNIX timestamp."""
+        raise NotImplementedError
+
+    async def save(self, name: str, value: Any, fetched_at: float) -> None:
+        raise NotImplementedError
+
+
+class DiskFeedStore(FeedStore):
+    """Stores each feed as a JSON file in `directory`."""
+    def __init__(self, directory: str = os.path.join("cache", "feeds")) -> None:
+        self.directory = directory
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.json")
+
+    async def load(self, name):
+        try:
+            with open(self._path(name)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return data["value"], data["fetched_at"]
+
+    async def save(self, name, value, fetched_at):
+        os.makedirs(self.directory, exist_ok=True)
+        # write to a temporary file first so that a crash mid-write never leaves a corrupt cache behind
+        tmp = self._path(name) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"value": value, "fetched_at": fetched_at}, f)
+        os.replace(tmp, self._path(name))
+
+
+class PostgresFeedStore(FeedStore):
+    """Stores feeds in the `feed_cache` table (see migrations/)."""
+    def __init__(self, pool) -> None:
+        self.pool = pool
+
+    async def load(self, name):
+        record = await self.pool.fetchrow("SELECT value, fetched_at FROM feed_cache WHERE name=$1", name)
+        if record is None:
+            return None
+        return json.loads(record["value"]), record["fetched_at"]
+
+    async def save(self, name, value, fetched_at):
+        await self.pool.execute("INSERT INTO feed_cache(name, value, fetched_at) VALUES($1, $2, $3) "
+                                "ON CONFLICT (name) DO UPDATE SET value=$2, fetched_at=$3", name, json.dumps(value), fetched_at)
+
+
+class FeedUnavailable(Exception):
+    """Raised when a feed has never been fetched successfully, and the fetch failed again."""
+
+
+class CachedFeed:
+    """Caches the result of the `fetch` coroutine function for `ttl` seconds.
+    CrajyBot.add_feed registers a job that refreshes the feed every `ttl` seconds, give or take `jitter` (a fraction
+    of the ttl) so that feeds created together don't all refresh at once. Failed refreshes are retried after
+    `min_backoff` seconds, doubling up to `max_backoff`."""
+    def __init__(self, name: str, fetch: Callable[[], Awaitable[Any]], *, ttl: float, jitter: float = 0.1,
+                 min_backoff: float = 5, max_backoff: float = 900, store: FeedStore = None) -> None:
+        self.name = name
+        self.fetch = fetch
+        self.ttl = ttl
+        self.jitter = jitter
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.store = store
+
+        self.value = None
+        self.fetched_at = None    # UNIX timestamp of the last successful fetch
+        self.failures = 0    # consecutive failed refreshes
+        self.last_error = None
+
+        self.counter = HitCounter()
+        self.stale_served = 0
+        self.refresh_latency = Histogram()
+
+        self._loaded = False
+        self._refresh_lock = asyncio.Lock()
+        self._attempts = 0    # finished fetches, successful or not
+
+    @property
+    def age(self) -> Optional[float]:
+        return None if self.fetched_at is None else time.time() - self.fetched_at
+
+    @property
+    def stale(self) -> bool:
+        return self.fetched_at is None or self.age > self.ttl
+
+    async def get(self) -> Any:
+        """Returns the cached value. If nothing has ever been fetched, fetches it now.
+        Stale values are still served; the feed's job is responsible for refreshing them."""
+        await self._load()
+        if self.value is not None:
+            self.counter.hit()
+            if self.stale:
+                self.stale_served += 1
+            return self.value
+
+        self.counter.miss()
+        try:
+            await self.refresh()
+        except Exception as e:
+            raise FeedUnavailable(f"{self.name} is unavailable right now.") from e
+        return self.value
+
+    async def refresh(self) -> Any:
+        """Fetches a new value, and persists it. Concurrent callers share one fetch: whoever was waiting for the lock
+        while a fetch ran gets that fetch's value, or its error."""
+        attempts = self._attempts
+        async with self._refresh_lock:
+            if self._attempts != attempts:
+                if self.last_error is not None:
+                    raise self.last_error
+                return self.value
+            start = time.perf_counter()
+            try:
+                value = await self.fetch()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = e
+                raise
+            finally:
+                self._attempts += 1
+                self.refresh_latency.observe(time.perf_counter() - start)
+
+            self.value = value
+            self.fetched_at = time.time()
+            self.failures = 0
+            self.last_error = None
+
+        if self.store is not None:
+            try:
+                await self.store.save(self.name, value, self.fetched_at)
+            except Exception:
+                log.exception("Could not persist feed %s", self.name)
+        return value
+
+    async def _load(self) -> None:
+        """Loads the persisted value once, so a restart can serve it without fetching."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.store is None or self.value is not None:
+            return
+        try:
+            stored = await self.store.load(self.name)
+        except Exception:
+            log.exception("Could not load persisted feed %s", self.name)
+            return
+        if stored is not None:
+            self.value, self.fetched_at = stored
+
+    async def refresh_if_stale(self) -> None:
+        """Refreshes the feed unless the value (possibly loaded from the store) is still fresh.
+        Jitter can make the refresh job run a little early, so values that are nearly stale are refreshed too."""
+        await self._load()
+        if self.fetched_at is None or self.age > self.ttl * (1 - self.jitter):
+            await self.refresh()
+
+    def summary(self) -> str:
+        age = "never fetched" if self.age is None else f"{int(self.age)}s old"
+        error = f"\nLast error: {self.last_error!r}" if self.last_error else ""
+        return (f"{age}, {self.failures} consecutive failures\n{self.counter.summary()}, {self.stale_served} stale\n"
+                f"Refresh: {self.refresh_latency.summary()}{error}")
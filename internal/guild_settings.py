@@ -0,0 +1,131 @@
+"""Per-guild settings, stored in postgres and cached in memory by guild id.
+Channel and role allow-lists are frozensets of ids, so checking them is a set lookup, whatever the guild or channel is
+called. When a guild's settings change, every process reloads that guild (NOTIFY) and local listeners are called."""
+import asyncio
+import dataclasses
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, List, Optional
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "crajy_guild_settings"
+
+
+@dataclass(frozen=True)
+class GuildSettings:
+    guild_id: int
+    announce_channel: Optional[int] = None    # stock price changes, bot online etc
+    general_channel: Optional[int] = None    # birthday wishes
+    test_channel: Optional[int] = None    # debug mode announcements
+    rotating_role: Optional[int] = None    # role renamed periodically, see cogs/stupid.py
+    economy_channels: FrozenSet[int] = field(default_factory=frozenset)    # empty allows economy commands everywhere
+    betting_channels: FrozenSet[int] = field(default_factory=frozenset)    # empty allows betting commands everywhere
+    chat_money_channels: FrozenSet[int] = field(default_factory=frozenset)    # channels where chatting earns currency
+    commander_roles: FrozenSet[int] = field(default_factory=frozenset)    # roles allowed to control the bot
+
+    @staticmethod
+    def allows(channels: FrozenSet[int], channel_id: int) -> bool:
+        """Whether an allow-list permits a channel. An empty allow-list permits every channel."""
+        return not channels or channel_id in channels
+
+    @classmethod
+    def from_record(cls, record) -> "GuildSettings":
+        values = dict(record)
+        for name in LIST_FIELDS:
+            values[name] = frozenset(values[name] or ())
+        return cls(**values)
+
+
+ID_FIELDS = ("announce_channel", "general_channel", "test_channel", "rotating_role")
+LIST_FIELDS = ("economy_channels", "betting_channels", "chat_money_channels", "commander_roles")
+
+
+class GuildSettingsCache:
+    """Every guild's settings from the guild_settings table, loaded once at startup. `get` never touches the database."""
+    def __init__(self, pool) -> None:
+        self.pool = pool
+        self._settings: Dict[int, GuildSettings] = {}
+        self._listeners: List[Callable[[GuildSettings], None]] = []
+        self._connection = None    # holds the LISTEN
+
+    def __iter__(self):
+        return iter(self._settings.values())
+
+    async def start(self) -> None:
+        await self.import_legacy()
+        records = await self.pool.fetch("SELECT * FROM guild_settings")
+        self._settings = {record["guild_id"]: GuildSettings.from_record(record) for record in records}
+        self._connection = await self.pool.acquire()
+        await self._connection.add_listener(CHANNEL, self._on_notify)
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self.pool.release(self._connection)
+            self._connection = None
+
+    async def import_legacy(self) -> None:
+        """Imports the single guild configured in `secret/constants.py` by older versions of `manage.py setup`, if it
+        isn't in the database yet."""
+        try:
+            from secret import constants
+        except ImportError:
+            return
+        if not hasattr(constants, "GUILD_ID"):
+            return
+        await self.pool.execute(
+            "INSERT INTO guild_settings(guild_id, announce_channel, general_channel, test_channel, rotating_role, chat_money_channels, commander_roles) "
+            "VALUES($1, $2, $3, $4, $5, $6, $7) ON CONFLICT (guild_id) DO NOTHING",
+            constants.GUILD_ID, getattr(constants, "BOT_ANNOUNCE_CHANNEL", None), getattr(constants, "GENERAL_CHAT", None),
+            getattr(constants, "BOT_TEST_CHANNEL", None), getattr(constants, "ROLE_NAME", None),
+            list(getattr(constants, "CHAT_MONEY_CHANNELS", [])), list(getattr(constants, "BOT_COMMANDER_ROLES", [])))
+
+    def get(self, guild_id: int) -> GuildSettings:
+        """Returns a guild's settings; a guild that was never configured gets the defaults."""
+        try:
+            return self._settings[guild_id]
+        except KeyError:
+            return GuildSettings(guild_id)
+
+    def add_listener(self, listener: Callable[[GuildSettings], None]) -> None:
+        """Calls `listener` with a guild's new settings whenever they change, in any process."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[GuildSettings], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    async def update(self, guild_id: int, **changes) -> GuildSettings:
+        """Changes some of a guild's settings. Lists of ids are stored whole, so pass the full new list."""
+        unknown = set(changes) - set(ID_FIELDS) - set(LIST_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown guild settings: {', '.join(sorted(unknown))}")
+        values = dataclasses.asdict(dataclasses.replace(self.get(guild_id), **changes))
+        for name in LIST_FIELDS:
+            values[name] = sorted(values[name])
+        columns = list(values)
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute(
+                    f"INSERT INTO guild_settings({', '.join(columns)}) VALUES({', '.join(f'${i}' for i in range(1, len(columns) + 1))}) "
+                    f"ON CONFLICT (guild_id) DO UPDATE SET {', '.join(f'{c}=EXCLUDED.{c}' for c in columns[1:])}",
+                    *values.values())
+                await connection.execute("SELECT pg_notify($1, $2)", CHANNEL, str(guild_id))
+        return await self.reload(guild_id)
+
+    async def reload(self, guild_id: int) -> GuildSettings:
+        record = await self.pool.fetchrow("SELECT * FROM guild_settings WHERE guild_id=$1", guild_id)
+        if record is None:
+            self._settings.pop(guild_id, None)
+        else:
+            self._settings[guild_id] = GuildSettings.from_record(record)
+        settings = self.get(guild_id)
+        for listener in self._listeners:
+            try:
+                listener(settings)
+            except Exception:
+                log.exception("Guild settings listener %r failed", listener)
+        return settings
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        asyncio.ensure_future(self.reload(int(payload)))
@@ -1,70 +1,110 @@
-import discord
 from discord.ext import commands
+import more_itertools as mitertools
 
 from utils import embed as em
 from internal import enumerations as enums
+from internal.help_index import CogEntry, CommandEntry, HelpIndex
+from internal.response_cache import cached_response
 
 class HelpCommand(commands.HelpCommand):
+    """Serves help from `bot.help_index`, which is built once and rebuilt only when commands change."""
+    COMMANDS_PER_PAGE = 8
+
     def __init__(self):
         super().__init__(command_attrs={
-            'help': 'Returns help about a command, or a category of commands.',
+            'help': 'Returns help about a command, or a category of commands. Partial names work too.',
             'cooldown': commands.Cooldown(1, 3.0, commands.BucketType.member),
         })
 
+    def index(self) -> HelpIndex:
+        bot = self.context.bot
+        return bot.help_index.ensure(bot)
+
+    async def command_callback(self, ctx, *, command=None):
+        """Resolves `help <query>` through the index instead of walking the bot's cogs and commands."""
+        await self.prepare_help_command(ctx, command)
+        if command is None:
+            return await self.send_bot_help(None)
+        entry = self.index().find(command)
+        if entry is None:
+            return await self.send_error_message(self.command_not_found(command))
+        if isinstance(entry, CogEntry):
+            return await self.send_cog_entry(entry)
+        return await self.send_command_entry(entry)
+
+    def command_not_found(self, string):
+        suggestions = self.index().suggestions(string)
+        did_you_mean = f" Did you mean {', '.join(f'`{name}`' for name in suggestions)}?" if suggestions else ""
+        return f"No command or category called `{string}`.{did_you_mean}"
+
+    async def send_error_message(self, error):
+        embed = em.CrajyEmbed(title="Help", description=error, embed_type=enums.EmbedType.FAIL)
+        await self.context.maybe_reply(embed=embed)
+
     async def send_bot_help(self, mapping):
         ctx = self.context
-        bot = ctx.bot
+        embed = await self.bot_help_embed(ctx)
+        embed.quick_set_author(ctx.author)
+        await ctx.maybe_reply(embed=embed)
 
+    @cached_response(3600, tags=["help"], key=lambda self, ctx: self.clean_prefix, name="help")
+    async def bot_help_embed(self, ctx):
         embed = em.CrajyEmbed(title="CrajyBot", description=f"Do `{self.clean_prefix}help <category | command>` to get help on a command or category", 
                               embed_type=enums.EmbedType.INFO)
-
-        out = ""
-        # bot.cogs returns a dict mapping of name:cog
-        for cog_name in bot.cogs:
-            if cog_name not in ["Control", "ErrorHandler"]: out += cog_name.capitalize() + "\n"
-
-        embed.add_field(name="Categories", value=out, inline=False)
+        out = "\n".join(name.capitalize() for name in self.index().cogs)
+        embed.add_field(name="Categories", value=out or "-", inline=False)
         embed.add_field(name="Contact", value="[Join our support server](https://www.youtube.com/watch?v=dQw4w9WgXcQ)", inline=False)
-        embed.quick_set_author(ctx.author)
-        embed.set_thumbnail(url=bot.user.avatar_url)
-        await ctx.maybe_reply(embed=embed)
+        embed.set_thumbnail(url=ctx.bot.user.avatar_url)
+        return embed
 
     async def send_cog_help(self, cog):
-        ctx = self.context
-        bot = ctx.bot
-
-        embed = discord.Embed(title=f"Module **{cog.qualified_name}**", description=cog.description, embed_type=enums.EmbedType.INFO)
-        commands_in_cog = ""
-        for command in cog.get_commands():
-            commands_in_cog += command.name + "\n"
-        embed.add_field(name="**Commands**", value=commands_in_cog, inline=False)
-        embed.set_footer(text=f"Do {self.clean_prefix}help <command> to get help on a specific command.")
-        embed.quick_set_author(ctx.author)
-        embed.set_thumbnail(url=bot.user.avatar_url)
-        await ctx.maybe_reply(embed=embed)
+        entry = self.index().cogs.get(cog.qualified_name)
+        if entry is None:
+            return await self.send_error_message(self.command_not_found(cog.qualified_name))
+        await self.send_cog_entry(entry)
 
     async def send_group_help(self, group):
-        ctx = self.context
-        embed = em.CrajyEmbed(title=f"Group - {group.name}",
-                              description=f"{group.help} \n **Usage** `{self.get_command_signature(group)}`",
-                              color=discord.Color.blue())
-        for cmd in group.commands:
-            embed.add_field(name=cmd.name if cmd.name is not None else group.name, value=f"**Usage** `{self.get_command_signature(cmd)}`", inline=False)
-    
-        await ctx.send(embed=embed)
+        await self.send_command_help(group)
 
     async def send_command_help(self, command):
+        entry = self.index().commands.get(command.qualified_name)
+        if entry is None:
+            return await self.send_error_message(self.command_not_found(command.qualified_name))
+        await self.send_command_entry(entry)
+
+    async def send_cog_entry(self, entry: CogEntry):
         ctx = self.context
-        if command.root_parent is None:
-            embed = em.CrajyEmbed(title=f"Help - {command.name}",
-                                  description=f"{command.help} \n **Usage** `{self.get_command_signature(command)}` \n **Aliases** `{', '.join(command.aliases)}`",
-                                  embed_type=enums.EmbedType.INFO)
-        else:
-            embed = em.CrajyEmbed(title=f"Help - {command.name}",
-                                  description=f"{command.help} \n **Usage** `{self.get_command_signature(command)}` \n **Aliases** `{', '.join(command.aliases)}`",
-                                  embed_type=enums.EmbedType.INFO)
-            embed.set_footer(text=f"This command is part of the {command.root_parent.name} group.")
+        index = self.index()
+        prefix = self.clean_prefix
+        lines = [f"`{prefix}{index.commands[name].usage}` {index.commands[name].short_help}" for name in entry.commands]
+        pages = list(mitertools.chunked(lines, self.COMMANDS_PER_PAGE)) or [["No commands."]]
+
+        def build(page, number, total):
+            embed = em.CrajyEmbed(title=f"Module **{entry.name}**", description=entry.description, embed_type=enums.EmbedType.INFO)
+            embed.add_field(name="**Commands**", value="\n".join(page), inline=False)
+            footer = f"Do {prefix}help <command> to get help on a specific command."
+            embed.set_footer(text=f"{footer} Page {number + 1}/{total}" if total > 1 else footer)
+            embed.quick_set_author(ctx.author)
+            embed.set_thumbnail(url=ctx.bot.user.avatar_url)
+            return embed
+
+        if len(pages) == 1:
+            return await ctx.maybe_reply(embed=build(pages[0], 0, 1))
+        await em.lazy_embed_paginate(pages, build).start(ctx)
 
+    async def send_command_entry(self, entry: CommandEntry):
+        ctx = self.context
+        prefix = self.clean_prefix
+        aliases = f" \n **Aliases** `{', '.join(entry.aliases)}`" if entry.aliases else ""
+        embed = em.CrajyEmbed(title=f"Help - {entry.name}",
+                              description=f"{entry.help} \n **Usage** `{prefix}{entry.usage}`{aliases}",
+                              embed_type=enums.EmbedType.INFO)
+        index = self.index()
+        for name in entry.subcommands:
+            sub = index.commands[name]
+            embed.add_field(name=name, value=f"**Usage** `{prefix}{sub.usage}` {sub.short_help}", inline=False)
+        if entry.parent is not None:
+            embed.set_footer(text=f"This command is part of the {entry.parent} group.")
         await ctx.send(embed=embed)
 
     def get_command_signature(self, command):
@@ -0,0 +1,93 @@
+"""An index of every command, for the help command. Building it walks every cog and command once, rendering their
+usage strings; `.help` then only looks things up. The bot marks the index stale whenever a command is added or
+removed (so when an extension is loaded, unloaded or reloaded), and it is rebuilt on the next lookup.
+Lookups accept exact names and aliases, unique prefixes (`.help lead` finds leaderboard), and close misspellings."""
+import bisect
+import difflib
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from discord.ext import commands
+
+HIDDEN_COGS = ("Control", "ErrorHandler", "Jishaku")
+
+
+class CommandEntry(NamedTuple):
+    name: str    # qualified name, e.g. "bday all"
+    usage: str    # qualified name and signature, without the prefix
+    help: str
+    short_help: str
+    aliases: Tuple[str, ...]
+    cog: Optional[str]
+    parent: Optional[str]
+    subcommands: Tuple[str, ...]    # qualified names
+
+
+class CogEntry(NamedTuple):
+    name: str
+    description: str
+    commands: Tuple[str, ...]    # qualified names of the cog's top level commands
+
+
+def usage(command: commands.Command) -> str:
+    return f"{command.qualified_name} {command.signature}".rstrip()
+
+
+class HelpIndex:
+    def __init__(self) -> None:
+        self.stale = True
+        self.cogs: Dict[str, CogEntry] = {}
+        self.commands: Dict[str, CommandEntry] = {}    # qualified name: entry
+        self._lookup: Dict[str, Union[CommandEntry, CogEntry]] = {}    # lowercase names and aliases
+        self._names: List[str] = []    # sorted keys of _lookup, for prefix search
+
+    def invalidate(self) -> None:
+        self.stale = True
+
+    def build(self, bot: commands.Bot) -> None:
+        self.cogs, self.commands, lookup = {}, {}, {}
+        for command in bot.walk_commands():
+            cog = command.cog_name
+            if command.hidden or cog in HIDDEN_COGS:
+                continue
+            subcommands = ()
+            if isinstance(command, commands.Group):
+                subcommands = tuple(sorted(c.qualified_name for c in command.commands if not c.hidden))
+            entry = CommandEntry(command.qualified_name, usage(command), command.help or "", command.short_doc or "",
+                                 tuple(command.aliases), cog, command.full_parent_name or None, subcommands)
+            self.commands[entry.name] = entry
+            parent = f"{entry.parent} " if entry.parent else ""
+            for name in (command.name, *command.aliases):
+                lookup.setdefault(f"{parent}{name}".lower(), entry)
+        for name, cog in bot.cogs.items():
+            if name in HIDDEN_COGS:
+                continue
+            top_level = tuple(sorted(c.qualified_name for c in cog.get_commands() if c.qualified_name in self.commands))
+            self.cogs[name] = CogEntry(name, cog.description or "", top_level)
+            lookup.setdefault(name.lower(), self.cogs[name])
+        self._lookup = lookup
+        self._names = sorted(lookup)
+        self.stale = False
+
+    def ensure(self, bot: commands.Bot) -> "HelpIndex":
+        if self.stale:
+            self.build(bot)
+        return self
+
+    def find(self, query: str) -> Optional[Union[CommandEntry, CogEntry]]:
+        """Finds a command or cog by exact name or alias, then unique prefix, then the closest spelling."""
+        query = " ".join(query.lower().split())
+        if query in self._lookup:
+            return self._lookup[query]
+        start = bisect.bisect_left(self._names, query)
+        matches = {id(self._lookup[name]): self._lookup[name]
+                   for name in self._names[start:start + 20] if name.startswith(query)}
+        if len(matches) == 1:
+            return next(iter(matches.values()))
+        close = difflib.get_close_matches(query, self._names, n=1, cutoff=0.7)
+        return self._lookup[close[0]] if close else None
+
+    def suggestions(self, query: str, n: int = 3) -> List[str]:
+        query = " ".join(query.lower().split())
+        start = bisect.bisect_left(self._names, query)
+        prefixed = [name for name in self._names[start:start + n] if name.startswith(query)]
+        return prefixed or difflib.get_close_matches(query, self._names, n=n, cutoff=0.5)
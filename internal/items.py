@@ -0,0 +1,153 @@
+"""The item catalog and user inventories.
+Items live in the `items` table and inventories in `inventory(user_id, item_id, qty)`, one row per item a user
+owns. The whole catalog is small, so it is cached in memory: the shop is served without a query, and item names are
+resolved to ids without one. Every process reloads the catalog when another one changes it (NOTIFY).
+Buying and selling are single transactions whose updates check their own preconditions (enough cash, stock, or
+items), so concurrent purchases can never oversell or overdraw."""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "crajy_items"
+
+
+@dataclass(frozen=True)
+class Item:
+    item_id: int
+    name: str
+    price: int
+    stock: Optional[int]    # None for unlimited stock
+
+    @property
+    def stock_display(self) -> str:
+        return "∞" if self.stock is None else str(self.stock)
+
+
+class ItemCatalog:
+    def __init__(self, db) -> None:
+        self.db = db
+        self._by_id: Dict[int, Item] = {}
+        self._by_name: Dict[str, Item] = {}
+        self._connection = None    # holds the LISTEN
+        self.on_change: List[Callable[[], None]] = []    # called whenever the cached catalog changes
+
+    def __iter__(self):
+        return iter(sorted(self._by_id.values(), key=lambda item: item.item_id))
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    async def start(self) -> None:
+        await self.reload()
+        self._connection = await self.db.pool.acquire()
+        await self._connection.add_listener(CHANNEL, self._on_notify)
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self.db.pool.release(self._connection)
+            self._connection = None
+
+    async def reload(self) -> None:
+        items = [Item(r["item_id"], r["item_name"], r["price"], r["stock"]) for r in await self.db.fetch("items.all")]
+        self._by_id = {item.item_id: item for item in items}
+        self._by_name = {item.name.lower(): item for item in items}
+        self._changed()
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        asyncio.ensure_future(self.reload())
+
+    async def changed(self) -> None:
+        """Reloads the catalog here, and tells the other processes to reload theirs."""
+        await self.db.execute("items.notify", CHANNEL)
+        await self.reload()
+
+    def _replace(self, item: Item) -> None:
+        self._by_id[item.item_id] = item
+        self._by_name[item.name.lower()] = item
+        self._changed()
+
+    def _changed(self) -> None:
+        for callback in self.on_change:
+            callback()
+
+    def get(self, name: str) -> Item:
+        """Returns an item by its (case insensitive) name. Raises ValueError if there's no such item."""
+        try:
+            return self._by_name[name.lower()]
+        except KeyError:
+            raise ValueError(f"There's no item called {name}.") from None
+
+    def by_id(self, item_id: int) -> Optional[Item]:
+        return self._by_id.get(item_id)
+
+    async def update(self, item: Item, **changes) -> Item:
+        """Changes an item's price or stock."""
+        for column, value in changes.items():
+            await self.db.execute(f"items.set_{column}", value, item.item_id)
+        await self.changed()
+        return self._by_id[item.item_id]
+
+    async def change_price(self, name: str, amount: int) -> Item:
+        record = await self.db.fetchrow("items.change_price", amount, self.get(name).item_id)
+        await self.changed()
+        return self._by_id[record["item_id"]]
+
+    # inventories
+
+    async def inventory(self, user_id: int) -> List[Tuple[Item, int]]:
+        """Returns the (item, quantity) pairs a user owns."""
+        records = await self.db.fetch("inventory.get", user_id)
+        return [(self._by_id[r["item_id"]], r["qty"]) for r in records if r["item_id"] in self._by_id]
+
+    async def quantity(self, user_id: int, item: Item) -> int:
+        return await self.db.fetchval("inventory.quantity", user_id, item.item_id) or 0
+
+    async def give(self, changes: Iterable[Tuple[int, Item, int]], session=None) -> None:
+        """Adds quantities to inventories, in one statement for any number of (user_id, item, qty) rows. Rows for the
+        same user and item are combined first."""
+        combined: Dict[Tuple[int, int], int] = {}
+        for user_id, item, qty in changes:
+            combined[(user_id, item.item_id)] = combined.get((user_id, item.item_id), 0) + qty
+        if not combined:
+            return
+        user_ids, item_ids = zip(*combined)
+        await (session or self.db).execute("inventory.add_many", list(user_ids), list(item_ids), list(combined.values()))
+
+    async def take(self, user_id: int, item: Item, qty: int, session=None) -> bool:
+        """Removes items from an inventory. Returns False, and removes nothing, if the user doesn't have enough."""
+        remaining = await (session or self.db).fetchval("inventory.take", user_id, item.item_id, qty)
+        return remaining is not None
+
+    async def set_quantity(self, user_id: int, item: Item, qty: int) -> None:
+        await self.db.execute("inventory.set", user_id, item.item_id, qty)
+
+    # the shop
+
+    async def buy(self, user_id: int, item: Item, qty: int) -> int:
+        """Buys `qty` of an item for a user. Returns the total cost; raises ValueError if the user can't afford it or
+        there isn't enough stock."""
+        cost = item.price * qty
+        async with self.db.transaction() as session:
+            if await session.fetchval("economy.spend", cost, user_id) is None:
+                raise ValueError("poopi you don't have enough moni")
+            stock = await session.fetchrow("items.take_stock", qty, item.item_id)
+            if stock is None:
+                raise ValueError("Bruh not enough stock of this item is left.")
+            await self.give([(user_id, item, qty)], session=session)
+        if item.stock is not None:
+            self._replace(Item(item.item_id, item.name, item.price, stock["stock"]))
+            await self.db.execute("items.notify", CHANNEL)
+        return cost
+
+    async def sell(self, user_id: int, item: Item, qty: int) -> int:
+        """Sells `qty` of an item at its current price. Returns the money earned; raises ValueError if the user doesn't
+        have that many."""
+        earned = item.price * qty
+        async with self.db.transaction() as session:
+            if not await self.take(user_id, item, qty, session=session):
+                raise ValueError(f"You don't have {qty} {item.name}.")
+            await session.execute("economy.add_cash", earned, user_id)
+        return earned
@@ -0,0 +1,253 @@
+"""Supervisor for every periodic job the bot runs (stock price changes, birthday wishes, chat money etc).
+Replaces discord.ext.tasks loops, which die silently when they raise, and leak duplicates when a cog is reloaded."""
+import asyncio
+import datetime
+import heapq
+import itertools
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from internal.stats import Histogram
+from utils.timezone import BOT_TZ
+
+log = logging.getLogger(__name__)
+
+
+class Clock:
+    """The real clock. Jobs read time and sleep only through a clock, so they can be driven by a fake one."""
+    def time(self) -> float:
+        return time.time()
+
+    def perf_counter(self) -> float:
+        return time.perf_counter()
+
+    async def sleep(self, seconds: float) -> None:
+        await asyncio.sleep(seconds)
+
+
+class FakeClock(Clock):
+    """A clock for benchmarks and checks. Time stands still while anything can still run, and then jumps straight to
+    the next sleeper's wake up time, so days of jobs or hours of throttled deletes pass in moments.
+    Drive it with `run_until`, or let `run` drive it until a coroutine is done."""
+    def __init__(self, now: float = 0.0) -> None:
+        self.now = now
+        self._sleepers = []    # heap of (wake up time, order, future)
+        self._order = itertools.count()
+
+    def time(self) -> float:
+        return self.now
+
+    def perf_counter(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._sleepers, (self.now + max(0.0, seconds), next(self._order), future))
+        await future
+
+    @staticmethod
+    async def settle() -> None:
+        """Lets woken tasks run until they sleep again."""
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+    def _wake_next(self) -> None:
+        self.now, _, future = heapq.heappop(self._sleepers)
+        if not future.done():    # cancelled sleepers are skipped
+            future.set_result(None)
+
+    async def run_until(self, end: float) -> None:
+        """Wakes every sleeper due by `end`, in order, and leaves the time at `end`."""
+        await self.settle()
+        while self._sleepers and self._sleepers[0][0] <= end:
+            self._wake_next()
+            await self.settle()
+        self.now = max(self.now, end)
+
+    async def run(self, awaitable):
+        """Runs `awaitable` to completion, moving time forward whenever everything is asleep. Returns its result."""
+        task = asyncio.ensure_future(awaitable)
+        while True:
+            await self.settle()
+            if task.done():
+                return task.result()
+            if self._sleepers:
+                self._wake_next()
+            else:
+                await asyncio.sleep(0.001)    # waiting on something other than the clock
+
+
+class Job:
+    """A coroutine function that is run every `interval` seconds.
+    If `align` is True, runs happen on wall-clock multiples of the interval counted from midnight in `tz`; so a job
+    with a 24 hour interval runs at midnight, and one with a 3 hour interval runs at 00:00, 03:00, 06:00 and so on.
+    Otherwise the first run happens as soon as the job starts, and `jitter` (a fraction of the interval) is applied
+    to every following run.
+    A job that raises is retried after `min_backoff` seconds, doubling up to `max_backoff`, with jitter. Runs never
+    overlap; each job runs in a single task.
+    `leader_only` jobs are skipped on every process but the leader, so that they run once across a multi-process bot."""
+    def __init__(self, name: str, func: Callable[[], Awaitable[None]], *, interval: float, align: bool = False,
+                 tz: datetime.tzinfo = BOT_TZ, jitter: float = 0.0, min_backoff: float = 5, max_backoff: float = 600,
+                 leader_only: bool = False) -> None:
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.align = align
+        self.tz = tz
+        self.jitter = jitter
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.leader_only = leader_only
+
+        self.runs = 0
+        self.skipped = 0    # runs skipped because this process isn't the leader
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.last_run = None    # UNIX timestamp of the start of the last run
+        self.next_run = None
+        self.running = False
+        self.duration = Histogram()
+        self.lag = Histogram()    # how late runs started, compared to when they were scheduled
+
+        self.clock = Clock()
+        self.leader_check = lambda: True    # set by the supervisor
+        self._task = None
+        self._run_lock = asyncio.Lock()
+
+    def next_run_after(self, now: float) -> float:
+        """Returns the timestamp of the next run after a successful run at `now`."""
+        if not self.align:
+            return now + self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+        local = datetime.datetime.fromtimestamp(now, self.tz)
+        midnight = local.replace(hour=0, minute=0, second=0, microsecond=0)
+        if hasattr(self.tz, "localize"):    # pytz timezones need to be localized, not replaced
+            midnight = self.tz.localize(midnight.replace(tzinfo=None))
+        midnight = midnight.timestamp()
+        periods = int((now - midnight) // self.interval) + 1
+        next_midnight = midnight + 86400
+        return min(midnight + periods * self.interval, next_midnight)
+
+    def backoff(self) -> float:
+        backoff = min(self.min_backoff * 2 ** (self.consecutive_failures - 1), self.max_backoff)
+        return random.uniform(backoff / 2, backoff)
+
+    async def run_once(self) -> bool:
+        """Runs the job a single time. Returns False if a run was already in progress, or the run failed."""
+        if self._run_lock.locked():
+            return False
+        async with self._run_lock:
+            self.running = True
+            self.last_run = self.clock.time()
+            start = self.clock.perf_counter()
+            try:
+                await self.func()
+            except Exception as e:
+                self.failures += 1
+                self.consecutive_failures += 1
+                self.last_error = e
+                log.exception("Job %s failed (%s in a row)", self.name, self.consecutive_failures)
+                return False
+            else:
+                self.consecutive_failures = 0
+                return True
+            finally:
+                self.runs += 1
+                self.running = False
+                self.duration.observe(self.clock.perf_counter() - start)
+
+    async def _loop(self) -> None:
+        now = self.clock.time()
+        self.next_run = self.next_run_after(now) if self.align else now
+        while True:
+            delay = self.next_run - self.clock.time()
+            if delay > 0:
+                await self.clock.sleep(delay)
+            if self.leader_only and not self.leader_check():
+                self.skipped += 1
+                self.next_run = self.next_run_after(self.clock.time())
+                continue
+            started = self.clock.time()
+            self.lag.observe(max(0.0, started - self.next_run))
+            if await self.run_once():
+                self.next_run = self.next_run_after(self.clock.time())
+            else:
+                self.next_run = self.clock.time() + self.backoff()
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._loop())
+            self._task.add_done_callback(self._on_done)
+
+    def stop(self) -> None:
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        """Restarts the job if its task ever ends without being stopped."""
+        if task is not self._task or task.cancelled():
+            return
+        log.error("Job %s stopped unexpectedly, restarting it.", self.name, exc_info=task.exception())
+        self._task = None
+        self.start(task.get_loop())
+
+    @property
+    def healthy(self) -> bool:
+        return self._task is not None and not self._task.done() and self.consecutive_failures == 0
+
+    def summary(self) -> str:
+        status = "🟢" if self.healthy else ("🟡" if self._task is not None else "🔴")
+        last = "never" if self.last_run is None else f"{int(self.clock.time() - self.last_run)}s ago"
+        upcoming = "-" if self.next_run is None else f"in {max(0, int(self.next_run - self.clock.time()))}s"
+        error = f"\nLast error: {self.last_error!r}" if self.last_error else ""
+        skipped = f", {self.skipped} skipped (not leader)" if self.skipped else ""
+        return (f"{status} {self.runs} runs, {self.failures} failed{skipped}. Last run {last}, next {upcoming}\n"
+                f"Duration: {self.duration.summary()}\nLag: {self.lag.summary()}{error}")
+
+
+class JobSupervisor:
+    """Owns every periodic job. Jobs added before `start` is called begin running once it is; `start` is called by
+    the bot once it is ready."""
+    def __init__(self, loop: asyncio.AbstractEventLoop, clock: Clock = None) -> None:
+        self.loop = loop
+        self.clock = clock or Clock()
+        self.jobs: Dict[str, Job] = {}
+        self.started = False
+        self.is_leader: Callable[[], bool] = lambda: True    # replaced by the bot once its state backend exists
+
+    def __iter__(self):
+        return iter(self.jobs.values())
+
+    def add(self, job: Job) -> Job:
+        """Registers a job. An existing job with the same name is stopped and replaced."""
+        self.remove(job.name)
+        job.clock = self.clock
+        job.leader_check = lambda: self.is_leader()
+        self.jobs[job.name] = job
+        if self.started:
+            job.start(self.loop)
+        return job
+
+    def remove(self, name: str) -> Optional[Job]:
+        job = self.jobs.pop(name, None)
+        if job is not None:
+            job.stop()
+        return job
+
+    def get(self, name: str) -> Optional[Job]:
+        return self.jobs.get(name)
+
+    def start(self) -> None:
+        if self.started:
+            return
+        self.started = True
+        for job in self.jobs.values():
+            job.start(self.loop)
+
+    def stop(self) -> None:
+        self.started = False
+        for job in self.jobs.values():
+            job.stop()
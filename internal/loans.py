@@ -0,0 +1,62 @@
+"""Loans. A user can have one open loan at a time; the amount they owe (principal plus interest) is kept in
+economy.debt, and the loan itself in the `loans` table with its due date.
+Nothing waits for a loan to come due. A periodic sweep warns everyone whose loan is due soon and defaults every
+overdue loan, each in one statement that reads only those loans through the index on `due_at`. Time comes from a
+`internal.jobs.Clock`, so the sweep can be driven by a fake one."""
+import datetime
+from typing import List, NamedTuple
+
+from internal.jobs import Clock
+
+TERM = 24 * 3600    # seconds until a loan is due
+WARN_BEFORE = 6 * 3600    # users are warned this long before their loan is due
+INTEREST = 5    # percent of the principal, added to the debt when the loan is taken
+FINE = 10    # percent of the principal, charged on top of the debt when a loan defaults
+
+
+class SweepResult(NamedTuple):
+    warned: List[int]    # users whose loans are due within WARN_BEFORE
+    defaulted: List[int]    # users whose loans defaulted
+
+
+class LoanBook:
+    def __init__(self, db, clock: Clock = None) -> None:
+        self.db = db
+        self.clock = clock or Clock()
+
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.clock.time(), datetime.timezone.utc)
+
+    async def take(self, user_id: int, amount: int) -> int:
+        """Lends `amount` to a user. Returns what they owe; raises ValueError if they already have a loan, or ask for
+        twice their bank balance or more."""
+        if amount <= 0:
+            raise ValueError("You can't take a loan of nothing.")
+        debt = amount + amount * INTEREST // 100
+        async with self.db.transaction() as session:
+            if await session.fetchval("loans.take", amount, debt, user_id) is None:
+                raise ValueError("You cannot take a loan greater than twice your current balance / you have an unpaid loan, repay it and try again.")
+            await session.execute("loans.create", user_id, amount, self.now() + datetime.timedelta(seconds=TERM))
+        return debt
+
+    async def repay(self, user_id: int) -> int:
+        """Repays a user's loan from their cash. Returns the cash they have left; raises ValueError if they have no
+        debt, or not enough cash."""
+        async with self.db.transaction() as session:
+            cash = await session.fetchval("loans.repay", user_id)
+            if cash is None:
+                balance = await session.fetchrow("economy.balance", user_id)
+                if balance is None or balance["debt"] <= 0:
+                    raise ValueError("You do not have any debt.")
+                raise ValueError("You do not have enough cash to repay your debt.")
+            await session.execute("loans.delete", user_id)
+        return cash
+
+    async def sweep(self) -> SweepResult:
+        """Warns the owners of loans that are due soon, and defaults overdue loans: their debt and the fine are taken
+        from their cash, which can go negative."""
+        now = self.now()
+        async with self.db.transaction() as session:
+            defaulted = await session.fetch("loans.default", now, FINE)
+            warned = await session.fetch("loans.warn", now + datetime.timedelta(seconds=WARN_BEFORE))
+        return SweepResult([r["user_id"] for r in warned], [r["user_id"] for r in defaulted])
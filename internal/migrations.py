@@ -0,0 +1,71 @@
+"""Versioned schema migrations.
+Migrations are the .sql files in migrations/, named `<version>_<name>.sql`, and are applied in version order. Each
+one runs in its own transaction, and is recorded in `schema_migrations` once applied. An advisory lock keeps two
+processes from migrating at the same time."""
+import logging
+import os
+import re
+from typing import List, NamedTuple
+
+from internal.state import lock_key
+
+log = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+FILENAME = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: str
+
+    def sql(self) -> str:
+        with open(self.path) as f:
+            return f.read()
+
+
+def discover(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for filename in os.listdir(directory):
+        match = FILENAME.match(filename)
+        if match:
+            migrations.append(Migration(int(match[1]), match[2], os.path.join(directory, filename)))
+    migrations.sort()
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Two migrations in {directory} have the same version.")
+    return migrations
+
+
+async def applied_versions(connection) -> set:
+    await connection.execute("CREATE TABLE IF NOT EXISTS schema_migrations(version INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+                             "applied_at TIMESTAMPTZ NOT NULL DEFAULT now())")
+    return {record["version"] for record in await connection.fetch("SELECT version FROM schema_migrations")}
+
+
+async def pending(pool, directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    async with pool.acquire() as connection:
+        applied = await applied_versions(connection)
+    return [m for m in discover(directory) if m.version not in applied]
+
+
+async def migrate(pool, directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    """Applies every pending migration. Returns the migrations that were applied."""
+    key = lock_key("crajy:migrations")
+    done = []
+    async with pool.acquire() as connection:
+        await connection.execute("SELECT pg_advisory_lock($1)", key)
+        try:
+            applied = await applied_versions(connection)    # read under the lock, in case another process just migrated
+            for migration in discover(directory):
+                if migration.version in applied:
+                    continue
+                log.info("Applying migration %04d_%s", migration.version, migration.name)
+                async with connection.transaction():
+                    await connection.execute(migration.sql())
+                    await connection.execute("INSERT INTO schema_migrations(version, name) VALUES($1, $2)", migration.version, migration.name)
+                done.append(migration)
+        finally:
+            await connection.execute("SELECT pg_advisory_unlock($1)", key)
+    return done
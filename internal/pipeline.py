@@ -0,0 +1,140 @@
+"""One on_message for the whole bot.
+Every message used to go to each listener (commands, chat money, currency conversion, among us) separately, and each
+checked `author.bot` and lowercased the content for itself. The pipeline receives the message once, wraps it in an
+`IncomingMessage` that computes the lowercase content, its tokens and the command prefix at most once, and hands it to
+the stages that want it. Stages declare cheap filters (bots, guild only, commands or not, a channel set, a keyword
+set), which the pipeline checks in that order before scheduling a stage; a stage that is filtered out costs no task."""
+import asyncio
+import logging
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Container, Dict, FrozenSet, List, Optional, Union
+
+import discord
+
+from internal.stats import Histogram
+
+log = logging.getLogger(__name__)
+
+# numbers (with their decimals) and words; so "100.5 usd?" is ["100.5", "usd"]
+TOKEN = re.compile(r"\d+(?:\.\d+)?|\w+")
+
+STAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class IncomingMessage:
+    """A message, and what stages want to know about it; each computed on first use."""
+    __slots__ = ("message", "prefix", "_lower", "_tokens")
+
+    def __init__(self, message: discord.Message, prefix: Optional[str]) -> None:
+        self.message = message
+        self.prefix = prefix    # the command prefix the message starts with, if any
+
+    @property
+    def content(self) -> str:
+        return self.message.content
+
+    @property
+    def lower(self) -> str:
+        try:
+            return self._lower
+        except AttributeError:
+            self._lower = self.message.content.lower()
+            return self._lower
+
+    @property
+    def tokens(self) -> List[str]:
+        """The lowercase words and numbers of the message, in order."""
+        try:
+            return self._tokens
+        except AttributeError:
+            self._tokens = TOKEN.findall(self.lower)
+            return self._tokens
+
+
+# a channel set, or a function of the message that returns one (for sets that depend on the guild)
+ChannelFilter = Union[Container[int], Callable[[discord.Message], Container[int]]]
+
+
+@dataclass(eq=False)
+class Stage:
+    name: str
+    callback: Callable[[IncomingMessage], Awaitable[None]]
+    bots: bool = False    # whether messages from bots (and webhooks) reach the stage
+    guild_only: bool = False
+    commands: Optional[bool] = None    # True: only messages that start with a prefix, False: only the others
+    channels: Optional[ChannelFilter] = None    # only messages in these channels
+    keywords: Optional[FrozenSet[str]] = None    # only messages with one of these (lowercase) tokens
+    timings: Histogram = field(default_factory=lambda: Histogram(STAGE_BUCKETS))
+    skipped: int = 0    # messages filtered out
+
+    def accepts(self, incoming: IncomingMessage) -> bool:
+        message = incoming.message
+        if message.author.bot and not self.bots:
+            return False
+        if self.guild_only and message.guild is None:
+            return False
+        if self.commands is not None and (incoming.prefix is not None) != self.commands:
+            return False
+        if self.channels is not None:
+            channels = self.channels(message) if callable(self.channels) else self.channels
+            if message.channel.id not in channels:
+                return False
+        if self.keywords is not None and self.keywords.isdisjoint(incoming.tokens):
+            return False
+        return True
+
+    def summary(self) -> str:
+        return f"ran {self.timings.count}, skipped {self.skipped}: {self.timings.summary('µs', 1e6)}"
+
+
+class MessagePipeline:
+    def __init__(self, get_prefix: Callable[[discord.Message], Awaitable[Union[str, List[str]]]]) -> None:
+        self.get_prefix = get_prefix
+        self.stages: Dict[str, Stage] = {}
+        self.filtering = Histogram(STAGE_BUCKETS)    # time spent deciding which stages get each message
+        self.stats = Counter()    # messages, scheduled, failed
+
+    def add(self, stage: Stage) -> Stage:
+        """Adds a stage, replacing any with the same name, so reloading a cog doesn't add it twice."""
+        self.stages[stage.name] = stage
+        return stage
+
+    def remove(self, name: str) -> None:
+        self.stages.pop(name, None)
+
+    async def prefix_of(self, message: discord.Message) -> Optional[str]:
+        prefixes = await self.get_prefix(message)
+        if isinstance(prefixes, str):
+            prefixes = (prefixes,)
+        for prefix in prefixes:
+            if message.content.startswith(prefix):
+                return prefix
+        return None
+
+    async def process(self, message: discord.Message) -> List[asyncio.Task]:
+        """Schedules every stage that accepts the message. Stages run concurrently, as listeners would."""
+        incoming = IncomingMessage(message, await self.prefix_of(message))
+        start = time.perf_counter()
+        self.stats["messages"] += 1
+        tasks = []
+        for stage in list(self.stages.values()):
+            if stage.accepts(incoming):
+                tasks.append(asyncio.ensure_future(self._run(stage, incoming)))
+            else:
+                stage.skipped += 1
+        self.stats["scheduled"] += len(tasks)
+        self.filtering.observe(time.perf_counter() - start)
+        return tasks
+
+    async def _run(self, stage: Stage, incoming: IncomingMessage) -> None:
+        start = time.perf_counter()
+        try:
+            await stage.callback(incoming)
+        except Exception:
+            self.stats["failed"] += 1
+            log.exception("Message stage %s failed", stage.name)
+        finally:
+            stage.timings.observe(time.perf_counter() - start)
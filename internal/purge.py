@@ -0,0 +1,210 @@
+"""Deleting many messages, for `.clear`.
+Filters are parsed and compiled once into a single predicate, which only checks what was asked for. History is read
+a page at a time; matching messages are bulk deleted 100 at a time, which is one request per 100 messages. Discord
+refuses to bulk delete messages older than 14 days, so those are deleted one at a time, at a throttled rate so that
+they don't eat the channel's rate limit. Progress is reported as it goes."""
+import datetime
+import re
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, FrozenSet, List, Optional, Pattern, Sequence
+
+import discord
+
+from internal.jobs import Clock
+from utils import timezone
+
+BULK_LIMIT = 100    # messages per bulk delete, and per page of history
+BULK_MAX_AGE = datetime.timedelta(days=14) - datetime.timedelta(minutes=1)    # a little under Discord's limit
+SINGLE_DELETE_INTERVAL = 1.2    # seconds between deletes of old messages
+PROGRESS_INTERVAL = 3    # seconds between progress reports
+
+FILTER_HELP = ("`author=` (a member, several separated by commas), `match=` (a regex on the content), `older=` and "
+               "`newer=` (an age like `2d` or `1h30m`), `attachments=yes|no`, `bots=yes|no`, `channel=` (another channel to clear)")
+
+
+@dataclass(frozen=True)
+class PurgeFilter:
+    authors: FrozenSet[int] = frozenset()
+    pattern: Optional[Pattern] = None
+    older_than: Optional[datetime.timedelta] = None
+    newer_than: Optional[datetime.timedelta] = None
+    attachments: Optional[bool] = None
+    bots: Optional[bool] = None
+    channel: Optional[discord.TextChannel] = None    # the channel to clear, if not the one the command was used in
+
+    @classmethod
+    def parse(cls, guild: discord.Guild, args: Sequence[str]) -> "PurgeFilter":
+        """Parses `key=value` arguments. Raises ValueError for anything it doesn't understand."""
+        values = {}
+        authors = set()
+        for arg in args:
+            key, sep, value = arg.partition("=")
+            key = key.lower()
+            if not sep or not value:
+                raise ValueError(f"Filters look like `key=value`, not `{arg}`. Filters: {FILTER_HELP}.")
+            if key in ("author", "user"):
+                authors.update(resolve_member(guild, name) for name in value.split(","))
+            elif key == "match":
+                try:
+                    values["pattern"] = re.compile(value, re.IGNORECASE)
+                except re.error as e:
+                    raise ValueError(f"`{value}` isn't a valid regex: {e}.")
+            elif key in ("older", "newer"):
+                now = datetime.datetime.now(datetime.timezone.utc)
+                values[f"{key}_than"] = timezone.parse_time(value, now=now) - now
+            elif key in ("attachments", "bots"):
+                if value.lower() not in ("yes", "no", "true", "false"):
+                    raise ValueError(f"`{key}` is yes or no, not `{value}`.")
+                values[key] = value.lower() in ("yes", "true")
+            elif key == "channel":
+                channel = resolve_channel(guild, value)
+                values["channel"] = channel
+            else:
+                raise ValueError(f"There's no `{key}` filter. Filters: {FILTER_HELP}.")
+        return cls(authors=frozenset(authors), **values)
+
+    def compile(self, now: datetime.datetime) -> Callable[[discord.Message], bool]:
+        """One predicate, made of a check for each filter that was given. `now` is naive UTC, like message times."""
+        checks = []
+        if self.authors:
+            authors = self.authors
+            checks.append(lambda message: message.author.id in authors)
+        if self.bots is not None:
+            bots = self.bots
+            checks.append(lambda message: message.author.bot == bots)
+        if self.attachments is not None:
+            attachments = self.attachments
+            checks.append(lambda message: bool(message.attachments) == attachments)
+        if self.older_than is not None:
+            before = now - self.older_than
+            checks.append(lambda message: message.created_at <= before)
+        if self.newer_than is not None:
+            after = now - self.newer_than
+            checks.append(lambda message: message.created_at >= after)
+        if self.pattern is not None:    # the most expensive check goes last
+            search = self.pattern.search
+            checks.append(lambda message: search(message.content) is not None)
+
+        if not checks:
+            return lambda message: True
+        if len(checks) == 1:
+            return checks[0]
+        return lambda message: all(check(message) for check in checks)
+
+
+def resolve_member(guild: discord.Guild, value: str) -> int:
+    value = value.strip()
+    digits = value.strip("<@!>")
+    if digits.isdigit():
+        return int(digits)
+    member = guild.get_member_named(value)
+    if member is None:
+        raise ValueError(f"There's no member called `{value}`.")
+    return member.id
+
+
+def resolve_channel(guild: discord.Guild, value: str) -> discord.TextChannel:
+    digits = value.strip().strip("<#>")
+    channel = guild.get_channel(int(digits)) if digits.isdigit() else discord.utils.get(guild.text_channels, name=value.strip().lstrip("#"))
+    if channel is None:
+        raise ValueError(f"There's no channel called `{value}`.")
+    return channel
+
+
+@dataclass
+class PurgeProgress:
+    limit: int
+    scanned: int = 0
+    matched: int = 0
+    deleted: int = 0
+    bulk_requests: int = 0
+    single_requests: int = 0
+    done: bool = False
+    failed: List[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        state = "Done" if self.done else "Working"
+        failed = f" {len(self.failed)} deletes failed." if self.failed else ""
+        return (f"{state}: scanned {self.scanned}/{self.limit}, deleted {self.deleted}/{self.matched} matching "
+                f"({self.bulk_requests} bulk and {self.single_requests} single deletes).{failed}")
+
+
+class Purge:
+    """Deletes the messages that match `predicate` among the newest `limit` messages of a channel, before `before`."""
+    def __init__(self, channel: discord.TextChannel, predicate: Callable[[discord.Message], bool], limit: int, *,
+                 before: discord.abc.Snowflake = None, clock: Clock = None,
+                 on_progress: Callable[[PurgeProgress], Awaitable[None]] = None,
+                 single_interval: float = SINGLE_DELETE_INTERVAL, progress_interval: float = PROGRESS_INTERVAL) -> None:
+        self.channel = channel
+        self.predicate = predicate
+        self.before = before
+        self.clock = clock or Clock()
+        self.on_progress = on_progress
+        self.single_interval = single_interval
+        self.progress_interval = progress_interval
+        self.progress = PurgeProgress(limit)
+        self._last_report = self.clock.perf_counter()
+
+    async def run(self) -> PurgeProgress:
+        bulk_cutoff = datetime.datetime.utcfromtimestamp(self.clock.time()) - BULK_MAX_AGE
+        before = self.before
+        batch = []    # recent messages to bulk delete
+        while self.progress.scanned < self.progress.limit:
+            page = await self.channel.history(limit=min(BULK_LIMIT, self.progress.limit - self.progress.scanned),
+                                              before=before).flatten()
+            if not page:
+                break
+            self.progress.scanned += len(page)
+            before = page[-1]
+            for message in page:
+                if not self.predicate(message):
+                    continue
+                self.progress.matched += 1
+                if message.created_at > bulk_cutoff:
+                    batch.append(message)
+                    if len(batch) == BULK_LIMIT:
+                        await self._bulk_delete(batch)
+                        batch = []
+                else:
+                    # history is newest first, so every recent match has been seen; delete them before going slow
+                    if batch:
+                        await self._bulk_delete(batch)
+                        batch = []
+                    await self._single_delete(message)
+            await self._report()
+        if batch:
+            await self._bulk_delete(batch)
+        self.progress.done = True
+        await self._report(force=True)
+        return self.progress
+
+    async def _bulk_delete(self, messages: List[discord.Message]) -> None:
+        self.progress.bulk_requests += 1
+        try:
+            await self.channel.delete_messages(messages)    # a single message is deleted on its own
+        except discord.HTTPException as e:
+            self.progress.failed.append(str(e))
+            return
+        self.progress.deleted += len(messages)
+
+    async def _single_delete(self, message: discord.Message) -> None:
+        if self.progress.single_requests:
+            await self.clock.sleep(self.single_interval)
+        self.progress.single_requests += 1
+        try:
+            await message.delete()
+        except discord.NotFound:
+            return
+        except discord.HTTPException as e:
+            self.progress.failed.append(str(e))
+            return
+        self.progress.deleted += 1
+        await self._report()
+
+    async def _report(self, force: bool = False) -> None:
+        if self.on_progress is None:
+            return
+        now = self.clock.perf_counter()
+        if force or now - self._last_report >= self.progress_interval:
+            self._last_report = now
+            await self.on_progress(self.progress)
@@ -0,0 +1,107 @@
+"""Every SQL statement the bot runs, by name. These are registered on `bot.db` and prepared on every connection.
+Statements that need a column name chosen at runtime are registered once per allowed column; pick one with
+`internal.database.column` and the whitelists below, never by formatting user input into SQL."""
+
+BALANCE_COLUMNS = ("cash", "bank", "debt")
+ITEM_COLUMNS = ("stock", "price")
+
+STATEMENTS = {
+    # members
+    "economy.register": "INSERT INTO economy VALUES($1)",
+    "user_details.register": "INSERT INTO user_details VALUES($1)",
+    "economy.delete": "DELETE FROM economy WHERE user_id=$1",
+
+    # economy
+    "economy.get": "SELECT * FROM economy WHERE user_id=$1",
+    "economy.balance": "SELECT cash, bank, cash + bank - debt AS networth, debt FROM economy WHERE user_id=$1",
+    "economy.cash": "SELECT cash FROM economy WHERE user_id=$1",
+    "economy.withdraw": "UPDATE economy SET cash=cash + $1, bank=bank - $1 WHERE user_id=$2",
+    "economy.withdraw_all": "UPDATE economy SET cash=cash + bank, bank=0 WHERE user_id=$1",
+    "economy.deposit": "UPDATE economy SET bank=bank + $1, cash=cash - $1 WHERE user_id=$2",
+    "economy.deposit_all": "UPDATE economy SET bank=cash + bank, cash=0 WHERE user_id=$1",
+    "economy.leaderboard": "SELECT user_id, bank + cash - debt AS networth FROM economy ORDER BY networth DESC",
+    "economy.chat_money": "UPDATE economy SET cash = cash + $1 WHERE user_id = $2",
+    "economy.spend": "UPDATE economy SET cash = cash - $1 WHERE user_id = $2 AND cash >= $1 RETURNING cash",
+    "user_details.get": "SELECT * FROM user_details WHERE user_id=$1",
+
+    # items and inventories; see internal/items.py
+    "items.all": "SELECT item_id, item_name, price, stock FROM items",
+    "items.take_stock": "UPDATE items SET stock = stock - $1 WHERE item_id = $2 AND (stock IS NULL OR stock >= $1) RETURNING stock",
+    "items.change_price": "UPDATE items SET price = price + $1 WHERE item_id = $2 RETURNING item_id, price",
+    "items.notify": "SELECT pg_notify($1, '')",
+    "inventory.get": "SELECT item_id, qty FROM inventory WHERE user_id = $1 AND qty > 0",
+    "inventory.quantity": "SELECT qty FROM inventory WHERE user_id = $1 AND item_id = $2",
+    "inventory.add_many": "INSERT INTO inventory(user_id, item_id, qty) SELECT * FROM unnest($1::BIGINT[], $2::INT[], $3::INT[]) "
+                          "ON CONFLICT (user_id, item_id) DO UPDATE SET qty = inventory.qty + EXCLUDED.qty",
+    "inventory.take": "UPDATE inventory SET qty = qty - $3 WHERE user_id = $1 AND item_id = $2 AND qty >= $3 RETURNING qty",
+    "inventory.set": "INSERT INTO inventory(user_id, item_id, qty) VALUES($1, $2, $3) ON CONFLICT (user_id, item_id) DO UPDATE SET qty = $3",
+
+    # loans; see internal/loans.py
+    "loans.take": "UPDATE economy SET cash = cash + $1, debt = $2 WHERE user_id = $3 AND debt = 0 AND bank * 2 > $1 RETURNING debt",
+    "loans.create": "INSERT INTO loans(user_id, principal, due_at) VALUES($1, $2, $3)",
+    "loans.repay": "UPDATE economy SET cash = cash - debt, debt = 0 WHERE user_id = $1 AND debt > 0 AND cash >= debt RETURNING cash",
+    "loans.delete": "DELETE FROM loans WHERE user_id = $1",
+    "loans.warn": "UPDATE loans SET warned = TRUE WHERE due_at <= $1 AND NOT warned RETURNING user_id, due_at",
+    "loans.default": "WITH defaulted AS (DELETE FROM loans WHERE due_at <= $1 RETURNING user_id, principal) "
+                     "UPDATE economy SET cash = cash - debt - defaulted.principal * $2 / 100, debt = 0 "
+                     "FROM defaulted WHERE economy.user_id = defaulted.user_id RETURNING economy.user_id",
+
+    # birthdays and time zones
+    "user_details.bday": "SELECT bday FROM user_details WHERE user_id=$1",
+    "user_details.set_bday": "INSERT INTO user_details(bday, user_id) VALUES($1, $2) ON CONFLICT (user_id) DO UPDATE SET bday=$1",
+    "user_details.all_bdays": "SELECT user_id, bday FROM user_details ORDER BY bday ASC",
+    "user_details.bdays_today": "SELECT user_id FROM user_details WHERE EXTRACT(day FROM bday)=EXTRACT(day FROM current_date) AND EXTRACT(month FROM bday)=EXTRACT(month FROM current_date)",
+    "user_details.timezone": "SELECT timezone FROM user_details WHERE user_id=$1",
+    "user_details.set_timezone": "INSERT INTO user_details(timezone, user_id) VALUES($1, $2) ON CONFLICT (user_id) DO UPDATE SET timezone=$1",
+
+    # notes and reminders
+    "notes.create": "INSERT INTO notes(user_id, raw_note, reminder) VALUES($1, $2, $3) RETURNING note_id",
+    "notes.pop_reminder": "DELETE FROM notes WHERE note_id = $1 RETURNING raw_note",
+    "notes.all": "SELECT note_id, raw_note FROM notes WHERE user_id=$1",
+    "notes.some": "SELECT note_id, raw_note FROM notes WHERE user_id=$1 AND note_id=ANY($2::INT[])",
+    "notes.reminders": "SELECT note_id, raw_note FROM notes WHERE user_id = $1 AND reminder",
+    "notes.delete_all": "DELETE FROM notes WHERE user_id=$1",
+    "notes.delete_some": "DELETE FROM notes WHERE user_id=$1 AND note_id=ANY($2::INT[])",
+    "tasks.create": "INSERT INTO tasks(task_id, exec_time) VALUES($1, $2)",
+    "tasks.pending_reminders": "SELECT user_id, note_id, exec_time FROM notes JOIN tasks ON tasks.task_id = notes.note_id",
+
+    # tags
+    "tags.create": "INSERT INTO tags(tag_name, content, author) VALUES($1, $2, $3)",
+    "tags.author": "SELECT author FROM tags WHERE tag_name=$1",
+    "tags.delete": "DELETE FROM tags WHERE tag_name=$1",
+    "tags.edit_content": "UPDATE tags SET content=$1 WHERE tag_name=$2",
+    "tags.rename": "UPDATE tags SET tag_name=$1 WHERE tag_name=$2",
+    "tags.content": "SELECT content FROM tags WHERE tag_name=$1",
+    "tags.content_insensitive": "SELECT content FROM tags WHERE LOWER(tag_name)=$1",
+    "tags.list": "SELECT tag_name FROM tags",
+    "tags.search": "SELECT tag_name FROM tags WHERE LOWER(tag_name) LIKE '%' || $1 || '%'",
+
+    # pins
+    "pins.create": "INSERT INTO pins(synopsis, jump_url, author, pin_date, name) VALUES($1, $2, $3, $4, $5)",
+    "pins.list": "SELECT pin_id, synopsis, jump_url, author, pin_date FROM pins",
+    "pins.by_name": "SELECT pin_id, synopsis, jump_url, author, pin_date FROM pins WHERE name=$1",
+    "pins.by_id": "SELECT pin_id, synopsis, jump_url, author, pin_date FROM pins WHERE pin_id=$1",
+    "pins.delete_all": "DELETE FROM pins",
+    "pins.delete_some": "DELETE FROM pins WHERE name=ANY($1) OR pin_id=ANY($2)",
+
+    # role names
+    "role_names.create": "INSERT INTO role_names(role_name, author) VALUES ($1, $2)",
+    "role_names.all": "SELECT role_name, author FROM role_names",
+    "role_names.delete": "DELETE FROM role_names WHERE LOWER(role_name) = ANY($1) RETURNING role_name",
+}
+
+for _column in BALANCE_COLUMNS:
+    STATEMENTS[f"economy.add_{_column}"] = f"UPDATE economy SET {_column}={_column} + $1 WHERE user_id=$2"
+    STATEMENTS[f"economy.set_{_column}"] = f"UPDATE economy SET {_column}=$1 WHERE user_id=$2"
+for _column in ITEM_COLUMNS:
+    STATEMENTS[f"items.set_{_column}"] = f"UPDATE items SET {_column}=$1 WHERE item_id=$2"
+del _column
+
+# statements that read whole tables by design; `manage.py explain` doesn't report their sequential scans.
+FULL_SCANS = {
+    "items.all", "tags.list", "pins.list", "pins.delete_all", "role_names.all", "user_details.all_bdays",
+    "user_details.bdays_today",    # matches on day and month of every birthday
+    "tags.search",    # substring match; would need a pg_trgm index
+    "tasks.pending_reminders",    # every unfinished reminder, once at startup
+    "economy.leaderboard",
+}
@@ -0,0 +1,91 @@
+"""Reaction menus without the waiting.
+Discord allows about one reaction change per quarter second in a channel. Adding reactions one await at a time
+makes a command wait for every one of them before it can listen for input; `ReactionManager.add` instead adds them
+in a background task, paced per channel so that concurrent menus in one channel share the limit instead of running
+into 429s. Menus that ask several questions (akinator) edit one message and remove only the player's reaction after
+each answer, instead of deleting the message and adding every reaction again.
+discord.py 1.6 has no message components, so buttons aren't an option yet."""
+import asyncio
+import contextlib
+import time
+from collections import Counter
+from typing import Dict, Iterable, Optional, Sequence
+
+import discord
+
+REACTION_INTERVAL = 0.25    # seconds between reaction changes in a channel
+
+
+class ReactionManager:
+    def __init__(self, bot) -> None:
+        self.bot = bot
+        self.calls = Counter()    # API calls made, by kind
+        self._next_slot: Dict[int, float] = {}    # channel id: when the next reaction change may happen
+
+    async def _wait_for_slot(self, channel_id: int) -> None:
+        """Reserves the channel's next free slot, and sleeps until it. Slots are handed out in call order."""
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(channel_id, 0.0))
+        self._next_slot[channel_id] = slot + REACTION_INTERVAL
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def add(self, message: discord.Message, emojis: Iterable[str]) -> asyncio.Task:
+        """Adds reactions to a message, in order, in the background. Await the returned task to wait for all of them."""
+        return self.bot.loop.create_task(self._add(message, list(emojis)))
+
+    async def _add(self, message: discord.Message, emojis: Sequence[str]) -> None:
+        for emoji in emojis:
+            await self._wait_for_slot(message.channel.id)
+            self.calls["add"] += 1
+            with contextlib.suppress(discord.NotFound):    # the message was deleted before we were done
+                await message.add_reaction(emoji)
+
+    def can_manage(self, message: discord.Message) -> bool:
+        """Whether the bot may remove other people's reactions on this message."""
+        guild = getattr(message.channel, "guild", None)
+        return guild is not None and message.channel.permissions_for(guild.me).manage_messages
+
+    async def remove(self, message: discord.Message, emoji: str, member: discord.abc.Snowflake) -> None:
+        if not self.can_manage(message):
+            return
+        await self._wait_for_slot(message.channel.id)
+        self.calls["remove"] += 1
+        with contextlib.suppress(discord.HTTPException):
+            await message.remove_reaction(emoji, member)
+
+    async def clear(self, message: discord.Message, emoji: Optional[str] = None) -> None:
+        """Clears one emoji's reactions, or all of them."""
+        if not self.can_manage(message):
+            return
+        await self._wait_for_slot(message.channel.id)
+        self.calls["clear"] += 1
+        with contextlib.suppress(discord.HTTPException):
+            if emoji is None:
+                await message.clear_reactions()
+            else:
+                await message.clear_reaction(emoji)
+
+    async def wait(self, message: discord.Message, user: discord.abc.Snowflake, emojis: Iterable[str], *,
+                   timeout: Optional[float] = None) -> str:
+        """Waits for `user` to react to `message` with one of `emojis`, and returns the emoji. Raises
+        asyncio.TimeoutError on timeout; with no timeout, the router's default applies.
+        If the bot can't remove reactions, the player's old reactions stay, so un-reacting counts as a press too."""
+        emojis = set(emojis)
+        events = ["reaction_add"] if self.can_manage(message) else ["reaction_add", "reaction_remove"]
+        waiters = [asyncio.ensure_future(self.bot.router.wait(event, channel_id=message.channel.id, message_id=message.id, user_id=user.id,
+                                                              check=lambda payload: str(payload.emoji) in emojis, timeout=timeout))
+                   for event in events]
+        try:
+            done, _ = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+        return str(done.pop().result().emoji)    # raises the router's TimeoutError
+
+    async def choose(self, message: discord.Message, user: discord.abc.Snowflake, emojis: Iterable[str], *,
+                     timeout: Optional[float] = None) -> str:
+        """Like `wait`, but removes the player's reaction afterwards, so that the same message can ask again."""
+        emoji = await self.wait(message, user, emojis, timeout=timeout)
+        asyncio.ensure_future(self.remove(message, emoji, user))
+        return emoji
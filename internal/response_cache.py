@@ -0,0 +1,111 @@
+"""Caches the embeds that read-only commands build, so that they aren't rebuilt (usually after a query) every time.
+Decorate a coroutine that takes `ctx` and returns an embed, or a list of embeds, with `cached_response`. Results are
+stored as embed dicts, keyed on the function and its arguments, and each call gets fresh copies that it can change
+(to set the author, say) without touching the cached ones.
+Entries expire after their TTL, and are dropped early when one of their tags is invalidated, e.g. `shop` whenever the
+item catalog changes. The cache is per process; other processes notice a change when their own entries expire, so
+keep the TTL of anything that other processes can change short."""
+import copy
+import datetime
+import functools
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import discord
+
+from internal.stats import HitCounter
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = 512) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, tuple]]" = OrderedDict()    # key: (expires at, value, tags)
+        self._tags: Dict[str, set] = defaultdict(set)    # tag: keys
+        self.counters: Dict[str, HitCounter] = defaultdict(HitCounter)    # name: hits and misses
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any, ttl: float, tags: Iterable[str] = ()) -> None:
+        tags = tuple(tags)
+        self._drop(key)
+        self._entries[key] = (time.monotonic() + ttl, value, tags)
+        for tag in tags:
+            self._tags[tag].add(key)
+        while len(self._entries) > self.maxsize:
+            self._drop(next(iter(self._entries)))    # the least recently used
+
+    def _drop(self, key: Hashable) -> None:
+        """Removes an entry, and its key from the tags it had, so that tags don't collect the keys of evicted entries."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, *tags: str) -> None:
+        """Drops every entry with any of these tags."""
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                self._drop(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tags.clear()
+
+
+def _serialize(result) -> Tuple[bool, List[Tuple[type, dict]]]:
+    single = isinstance(result, discord.Embed)
+    # to_dict and from_dict share the fields list and nested dicts, so the cache keeps copies of its own
+    return single, [(type(embed), copy.deepcopy(embed.to_dict())) for embed in ([result] if single else result)]
+
+
+def _deserialize(value: Tuple[bool, List[Tuple[type, dict]]]):
+    single, data = value
+    embeds = [cls.from_dict(copy.deepcopy(d)) for cls, d in data]    # keeps CrajyEmbed's helpers
+    for embed in embeds:
+        if embed.timestamp:
+            embed.timestamp = datetime.datetime.utcnow()
+    return embeds[0] if single else embeds
+
+
+def cached_response(ttl: float, *, tags: Iterable[str] = (), key: Callable = None, name: str = None):
+    """Caches what the decorated coroutine returns: an embed, or a list of embeds. The coroutine's first argument after
+    `self` must be the invocation context, which is used to find the bot's cache.
+    The cache key is the function plus the remaining arguments, unless `key` is given; it's called with the same
+    arguments (ctx included) and returns something hashable. Use it when the result depends on the context, such as
+    the guild."""
+    tags = tuple(tags)
+
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(self, ctx, *args, **kwargs):
+            cache: ResponseCache = ctx.bot.response_cache
+            cache_key = (label, key(self, ctx, *args, **kwargs) if key else (args, tuple(sorted(kwargs.items()))))
+            value = cache.get(cache_key)
+            if value is not None:
+                cache.counters[label].hit()
+                return _deserialize(value)
+            cache.counters[label].miss()
+            result = await func(self, ctx, *args, **kwargs)
+            cache.put(cache_key, _serialize(result), ttl, tags)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,65 @@
+"""Routes messages and reactions to the commands waiting for them.
+`bot.wait_for` runs the predicate of every pending waiter for the event on every message or reaction, so each event
+costs O(waiters) and a few games going at once slow down every message. Here waiters are indexed by
+(event, channel id, message id, user id), and an event only runs the checks of the waiters at its own key; a waiter
+for anyone in a channel is stored with no user id. Every wait has a timeout, `default_timeout` if none is given, so a
+waiter whose user walked away doesn't live forever."""
+import asyncio
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Key = Tuple[str, int, Optional[int], Optional[int]]    # event, channel id, message id, user id
+
+EVENTS = ("message", "reaction_add", "reaction_remove")
+
+
+class InteractionRouter:
+    def __init__(self, default_timeout: float = 120) -> None:
+        self.default_timeout = default_timeout
+        self._waiters: Dict[Key, List[Tuple[asyncio.Future, Optional[Callable[[Any], bool]]]]] = defaultdict(list)
+        self._count = 0
+
+    def __len__(self) -> int:
+        """The number of live waiters."""
+        return self._count
+
+    async def wait(self, event: str, *, channel_id: int, message_id: int = None, user_id: int = None,
+                   check: Callable[[Any], bool] = None, timeout: float = None) -> Any:
+        """Waits for an event in a channel: a message (`message_id` must be None), or a reaction added to or removed
+        from a message. `user_id` None matches anyone. Returns the discord.Message or RawReactionActionEvent; raises
+        asyncio.TimeoutError after `timeout` seconds, or the default timeout."""
+        if event not in EVENTS:
+            raise ValueError(f"Can't wait for {event!r}; use one of {', '.join(EVENTS)}.")
+        key = (event, channel_id, message_id, user_id)
+        future = asyncio.get_event_loop().create_future()
+        entry = (future, check)
+        self._waiters[key].append(entry)
+        self._count += 1
+        try:
+            return await asyncio.wait_for(future, timeout or self.default_timeout)
+        finally:
+            waiters = self._waiters.get(key)
+            if waiters is not None:
+                waiters.remove(entry)
+                if not waiters:
+                    del self._waiters[key]
+            self._count -= 1
+
+    def dispatch(self, event: str, channel_id: int, message_id: Optional[int], user_id: int, payload: Any) -> int:
+        """Resolves the waiters that an event matches. Returns how many there were."""
+        if not self._count:
+            return 0
+        resolved = 0
+        for key in ((event, channel_id, message_id, user_id), (event, channel_id, message_id, None)):
+            for future, check in self._waiters.get(key, ()):
+                if future.done():
+                    continue
+                try:
+                    matches = check is None or check(payload)
+                except Exception as e:
+                    future.set_exception(e)
+                    continue
+                if matches:
+                    future.set_result(payload)
+                    resolved += 1
+        return resolved
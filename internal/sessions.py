@@ -0,0 +1,125 @@
+"""Live game sessions (tictactoe, akinator, ...).
+A game opens a session for as long as it runs. Sessions are capped per channel and across the bot, for each kind of
+game, and know how to clean up after themselves: a session that has had no input for longer than its idle timeout
+is evicted by a periodic job, which cancels the game and runs its cleanup callbacks (closing HTTP sessions and the
+like), so an abandoned game doesn't hold on to anything."""
+import asyncio
+import contextlib
+import logging
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from discord.ext import commands
+
+log = logging.getLogger(__name__)
+
+
+class SessionLimitReached(commands.CommandError):
+    """Raised by `SessionManager.open` when a kind of game is at its limit. The message says which limit, for the user."""
+
+
+def approximate_size(obj: Any, depth: int = 4, seen: set = None) -> int:
+    """sys.getsizeof of an object and what it holds, a few levels deep."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if depth <= 0:
+        return size
+    if isinstance(obj, dict):
+        size += sum(approximate_size(k, depth - 1, seen) + approximate_size(v, depth - 1, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approximate_size(i, depth - 1, seen) for i in obj)
+    elif hasattr(obj, "__dict__"):
+        size += approximate_size(vars(obj), depth - 1, seen)
+    return size
+
+
+class GameSession:
+    def __init__(self, kind: str, channel_id: int, user_id: int, idle_timeout: float) -> None:
+        self.kind = kind
+        self.channel_id = channel_id
+        self.user_id = user_id
+        self.idle_timeout = idle_timeout
+        self.started_at = time.monotonic()
+        self.last_active = self.started_at
+        self.state: Any = None    # the game's own state; counted in `size`
+        self.task: Optional[asyncio.Task] = asyncio.current_task()
+        self._cleanups: List[Callable[[], Awaitable[None]]] = []
+
+    def touch(self) -> None:
+        """Call on every move, so that an active game isn't evicted."""
+        self.last_active = time.monotonic()
+
+    @property
+    def idle(self) -> float:
+        return time.monotonic() - self.last_active
+
+    def add_cleanup(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """Registers a coroutine function to run when the session ends, however it ends."""
+        self._cleanups.append(callback)
+
+    async def cleanup(self) -> None:
+        cleanups, self._cleanups = self._cleanups, []
+        for callback in reversed(cleanups):
+            try:
+                await callback()
+            except Exception:
+                log.exception("Cleaning up a %s session failed", self.kind)
+
+    def size(self) -> int:
+        return approximate_size(self.state)
+
+    def summary(self) -> str:
+        return (f"<#{self.channel_id}> by <@{self.user_id}>, {int(time.monotonic() - self.started_at)}s old, "
+                f"idle {int(self.idle)}s, ~{self.size() / 1024:.1f}KiB")
+
+
+class SessionManager:
+    def __init__(self) -> None:
+        self.sessions: Dict[str, List[GameSession]] = defaultdict(list)    # kind: live sessions
+        self.limits: Dict[str, tuple] = {}    # kind: (per channel, total)
+        self.evicted = 0
+
+    def __iter__(self):
+        return (session for sessions in self.sessions.values() for session in sessions)
+
+    def __len__(self) -> int:
+        return sum(len(sessions) for sessions in self.sessions.values())
+
+    def set_limit(self, kind: str, *, per_channel: int = 1, total: int = 50) -> None:
+        self.limits[kind] = (per_channel, total)
+
+    @contextlib.asynccontextmanager
+    async def open(self, kind: str, channel_id: int, user_id: int, *, idle_timeout: float = 300):
+        """Opens a session for the duration of the `async with` block. Raises SessionLimitReached if the kind of game
+        is already at its limit in this channel, or across the bot."""
+        per_channel, total = self.limits.get(kind, (1, 50))
+        live = self.sessions[kind]
+        if sum(1 for s in live if s.channel_id == channel_id) >= per_channel:
+            raise SessionLimitReached(f"There's already a game of {kind} going on in this channel, wait for it to end!")
+        if len(live) >= total:
+            raise SessionLimitReached(f"Too many games of {kind} are going on right now, try again later.")
+        session = GameSession(kind, channel_id, user_id, idle_timeout)
+        live.append(session)
+        try:
+            yield session
+        finally:
+            with contextlib.suppress(ValueError):
+                live.remove(session)
+            await session.cleanup()
+
+    async def evict_idle(self) -> None:
+        """Ends every session that has been idle for longer than its timeout. Run periodically by the bot."""
+        for session in [s for s in self if s.idle > s.idle_timeout]:
+            log.info("Evicting idle %s session in channel %s", session.kind, session.channel_id)
+            self.evicted += 1
+            with contextlib.suppress(ValueError):
+                self.sessions[session.kind].remove(session)
+            if session.task is not None and not session.task.done():
+                session.task.cancel()    # the game's `async with` block exits, and cleans up
+            else:
+                await session.cleanup()
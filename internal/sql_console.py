@@ -0,0 +1,94 @@
+"""The owner's SQL console, for `.query`.
+A query runs in a read-only transaction with a statement timeout, and its rows are streamed from a server-side cursor
+in batches: the first few are kept for a preview, and every row is written to a gzipped CSV in a temporary file as it
+arrives. Nothing holds the whole result, so memory use doesn't grow with it. Headers come from the result's columns."""
+import csv
+import gzip
+import io
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import IO, List, Optional
+
+PREVIEW_ROWS = 10    # rows shown in the message
+CELL_WIDTH = 40    # characters per cell in the preview
+STATEMENT_TIMEOUT = 10    # seconds, per statement (declaring the cursor, and each fetch)
+TOTAL_TIMEOUT = 60    # seconds; streaming stops after this, whatever is left
+PREFETCH = 500    # rows per fetch from the cursor
+MAX_FILE_SIZE = 8 * 1024 * 1024 - 64 * 1024    # under Discord's upload limit
+
+
+@dataclass
+class QueryResult:
+    columns: List[str]
+    preview: List[tuple] = field(default_factory=list)
+    rows: int = 0    # rows written to the file
+    file: Optional[IO[bytes]] = None    # the gzipped CSV, rewound; close it when done
+    elapsed: float = 0.0
+    stopped: Optional[str] = None    # why streaming stopped before the end of the result, if it did
+
+    def summary(self) -> str:
+        rows = f"{self.rows} row{'s' if self.rows != 1 else ''} in {self.elapsed:.2f}s"
+        return f"{rows}; stopped early: {self.stopped}" if self.stopped else rows
+
+    def table(self, limit: int) -> str:
+        """The preview as a text table, with as many rows as fit in `limit` characters."""
+        from tabulate import tabulate    # only this needs tabulate; don't import it when the bot starts
+        rows = [tuple(shorten(value) for value in row) for row in self.preview]
+        while True:
+            table = tabulate(rows, headers=self.columns) if self.columns else "(no columns)"
+            if len(table) <= limit or not rows:
+                return table[:limit]
+            rows.pop()
+
+
+def shorten(value) -> str:
+    text = "NULL" if value is None else str(value).replace("\n", " ")
+    return text if len(text) <= CELL_WIDTH else text[:CELL_WIDTH - 1] + "…"
+
+
+def strip_code_block(query: str) -> str:
+    query = query.strip()
+    if query.startswith("```") and query.endswith("```"):
+        query = query[3:-3]
+        if query.lower().startswith("sql"):
+            query = query[3:]
+    return query.strip().strip("`").rstrip(";").strip()
+
+
+async def run_query(pool, query: str, *, preview_rows: int = PREVIEW_ROWS, statement_timeout: float = STATEMENT_TIMEOUT,
+                    total_timeout: float = TOTAL_TIMEOUT, max_file_size: int = MAX_FILE_SIZE) -> QueryResult:
+    """Runs a query read-only and streams its result. Raises asyncpg errors (syntax, timeout, writes) as they are."""
+    start = time.perf_counter()
+    deadline = start + total_timeout
+    raw = tempfile.TemporaryFile()
+    try:
+        async with pool.acquire() as connection:
+            async with connection.transaction(readonly=True):
+                await connection.execute(f"SET LOCAL statement_timeout = {int(statement_timeout * 1000)}")
+                statement = await connection.prepare(query)
+                result = QueryResult([attribute.name for attribute in statement.get_attributes()])
+                with gzip.GzipFile(fileobj=raw, mode="wb") as compressed, \
+                        io.TextIOWrapper(compressed, encoding="utf-8", newline="") as text:
+                    writer = csv.writer(text)
+                    writer.writerow(result.columns)
+                    async for record in statement.cursor(prefetch=PREFETCH):
+                        row = tuple(record)
+                        if len(result.preview) < preview_rows:
+                            result.preview.append(row)
+                        writer.writerow(row)
+                        result.rows += 1
+                        if result.rows % PREFETCH == 0:    # once per fetch
+                            if raw.tell() > max_file_size:
+                                result.stopped = "the file is as large as Discord allows"
+                                break
+                            if time.perf_counter() > deadline:
+                                result.stopped = f"took longer than {total_timeout}s"
+                                break
+    except BaseException:
+        raw.close()
+        raise
+    raw.seek(0)
+    result.file = raw
+    result.elapsed = time.perf_counter() - start
+    return result
@@ -0,0 +1,213 @@
+"""State shared between every process of the bot: counters, small JSON values, locks, and leader election.
+With a single process everything lives in memory (MemoryBackend). When the bot is split across several shard
+processes, PostgresBackend keeps the state in the database, uses advisory locks for locking and leader election,
+and LISTEN/NOTIFY to invalidate the values each process caches locally.
+
+Guild-bound work (birthday wishes, role renames, among us sessions) naturally happens on the one process whose shard
+owns the guild. Global periodic work (stock prices, chat money payouts) runs only on the leader."""
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from typing import Any, Dict
+
+log = logging.getLogger(__name__)
+
+
+def lock_key(name: str) -> int:
+    """A stable signed 64 bit key for postgres advisory locks. Python's hash() is randomized per process, so it can't be used."""
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+class StateBackend:
+    """Interface for shared state. Values must be JSON serializable."""
+    is_leader = False
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """Writes buffered changes to the backend, if it buffers any."""
+        pass
+
+    def incr(self, namespace: str, key: int, amount: int = 1) -> None:
+        """Increments a counter. Doesn't block; backends may buffer increments."""
+        raise NotImplementedError
+
+    async def drain(self, namespace: str) -> Dict[int, int]:
+        """Returns every counter in `namespace` and resets them, atomically."""
+        raise NotImplementedError
+
+    async def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    async def set(self, namespace: str, key: str, value: Any) -> None:
+        raise NotImplementedError
+
+    async def delete(self, namespace: str, key: str) -> None:
+        raise NotImplementedError
+
+    def lock(self, name: str):
+        """Async context manager holding a lock named `name` across every process."""
+        raise NotImplementedError
+
+    async def elect(self) -> bool:
+        """Tries to become (or stay) the leader. Returns whether this process is the leader."""
+        raise NotImplementedError
+
+
+class MemoryBackend(StateBackend):
+    """State for a single process. The only process is always the leader."""
+    is_leader = True
+
+    def __init__(self) -> None:
+        self._counters = defaultdict(lambda: defaultdict(int))
+        self._values = defaultdict(dict)
+        self._locks = defaultdict(asyncio.Lock)
+
+    def incr(self, namespace, key, amount=1):
+        self._counters[namespace][key] += amount
+
+    async def drain(self, namespace):
+        return dict(self._counters.pop(namespace, {}))
+
+    async def get(self, namespace, key, default=None):
+        return self._values[namespace].get(key, default)
+
+    async def set(self, namespace, key, value):
+        self._values[namespace][key] = value
+
+    async def delete(self, namespace, key):
+        self._values[namespace].pop(key, None)
+
+    def lock(self, name):
+        return self._locks[name]
+
+    async def elect(self):
+        return True
+
+
+class PostgresBackend(StateBackend):
+    """State shared through postgres, in the shared_counters and shared_state tables (see migrations/).
+    Counter increments are buffered in memory and written in one batch by `flush`, which the bot runs periodically;
+    `drain` flushes this process's buffer first. Values read with `get` are cached locally until another process
+    changes them, which it announces with a NOTIFY."""
+    CHANNEL = "crajy_state"
+    LEADER_LOCK = "crajy:leader"
+
+    def __init__(self, pool) -> None:
+        self.pool = pool
+        self.is_leader = False
+        self._buffer = defaultdict(lambda: defaultdict(int))
+        self._values = {}    # (namespace, key): value, kept in sync with NOTIFY
+        self._connection = None    # holds the leader lock and the LISTEN, for as long as this process lives
+
+    async def start(self):
+        await self._connect()
+
+    async def _connect(self):
+        self._connection = await self.pool.acquire()
+        await self._connection.add_listener(self.CHANNEL, self._on_notify)
+        self._values.clear()    # notifications sent while there was no listener were missed
+
+    async def _disconnect(self):
+        connection, self._connection = self._connection, None
+        self.is_leader = False
+        if connection is None:
+            return
+        try:
+            await self.pool.release(connection)    # give the pool its slot back, even for a dead connection
+        except Exception:
+            connection.terminate()
+
+    async def close(self):
+        await self.flush()
+        await self._disconnect()    # releasing resets the session, which drops the leader lock
+
+    def _on_notify(self, connection, pid, channel, payload):
+        namespace, _, key = payload.partition(":")
+        self._values.pop((namespace, key), None)
+
+    def incr(self, namespace, key, amount=1):
+        self._buffer[namespace][key] += amount
+
+    async def flush(self):
+        """Writes buffered counter increments to the database."""
+        if not self._buffer:
+            return
+        buffer, self._buffer = self._buffer, defaultdict(lambda: defaultdict(int))
+        rows = [(namespace, key, value) for namespace, counters in buffer.items() for key, value in counters.items()]
+        try:
+            await self.pool.executemany("INSERT INTO shared_counters(namespace, key, value) VALUES($1, $2, $3) "
+                                        "ON CONFLICT (namespace, key) DO UPDATE SET value = shared_counters.value + EXCLUDED.value", rows)
+        except Exception:
+            for namespace, key, value in rows:    # keep the increments for the next flush
+                self._buffer[namespace][key] += value
+            raise
+
+    async def drain(self, namespace):
+        await self.flush()
+        records = await self.pool.fetch("DELETE FROM shared_counters WHERE namespace=$1 RETURNING key, value", namespace)
+        return {record["key"]: record["value"] for record in records}
+
+    async def get(self, namespace, key, default=None):
+        try:
+            return self._values[(namespace, key)]
+        except KeyError:
+            pass
+        value = await self.pool.fetchval("SELECT value FROM shared_state WHERE namespace=$1 AND key=$2", namespace, key)
+        value = default if value is None else json.loads(value)
+        self._values[(namespace, key)] = value
+        return value
+
+    async def set(self, namespace, key, value):
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute("INSERT INTO shared_state(namespace, key, value) VALUES($1, $2, $3) "
+                                         "ON CONFLICT (namespace, key) DO UPDATE SET value=$3", namespace, key, json.dumps(value))
+                await connection.execute("SELECT pg_notify($1, $2)", self.CHANNEL, f"{namespace}:{key}")
+        self._values[(namespace, key)] = value
+
+    async def delete(self, namespace, key):
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute("DELETE FROM shared_state WHERE namespace=$1 AND key=$2", namespace, key)
+                await connection.execute("SELECT pg_notify($1, $2)", self.CHANNEL, f"{namespace}:{key}")
+        self._values.pop((namespace, key), None)
+
+    @contextlib.asynccontextmanager
+    async def lock(self, name):
+        key = lock_key(name)
+        async with self.pool.acquire() as connection:
+            await connection.execute("SELECT pg_advisory_lock($1)", key)
+            try:
+                yield
+            finally:
+                await connection.execute("SELECT pg_advisory_unlock($1)", key)
+
+    async def elect(self):
+        """The leader is whichever process holds the session-level leader advisory lock. If the leader's connection
+        dies, postgres releases the lock and the next process to call `elect` takes over."""
+        try:
+            if self._connection is None or self._connection.is_closed():
+                await self._disconnect()
+                await self._connect()
+            if not self.is_leader:
+                self.is_leader = await self._connection.fetchval("SELECT pg_try_advisory_lock($1)", lock_key(self.LEADER_LOCK))
+        except Exception:
+            log.exception("Leader election failed")
+            await self._disconnect()
+        return self.is_leader
+
+
+def create_backend(name: str, pool) -> StateBackend:
+    if name == "memory":
+        return MemoryBackend()
+    if name == "postgres":
+        return PostgresBackend(pool)
+    raise ValueError(f"Unknown state backend {name!r}; use 'memory' or 'postgres'.")
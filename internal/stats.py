@@ -0,0 +1,66 @@
+"""Small in-process metric types, used to keep track of latencies and hit rates."""
+import bisect
+from typing import Sequence
+
+
+class Histogram:
+    """A fixed-bucket histogram. Values are expected in seconds, but any unit works as long as the buckets match.
+    Keeps O(len(buckets)) memory no matter how many values are observed."""
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)    # the last bucket holds everything above the largest bound
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Returns the upper bound of the bucket that the `q`th quantile falls in."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            if running >= target:
+                return bound
+        return self.max
+
+    def summary(self, unit: str = "ms", scale: float = 1000) -> str:
+        if not self.count:
+            return "no data"
+        return (f"n={self.count} avg={self.mean * scale:.1f}{unit} p50≤{self.quantile(0.5) * scale:.0f}{unit} "
+                f"p95≤{self.quantile(0.95) * scale:.0f}{unit} max={self.max * scale:.1f}{unit}")
+
+
+class HitCounter:
+    """Counts cache hits and misses."""
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def hit(self) -> None:
+        self.hits += 1
+
+    def miss(self) -> None:
+        self.misses += 1
+
+    @property
+    def ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses ({self.ratio:.0%})"
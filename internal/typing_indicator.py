@@ -0,0 +1,66 @@
+"""The typing indicator, only for commands that are slow to answer.
+Triggering typing is an HTTP request of its own. Instead of sending it before every command, the command starts right
+away and typing is triggered only if it hasn't responded within `threshold` seconds. How long each command takes to
+respond is learned as an exponentially weighted moving average; commands that are usually slower than the threshold
+(API calls, akinator) trigger typing up front, as before."""
+import asyncio
+import contextlib
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+import discord
+
+from internal.stats import Histogram
+
+
+class TypingScheduler:
+    def __init__(self, threshold: float = 0.3, alpha: float = 0.2) -> None:
+        self.threshold = threshold
+        self.alpha = alpha    # weight of the newest observation
+        self.latency: Dict[str, float] = {}    # command: EWMA of seconds until its first response
+        self.response_time = Histogram()
+        self.stats = Counter()    # up_front, deferred (typing sent after the threshold), saved (never sent)
+
+    def expected(self, command: str) -> Optional[float]:
+        return self.latency.get(command)
+
+    def start(self, ctx) -> Optional[asyncio.Task]:
+        """Called when a command is invoked. Returns the task that will trigger typing if the command is slow, or None if
+        typing was triggered right away."""
+        ctx.invoked_at = time.perf_counter()
+        expected = self.expected(ctx.command.qualified_name)
+        if expected is not None and expected > self.threshold:
+            self.stats["up_front"] += 1
+            asyncio.ensure_future(self._trigger(ctx))
+            return None
+        return asyncio.ensure_future(self._type_if_slow(ctx))
+
+    async def _type_if_slow(self, ctx) -> None:
+        await asyncio.sleep(self.threshold)
+        if ctx.responded_at:
+            self.stats["saved"] += 1
+            return
+        self.stats["deferred"] += 1
+        await self._trigger(ctx)
+
+    @staticmethod
+    async def _trigger(ctx) -> None:
+        with contextlib.suppress(discord.HTTPException):
+            await ctx.trigger_typing()
+
+    def finish(self, ctx, task: Optional[asyncio.Task]) -> None:
+        """Called when the command is done. Learns how long it took to respond, and cancels typing that wasn't sent."""
+        if task is not None and not task.done():
+            task.cancel()
+            self.stats["saved"] += 1
+        elapsed = (ctx.responded_at or time.perf_counter()) - ctx.invoked_at
+        self.response_time.observe(elapsed)
+        name = ctx.command.qualified_name
+        previous = self.latency.get(name)
+        self.latency[name] = elapsed if previous is None else self.alpha * elapsed + (1 - self.alpha) * previous
+
+    def summary(self) -> str:
+        sent = self.stats["up_front"] + self.stats["deferred"]
+        return (f"{self.stats['saved']} typing requests saved, {sent} sent ({self.stats['up_front']} up front, "
+                f"{self.stats['deferred']} after {self.threshold * 1000:.0f}ms)\nTime to respond: {self.response_time.summary()}")
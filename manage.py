@@ -1,86 +1,201 @@
+"""Bot control. Run `python manage.py --help` for the available commands, or `python manage.py` for an interactive menu."""
 from utils.menu import Menu
-from secret.TOKEN import TOKEN
+from internal.config import Config, CONFIG_FILE, ENV_PREFIX, dump_toml, load_config
+import argparse
+import asyncio
 import os
+import sys
 
 def setup() -> None:
-    guild_id = int(input("Enter your Guild ID:"))
-    announce_channel = int(input("Enter channel ID where the bot is allowed to announce things:"))
-    test_channel = int(input("Enter ID of the channel where bot testing will be done:"))
-    general = int(input("Enter general chat ID:"))
-    bot_commander_roles = []
-    check = "y"
-    print()
-    while check == "y":
-        i = int(input("Enter the ID of role that can control the bot: "))
-        bot_commander_roles.append(i)
-        check = input("Enter more roles? (y/n): ")
-    chat_money_channels = []
-    check = "y"
-    print()
-    while check == "y":
-        i = int(input("Enter the ID of a channel where users will be allowed to earn currency for chatting: "))
-        chat_money_channels.append(i)
-        check = input("Enter more channels? (y/n): ")
-
-    with open(".\secret\constants_test.py", "w+") as f:
-        data = f"GUILD_ID = {guild_id}\nBOT_ANNOUNCE_CHANNEL = {announce_channel}\nBOT_TEST_CHANNEL = {test_channel}\nGENERAL_CHAT = {general}\nBOT_COMMANDER_ROLES = {bot_commander_roles}\nCHAT_MONEY_CHANNELS = {chat_money_channels}\nDEFAULT_COGS = ['economy', 'betting', 'moderator', 'stupid', 'notes']"
-        f.write(data)
-
-    print("Constants set up.")
-
-    with open(".\secret\KEY.py", "w") as f:
-        data = input("Enter your RapidAPI key: ")
-        f.write(f"KEY = {data}")
-
-    print("API key set up.")
-
-    with open(".\secret\TOKEN.py", "w") as f:
-        data = input("Enter your bot token: ")
-        f.write(f"TOKEN = {data}")
-
-    print("Bot token set up.")
-
-def debug():
+    with open(os.path.join("secret", "KEY.py"), "w") as f:
+        key = input("Enter your RapidAPI key: ")
+        currency_key = input("Enter your currconv.com API key: ")
+        f.write(f"KEY = {key!r}\nCURRENCY_KEY = {currency_key!r}\n")
+
+    print("API keys set up.")
+
+    config = Config(token=input("Enter your bot token: "),
+                    db_connection_string=input("Enter your PostgreSQL connection string: "),
+                    default_cogs=['economy', 'betting', 'moderator', 'stupid', 'notes'])
+    with open(CONFIG_FILE, "w") as f:
+        f.write(dump_toml(config))
+
+    print(f"Bot token and database set up in {CONFIG_FILE}.")
+    print("Server specific settings (announcement channel, economy channels etc) are set with the `settings` command once the bot is running.")
+
+def debug(cogs: list = None):
     print("DEBUG MODE")
-    print("Enter the name of the cog that you want to load. The name must match the filename.")
-    print("For example; to load `cogs/amongus.py` - enter `amongus`.")
-    print("If you want to load multiple cogs, enter their names separated by spaces. For example; `amongus economy`.")
-    func = lambda x: f"cogs.{x}"
-    cogs = list(map(func, input().split()))
+    if cogs is None:
+        print("Enter the name of the cog that you want to load. The name must match the filename.")
+        print("For example; to load `cogs/amongus.py` - enter `amongus`.")
+        print("If you want to load multiple cogs, enter their names separated by spaces. For example; `amongus economy`.")
+        cogs = input().split()
+    cogs = [f"cogs.{x}" for x in cogs]
     from bot import bot
-    from secret.constants import BOT_TEST_CHANNEL
 
     @bot.event
-    async def on_ready(): # sends this message when bot starts working in #bot-tests
-        await bot.get_channel(BOT_TEST_CHANNEL).send(f"Bot running in debug mode! Cogs loaded - {', '.join(cogs)}, jishaku.")
+    async def on_ready(): # sends this message when bot starts working in each server's test channel
+        for guild in bot.guilds:
+            channel = guild.get_channel(bot.settings_for(guild).test_channel)
+            if channel is not None:
+                await channel.send(f"Bot running in debug mode! Cogs loaded - {', '.join(cogs)}, jishaku.")
         print(f"Bot running in debug mode! Cogs loaded - {', '.join(cogs)}, jishaku.")
 
-    for cog in cogs:
-        bot.load_extension(cog)
-    else:
-        bot.load_extension("jishaku")
-    bot.run(TOKEN)
+    # extensions are loaded by the bot's startup pipeline, once the database pool and HTTP session are ready.
+    bot.initial_extensions.extend(cogs)
+    bot.initial_extensions.append("jishaku")
+    bot.run(bot.config.token)
+
+def get_default_extensions() -> list:
+    default_cogs = load_config().default_cogs
+    if default_cogs == []:
+        extensions = [f'cogs.{filename[:-3]}' for filename in os.listdir('./cogs') if filename.endswith('.py')]
+        extensions.append('jishaku')
+        return extensions
+    return [f'cogs.{cog}' for cog in default_cogs]
+
+def run(cogs: list = None, shards: int = None, processes: int = None):
+    """Runs the bot. With more than one process, splits the shards between processes run by a supervisor that restarts
+    processes that exit or stop reporting healthy."""
+    # overrides are passed through the environment, so that shard processes started by the supervisor inherit them.
+    if cogs is not None:
+        os.environ[ENV_PREFIX + "DEFAULT_COGS"] = ",".join(cogs)
+    if shards is not None:
+        os.environ[ENV_PREFIX + "SHARD_COUNT"] = str(shards)
+    if processes is not None:
+        os.environ[ENV_PREFIX + "PROCESSES"] = str(processes)
+
+    config = load_config()
+    if config.processes > 1:
+        if not config.shard_count:
+            raise ValueError("The number of shards has to be set to split them across processes.")
+        from internal.cluster import ProcessSupervisor, child_argv
+        supervisor = ProcessSupervisor(child_argv("run"), config.shard_count, config.processes, health_timeout=config.health_timeout)
+        return supervisor.run()
 
-def run():
     from bot import bot
-    from secret.constants import DEFAULT_COGS
-    #loading cogs
-    if DEFAULT_COGS == []:
-        for filename in os.listdir('./cogs'):
-            if filename.endswith('.py'):
-                bot.load_extension(f'cogs.{filename[:-3]}')
-        bot.load_extension('jishaku')
-    else:
-        for cog in DEFAULT_COGS:
-            bot.load_extension(f'cogs.{cog}')
+    # extensions are loaded by the bot's startup pipeline, once the database pool and HTTP session are ready.
+    bot.initial_extensions.extend(get_default_extensions())
+    bot.run(bot.config.token)
+
+BENCHMARKS = ("response_cache", "maybe_reply", "reactions", "jobs", "purge", "text", "time_parser", "pipeline", "shop", "router")    # modules in benchmarks/
+
+def benchmark(import_only: bool = False, **runs: int):
+    """Runs the first benchmark in BENCHMARKS that was given a size, or else profiles startup. Exits non-zero if a
+    benchmark's checks fail."""
+    import importlib
+    from benchmarks import CheckFailed
+    try:
+        for name in BENCHMARKS:
+            if runs.get(name):
+                return importlib.import_module(f"benchmarks.{name}").run(runs[name])
+        from benchmarks import startup
+        startup.import_profile(get_default_extensions())
+        if not import_only:
+            print()
+            startup.time_to_ready(get_default_extensions())
+    except CheckFailed as e:
+        sys.exit(f"Check failed: {e}")
+
+async def _create_pool():
+    import asyncpg
+    return await asyncpg.create_pool(load_config().db_connection_string, min_size=1, max_size=1)
 
-    for loop in bot.task_loops.values():   # start all task loops.
-        loop.start()
+def migrate(list_only: bool = False):
+    """Applies pending schema migrations from migrations/, or lists them."""
+    from internal import migrations
 
-    bot.run(TOKEN)
+    async def main():
+        pool = await _create_pool()
+        try:
+            if list_only:
+                pending = {m.version for m in await migrations.pending(pool)}
+                for m in migrations.discover():
+                    print(f"{'pending' if m.version in pending else 'applied'}  {m.version:04d}_{m.name}")
+                return
+            applied = await migrations.migrate(pool)
+            for m in applied:
+                print(f"Applied {m.version:04d}_{m.name}")
+            if not applied:
+                print("The database is up to date.")
+        finally:
+            await pool.close()
+
+    asyncio.run(main())
+
+def explain(seed: int = 0):
+    """Checks that every registered query can use an index; exits with an error if one needs a sequential scan."""
+    from internal import explain as plans
+    from internal.queries import FULL_SCANS, STATEMENTS
+
+    async def main():
+        pool = await _create_pool()
+        try:
+            return await plans.explain_all(pool, STATEMENTS, seed=seed)
+        finally:
+            await pool.close()
+
+    results = asyncio.run(main())
+    for r in results:
+        status = "ERROR" if r.error else ("scan" if r.seq_scans else "ok")
+        timing = "" if r.milliseconds is None else f"{r.milliseconds:8.2f}ms"
+        print(f"{status:<6}{timing:>10}  {r.name}  {r.error or ', '.join(r.seq_scans)}")
+    failed = plans.failures(results, FULL_SCANS)
+    if failed:
+        print(f"\n{len(failed)} statements need a sequential scan or failed: {', '.join(r.name for r in failed)}")
+        sys.exit(1)
+    print(f"\nAll {len(results)} statements can use an index (or are allowed to scan).")
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="CrajyBot control.")
+    subcommands = parser.add_subparsers(dest="command")
+
+    subcommands.add_parser("setup", help="Interactively write config.toml and the secret files.")
+
+    run_parser = subcommands.add_parser("run", help="Run the bot.")
+    run_parser.add_argument("--cogs", nargs="+", metavar="COG", help="Cogs to load, overriding default_cogs. Use the file names in cogs/ without .py.")
+    run_parser.add_argument("--shards", type=int, help="Total number of shards. Discord picks one if this isn't set.")
+    run_parser.add_argument("--processes", type=int, help="Number of processes to split the shards across, under a supervisor.")
+
+    debug_parser = subcommands.add_parser("debug", help="Run the bot with only some cogs, and jishaku.")
+    debug_parser.add_argument("--cogs", nargs="+", metavar="COG", required=True)
+
+    bench_parser = subcommands.add_parser("bench", help="Profile imports and measure time-to-ready.")
+    bench_parser.add_argument("--import-only", action="store_true", help="Only profile imports; don't connect to Discord.")
+    bench_parser.add_argument("--response-cache", type=int, default=0, metavar="N", help="Instead, make N calls to a cached response, checking each gets its own copy.")
+    bench_parser.add_argument("--maybe-reply", type=int, default=0, metavar="N", help="Instead, time N simulated commands deciding whether to reply.")
+    bench_parser.add_argument("--reactions", type=int, default=0, metavar="N", help="Instead, play N of each reaction game against a fake Discord, and check the API calls.")
+    bench_parser.add_argument("--jobs", type=int, default=0, metavar="N", help="Instead, drive the job supervisor through N days on a fake clock.")
+    bench_parser.add_argument("--purge", type=int, default=0, metavar="N", help="Instead, clear a fake channel of N messages.")
+    bench_parser.add_argument("--text", type=int, default=0, metavar="N", help="Instead, time the text transforms on N characters.")
+    bench_parser.add_argument("--time-parser", type=int, default=0, metavar="N", help="Instead, parse N reminder times.")
+    bench_parser.add_argument("--pipeline", type=int, default=0, metavar="N", help="Instead, run N synthetic messages through the message pipeline.")
+    bench_parser.add_argument("--router", type=int, default=0, metavar="N", help="Instead, time event dispatch with N waiting commands.")
+    bench_parser.add_argument("--shop", type=int, default=0, metavar="N", help="Instead, run N concurrent buys and sells against the database.")
+
+    migrate_parser = subcommands.add_parser("migrate", help="Apply pending database schema migrations.")
+    migrate_parser.add_argument("--list", action="store_true", help="Only list migrations, and whether they have been applied.")
+
+    explain_parser = subcommands.add_parser("explain", help="EXPLAIN ANALYZE every registered query, and fail if one needs a sequential scan.")
+    explain_parser.add_argument("--seed", type=int, default=0, metavar="N", help="Fill the tables with N rows per table first (rolled back afterwards).")
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    functions = [setup, run, debug]
-    menu = Menu(*functions, heading="Bot Control", format_symbol="=", continue_prompt=False)
-    menu.run()
\ No newline at end of file
+    args = parse_args()
+    if args.command == "setup":
+        setup()
+    elif args.command == "run":
+        run(cogs=args.cogs, shards=args.shards, processes=args.processes)
+    elif args.command == "debug":
+        debug(cogs=args.cogs)
+    elif args.command == "bench":
+        benchmark(import_only=args.import_only, **{name: getattr(args, name) for name in BENCHMARKS})
+    elif args.command == "migrate":
+        migrate(list_only=args.list)
+    elif args.command == "explain":
+        explain(seed=args.seed)
+    else:
+        functions = [setup, run, debug, benchmark, migrate]
+        menu = Menu(*functions, heading="Bot Control", format_symbol="=", continue_prompt=False)
+        menu.run()
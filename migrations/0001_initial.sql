@@ -0,0 +1,83 @@
+-- The schema the bot was built on, and the indexes its hot queries need.
+-- Tables are created only if they don't exist, so that databases set up before migrations existed are left as they are.
+
+CREATE TABLE IF NOT EXISTS economy(
+    user_id BIGINT PRIMARY KEY,
+    bank BIGINT NOT NULL DEFAULT 0,
+    cash BIGINT NOT NULL DEFAULT 0,
+    debt BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS user_details(
+    user_id BIGINT PRIMARY KEY,
+    zodiac TEXT,
+    bday DATE
+);
+
+CREATE TABLE IF NOT EXISTS inventories(
+    user_id BIGINT PRIMARY KEY,
+    stock INTEGER NOT NULL DEFAULT 0,
+    chicken INTEGER NOT NULL DEFAULT 0,
+    heist INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS shop(
+    item_id SERIAL PRIMARY KEY,
+    item_name TEXT NOT NULL UNIQUE,
+    stock INTEGER,    -- NULL for unlimited stock
+    price INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS notes(
+    note_id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    raw_note TEXT NOT NULL,
+    reminder BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+CREATE TABLE IF NOT EXISTS tasks(
+    task_id INTEGER PRIMARY KEY REFERENCES notes(note_id) ON DELETE CASCADE,
+    exec_time TIMESTAMP NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS tags(
+    tag_name TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    author BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS pins(
+    pin_id SERIAL PRIMARY KEY,
+    synopsis TEXT,
+    jump_url TEXT NOT NULL,
+    author BIGINT NOT NULL,
+    pin_date DATE NOT NULL,
+    name TEXT
+);
+
+CREATE TABLE IF NOT EXISTS role_names(
+    name_id SERIAL PRIMARY KEY,
+    role_name TEXT NOT NULL,
+    author BIGINT NOT NULL
+);
+
+-- Tables created above are already indexed by their primary keys. These indexes are for databases created before
+-- migrations existed, whose tables may have been made without keys; they're not unique, so duplicate rows don't fail
+-- the migration. user_details needs a unique index for the birthday upsert's ON CONFLICT.
+
+-- lookups by user: balance/inventory/birthday commands, notes and reminders
+CREATE INDEX IF NOT EXISTS economy_user_id_idx ON economy(user_id);
+CREATE UNIQUE INDEX IF NOT EXISTS user_details_user_id_idx ON user_details(user_id);
+CREATE INDEX IF NOT EXISTS inventories_user_id_idx ON inventories(user_id);
+CREATE INDEX IF NOT EXISTS notes_user_id_idx ON notes(user_id);
+-- the leaderboard
+CREATE INDEX IF NOT EXISTS economy_networth_idx ON economy((bank + cash - debt) DESC);
+-- shop lookups by item name
+CREATE INDEX IF NOT EXISTS shop_item_name_idx ON shop(item_name);
+-- unfinished reminders are loaded by time
+CREATE INDEX IF NOT EXISTS tasks_exec_time_idx ON tasks(exec_time);
+-- tags are used on every unknown command, by exact and case insensitive name
+CREATE INDEX IF NOT EXISTS tags_tag_name_idx ON tags(tag_name);
+CREATE INDEX IF NOT EXISTS tags_lower_tag_name_idx ON tags(LOWER(tag_name));
+CREATE INDEX IF NOT EXISTS pins_name_idx ON pins(name);
+CREATE INDEX IF NOT EXISTS role_names_lower_role_name_idx ON role_names(LOWER(role_name));
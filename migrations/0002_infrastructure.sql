@@ -0,0 +1,36 @@
+-- Tables used by the bot's own infrastructure, which used to be created when first used.
+
+-- internal/feeds.py PostgresFeedStore
+CREATE TABLE IF NOT EXISTS feed_cache(
+    name TEXT PRIMARY KEY,
+    value JSONB NOT NULL,
+    fetched_at DOUBLE PRECISION NOT NULL
+);
+
+-- internal/state.py PostgresBackend
+CREATE TABLE IF NOT EXISTS shared_counters(
+    namespace TEXT,
+    key BIGINT,
+    value BIGINT NOT NULL,
+    PRIMARY KEY(namespace, key)
+);
+
+CREATE TABLE IF NOT EXISTS shared_state(
+    namespace TEXT,
+    key TEXT,
+    value JSONB NOT NULL,
+    PRIMARY KEY(namespace, key)
+);
+
+-- internal/guild_settings.py
+CREATE TABLE IF NOT EXISTS guild_settings(
+    guild_id BIGINT PRIMARY KEY,
+    announce_channel BIGINT,
+    general_channel BIGINT,
+    test_channel BIGINT,
+    rotating_role BIGINT,
+    economy_channels BIGINT[] NOT NULL DEFAULT '{}',
+    betting_channels BIGINT[] NOT NULL DEFAULT '{}',
+    chat_money_channels BIGINT[] NOT NULL DEFAULT '{}',
+    commander_roles BIGINT[] NOT NULL DEFAULT '{}'
+);
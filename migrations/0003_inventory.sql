@@ -0,0 +1,42 @@
+-- Inventories move from one column per item to a row per (user, item). New items no longer need a schema change.
+-- The shop table becomes the item catalog.
+
+-- shop tables made before migrations existed may have no item_id, or no key on it (see 0001); inventory references it
+ALTER TABLE shop ADD COLUMN IF NOT EXISTS item_id SERIAL;
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = 'shop'::regclass AND contype = 'p') THEN
+        ALTER TABLE shop ADD PRIMARY KEY (item_id);
+    ELSIF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'shop'::regclass AND contype IN ('p', 'u')
+          AND conkey = ARRAY[(SELECT attnum FROM pg_attribute WHERE attrelid = 'shop'::regclass AND attname = 'item_id')]
+    ) THEN
+        ALTER TABLE shop ADD UNIQUE (item_id);
+    END IF;
+END
+$$;
+
+ALTER TABLE shop RENAME TO items;
+
+-- the items that used to be inventory columns; the shop may not have listed them all
+INSERT INTO items(item_name, price)
+SELECT name, 0 FROM (VALUES ('stock'), ('heist tools'), ('chicken')) AS defaults(name)
+WHERE NOT EXISTS (SELECT 1 FROM items WHERE items.item_name = defaults.name);
+
+CREATE TABLE inventory(
+    user_id BIGINT NOT NULL,
+    item_id INTEGER NOT NULL REFERENCES items(item_id) ON DELETE CASCADE,
+    qty INTEGER NOT NULL CHECK (qty >= 0),
+    PRIMARY KEY(user_id, item_id)
+);
+
+INSERT INTO inventory(user_id, item_id, qty)
+SELECT inventories.user_id, items.item_id, SUM(column_qty)
+FROM inventories
+CROSS JOIN LATERAL (VALUES ('stock', inventories.stock), ('heist tools', inventories.heist), ('chicken', inventories.chicken)) AS columns(item_name, column_qty)
+JOIN items ON items.item_name = columns.item_name
+WHERE column_qty > 0
+GROUP BY inventories.user_id, items.item_id;
+
+DROP TABLE inventories;
@@ -0,0 +1,12 @@
+-- Open loans; see internal/loans.py. The amount owed stays in economy.debt.
+-- No foreign key to economy: economy tables made before migrations may have no unique user_id (see 0001). A member's
+-- loan is deleted along with their economy row instead, in CrajyBot.delete_member.
+CREATE TABLE loans(
+    user_id BIGINT PRIMARY KEY,
+    principal BIGINT NOT NULL,
+    due_at TIMESTAMPTZ NOT NULL,
+    warned BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+-- the sweep only reads loans that are about to be or are overdue, however many are open
+CREATE INDEX loans_due_at ON loans(due_at);
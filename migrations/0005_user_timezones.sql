@@ -0,0 +1,2 @@
+-- The time zone reminders are read in (an IANA name like 'Europe/London'); NULL means the bot's own, see utils/timezone.py.
+ALTER TABLE user_details ADD COLUMN timezone TEXT;
@@ -2,6 +2,7 @@ import discord
 from discord.ext import menus
 import datetime
 import enum
+import typing
 from internal.enumerations import EmbedType
 
 
@@ -52,3 +53,18 @@ def quick_embed_paginate(embeds: list) -> menus.MenuPages:
     """Does the two step process of making ListPageSource, and making MenuPages in one function."""
     source = __ListEmbedSource(embeds)
     return menus.MenuPages(source=source, clear_reactions_after=True)
+
+
+class __LazyEmbedSource(menus.ListPageSource):
+    def __init__(self, data, build):
+        super().__init__(data, per_page=1)
+        self.build = build
+
+    async def format_page(self, menu, page):
+        return self.build(page, menu.current_page, self.get_max_pages())
+
+def lazy_embed_paginate(pages: list, build: typing.Callable[[typing.Any, int, int], discord.Embed]) -> menus.MenuPages:
+    """Like quick_embed_paginate, but each embed is only built when its page is shown.
+    `build` is called with the page's data, the page number (from 0), and the number of pages."""
+    source = __LazyEmbedSource(pages, build)
+    return menus.MenuPages(source=source, clear_reactions_after=True)
@@ -1,17 +1,15 @@
-import matplotlib
-matplotlib.use("Agg")
-
-from matplotlib.figure import Figure
-import numpy as np
-
+# matplotlib and numpy take a long time to import, so they are imported inside the graphing functions instead.
 import datetime
 import io
-from typing import Sequence
+from typing import TYPE_CHECKING, Sequence
 from dataclasses import dataclass
 from collections import namedtuple
 
 import discord
 
+if TYPE_CHECKING:
+    import numpy as np
+
 
 @dataclass
 class InstantaneousMetrics:
@@ -45,6 +43,7 @@ def parse_data(db_response: dict) -> InstantaneousMetrics:
 
 
 def graph_hourly_message_count(data: Sequence[InstantaneousMetrics]) -> ImageEmbed:
+    import numpy as np
     # data for x and y axes
     x_array = np.array([x.clean_hours_repr() for x in data])
     y_array = np.array([y.total_count() for y in data])
@@ -53,8 +52,12 @@ def graph_hourly_message_count(data: Sequence[InstantaneousMetrics]) -> ImageEmb
     return make_discord_embed(buffer)
 
 
-def _make_graph(title: str, *, xlabel: str, ylabel: str ,x_axis: np.array, y_axis: np.array) -> io.BytesIO:
+def _make_graph(title: str, *, xlabel: str, ylabel: str ,x_axis: "np.ndarray", y_axis: "np.ndarray") -> io.BytesIO:
     """A general graphing function that is called by all other functions."""
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+
     fig = Figure()
     ax = fig.subplots()
 
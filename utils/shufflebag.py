@@ -0,0 +1,75 @@
+"""A shuffle-bag; random picks without repeats until every item has been drawn once."""
+import random
+from typing import Hashable, Iterable, List, Dict, Optional
+
+
+class ShuffleBag:
+    """Holds a set of items and draws them randomly, without repeating any item until the bag has been emptied.
+    Once empty, the bag refills itself with every item and starts over.
+    `add`, `remove` and `pick` are all O(1); the remaining items are kept in a list, and removals swap the
+    removed item with the last element before popping."""
+    def __init__(self, items: Iterable[Hashable] = (), *, rng: random.Random = None) -> None:
+        self._rng = rng or random.Random()
+        self._items: Dict[Hashable, None] = dict.fromkeys(items)    # insertion ordered set of every item
+        self._remaining: List[Hashable] = []
+        self._positions: Dict[Hashable, int] = {}    # item -> index in self._remaining
+        self.last: Optional[Hashable] = None
+        self.refill()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def refill(self) -> None:
+        """Puts every item back in the bag."""
+        self._remaining = list(self._items)
+        self._positions = {item: index for index, item in enumerate(self._remaining)}
+
+    def add(self, item: Hashable) -> None:
+        if item in self._items:
+            return
+        self._items[item] = None
+        self._positions[item] = len(self._remaining)
+        self._remaining.append(item)
+
+    def remove(self, item: Hashable) -> None:
+        """Removes an item from the bag. Does nothing if the item isn't in the bag."""
+        if self._items.pop(item, ...) is ...:
+            return
+        self._discard_remaining(item)
+
+    def pick(self) -> Hashable:
+        """Draws a random item that hasn't been drawn since the last refill.
+        Raises IndexError if the bag has no items at all."""
+        if not self._items:
+            raise IndexError("pick from an empty ShuffleBag")
+        if not self._remaining:
+            self.refill()
+            # don't hand out the same item twice in a row across a refill
+            if len(self._remaining) > 1 and self.last in self._positions:
+                self._discard_remaining(self.last)
+                self._remaining.append(self.last)    # put it back last, and keep it out of this draw
+                self._positions[self.last] = len(self._remaining) - 1
+                index = self._rng.randrange(len(self._remaining) - 1)
+            else:
+                index = self._rng.randrange(len(self._remaining))
+        else:
+            index = self._rng.randrange(len(self._remaining))
+        item = self._remaining[index]
+        self._discard_remaining(item)
+        self.last = item
+        return item
+
+    def _discard_remaining(self, item: Hashable) -> None:
+        index = self._positions.pop(item, None)
+        if index is None:
+            return
+        last = self._remaining.pop()
+        if index < len(self._remaining):
+            self._remaining[index] = last
+            self._positions[last] = index
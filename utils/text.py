@@ -0,0 +1,122 @@
+"""Text transforms for the fun commands (owo, emojify, weird), and splitting text into messages Discord accepts.
+Character-for-character transforms are `str.translate` tables, built once at import. Transforms can be chained, like
+`.owo | weird`; a chain is compiled once, fusing neighbouring tables into one, so that it runs in as few passes over the
+text as possible."""
+import functools
+import re
+import string
+from typing import Callable, Dict, List, Sequence, Tuple
+
+DISCORD_LIMIT = 2000    # characters in a message
+MAX_MESSAGES = 3    # a transform's output is sent in at most this many messages
+CHAIN_LINK = re.compile(r"\|\s*(\w+)\s*")    # "| weird " and "|weird" both name "weird"
+
+
+class Transform:
+    """A table transform: maps every character through `table` (as made by str.maketrans)."""
+    def __init__(self, name: str, table: Dict[int, str]) -> None:
+        self.name = name
+        self.table = table
+
+    def __call__(self, text: str) -> str:
+        return text.translate(self.table)
+
+    def then(self, other: "Transform") -> "Transform":
+        """One table that does this transform, then `other`."""
+        table = {char: chr(char).translate(self.table).translate(other.table) for char in {*self.table, *other.table}}
+        return Transform(f"{self.name} | {other.name}", table)
+
+
+class PositionalTransform:
+    """A transform that depends on where characters are, so it can't be a table."""
+    table = None
+
+    def __init__(self, name: str, func: Callable[[str], str]) -> None:
+        self.name = name
+        self.func = func
+
+    def __call__(self, text: str) -> str:
+        return self.func(text)
+
+
+def alternate_case(text: str) -> str:
+    """hElLo: lowercase, then uppercase, by position."""
+    lower, upper = text.lower(), text.upper()
+    if len(lower) == len(upper) == len(text):
+        chars = list(lower)
+        chars[1::2] = upper[1::2]
+        return "".join(chars)
+    # some characters change length with their case ("ß".upper() is "SS"); go one character at a time
+    return "".join(char.upper() if i % 2 else char.lower() for i, char in enumerate(text))
+
+
+# regional indicator letters, with a space after each so that Discord doesn't join neighbouring ones into flags
+EMOJI_LETTERS = {letter: f"{chr(0x1F1E6 + i)} " for i, letter in enumerate(string.ascii_lowercase)}
+
+TRANSFORMS = {
+    "owo": Transform("owo", str.maketrans("lrLR", "wwWW")),
+    "emojify": Transform("emojify", str.maketrans({**EMOJI_LETTERS, **{letter.upper(): emoji for letter, emoji in EMOJI_LETTERS.items()}})),
+    "weird": PositionalTransform("weird", alternate_case),
+}
+
+
+class Chain:
+    def __init__(self, steps: Sequence) -> None:
+        self.steps = tuple(steps)
+
+    @property
+    def passes(self) -> int:
+        return len(self.steps)
+
+    def __call__(self, text: str) -> str:
+        for step in self.steps:
+            text = step(text)
+        return text
+
+
+@functools.lru_cache(maxsize=64)
+def compile_chain(names: Tuple[str, ...]) -> Chain:
+    """Compiles transforms, applied left to right, into a chain. Raises ValueError for a transform that doesn't exist."""
+    steps = []
+    for name in names:
+        try:
+            transform = TRANSFORMS[name]
+        except KeyError:
+            raise ValueError(f"There's no `{name}` transform. Try one of: {', '.join(TRANSFORMS)}.") from None
+        if transform.table is not None and steps and steps[-1].table is not None:
+            steps[-1] = steps[-1].then(transform)
+        else:
+            steps.append(transform)
+    return Chain(steps)
+
+
+def parse_chain(first: str, text: str) -> Tuple[Tuple[str, ...], str]:
+    """Reads the transforms chained after a command: for `.owo | weird hello`, ("owo", "weird"), "hello". Names end at
+    the next `|` as well as at a space, so `|weird|emojify`, `| weird | emojify` and `|weird |emojify` are the same."""
+    names = [first]
+    text = text.lstrip()
+    link = CHAIN_LINK.match(text)
+    while link is not None:
+        names.append(link[1].lower())
+        text = text[link.end():]
+        link = CHAIN_LINK.match(text)
+    return tuple(names), text
+
+
+def split_message(text: str, limit: int = DISCORD_LIMIT) -> List[str]:
+    """Splits text into pieces of at most `limit` characters, at the last line break in each piece, or else the last
+    space; words longer than a whole message are cut."""
+    pieces = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit + 1)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, limit + 1)
+        if cut > 0:
+            pieces.append(text[:cut])
+            text = text[cut + 1:]    # the line break or space itself isn't sent
+        else:
+            pieces.append(text[:limit])
+            text = text[limit:]
+    if text:
+        pieces.append(text)
+    return pieces
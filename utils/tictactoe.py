@@ -7,43 +7,41 @@ import random
 X = ('<:x1:757950268875735041>', '<:x2:757950318045560902>', '<:x3:757950402661449819>', '<:x4:757950360336728086>')
 O = ('<:o1:757945971123683418>', '<:o2:757945990090326068>', '<:o3:757946006322282507>', '<:o4:757946024064057395>')
 EMPTY = ("<:empty:755333349043863623>", "<:empty:755333349043863623>", "<:empty:755333349043863623>", "<:empty:755333349043863623>")
-board = {"↖": EMPTY, "⬆": EMPTY, "↗": EMPTY,
-         "⬅": EMPTY, "⏺": EMPTY, "➡": EMPTY,
-         "↙": EMPTY, "⬇": EMPTY, "↘": EMPTY}
+CELLS = ("↖", "⬆", "↗", "⬅", "⏺", "➡", "↙", "⬇", "↘")
 
 
-def initial_state():
+def new_board() -> dict:
     """
-    Returns starting state of the board.
+    Returns an empty board; each game keeps its own.
     """
-    return [board[i] for i in board]
+    return {cell: EMPTY for cell in CELLS}
 
 
-def update_board(main_embed, reaction, player):
+def initial_state(board):
+    """
+    Returns the state of the board as a list of cells.
+    """
+    return [board[i] for i in CELLS]
+
+
+def update_board(main_embed, board, reaction, player):
     board[reaction] = player
-    main_embed.description = update_board_embed()
+    main_embed.description = update_board_embed(board)
     return main_embed
 
 
-def update_board_embed():
+def update_board_embed(board):
     board_result = ""
     for i in range(3):
         line1 = ""
         line2 = ""
-        for j in ["↖", "⬆", "↗", "⬅", "⏺", "➡", "↙", "⬇", "↘"][i * 3:(i + 1) * 3]:
+        for j in CELLS[i * 3:(i + 1) * 3]:
             line1 += ''.join(board[j][0:2])
             line2 += ''.join(board[j][2:4])
         board_result += line1 + "\n" + line2 + "\n"
     return board_result
 
 
-def reset_board():
-    global board
-    board = {"↖": EMPTY, "⬆": EMPTY, "↗": EMPTY,
-             "⬅": EMPTY, "⏺": EMPTY, "➡": EMPTY,
-             "↙": EMPTY, "⬇": EMPTY, "↘": EMPTY}
-
-
 def actions(board):               #NOT USED YET
     """
     Returns set of all possible actions (i, j) available on the board.
@@ -66,8 +64,7 @@ def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    # if board is None:
-    current_board = initial_state()
+    current_board = initial_state(board)
     for i in range(3):
         if current_board[i*3] == current_board[i*3+1] == current_board[i*3+2] != EMPTY:
             return True
@@ -87,10 +84,7 @@ def terminal(board):
     """
     if winner(board) is True:
         return True
-    else:
-        for i in board:
-            if i == EMPTY:
-                return False
+    return all(cell != EMPTY for cell in board.values())
 
 
 def utility(board):
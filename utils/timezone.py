@@ -1,29 +1,207 @@
-from datetime import timedelta
-from itertools import groupby
+"""Time zones, and parsing the times people type: "1h30m", "in 2 weeks", "tomorrow 9am", "2026-12-01 18:00".
+An expression is a run of parts, scanned left to right in one pass with a single regex. Parsing doesn't depend on the
+current time, so scans are memoized by the start of the (lowercase) text that could be a time, which leaves out the
+note after it; only applying the parsed expression to `now` is done every time. Times of day and dates are in the
+given time zone, BOT_TZ unless the user set their own."""
+import calendar
+import datetime
+import functools
+import re
+from typing import NamedTuple, Optional, Tuple
+
 import pytz
 
 BOT_TZ = pytz.timezone("Asia/Dubai")
 
-def get_timedelta(arg: str) -> timedelta:
-    """Converts a string of time for eg: 5h -> into an equivalent timedelta object."""
-    arg = arg.lower()
-    amts, units = [], []
-
-    unit_mapping = {
-        "h": "hours", "hour": "hours", 
-        "m": "minutes", "minute": "minutes",
-        "s": "seconds", "second": "seconds",
-        "d": "days", "day": "days",
-        "month": "months",     # m already assigned for minutes
-        "year": "years"
-    }
-    
-    grouped = groupby(arg, key=str.isdigit)
-    
-    for key, group in grouped:
-        if key:   # means isdigit returned true, meaning they are numbers
-            amts.append(int("".join(group)))
+UNITS = {
+    "s": "seconds", "sec": "seconds", "secs": "seconds", "second": "seconds", "seconds": "seconds",
+    "m": "minutes", "min": "minutes", "mins": "minutes", "minute": "minutes", "minutes": "minutes",
+    "h": "hours", "hr": "hours", "hrs": "hours", "hour": "hours", "hours": "hours",
+    "d": "days", "day": "days", "days": "days",
+    "w": "weeks", "wk": "weeks", "wks": "weeks", "week": "weeks", "weeks": "weeks",
+    "mo": "months", "month": "months", "months": "months",
+    "y": "years", "yr": "years", "yrs": "years", "year": "years", "years": "years",
+}
+WEEKDAYS = {name.lower(): i for i, name in enumerate(calendar.day_name)}    # full names only; "sun" and "sat" are words too
+DAY_WORDS = {"today": 0, "tonight": 0, "tomorrow": 1, "tmrw": 1}
+CLOCK_WORDS = {"noon": (12, 0), "midnight": (0, 0)}
+TONIGHT = (20, 0)    # "tonight" without a time
+
+_unit = "|".join(sorted(UNITS, key=len, reverse=True))    # longest first, so "mo" isn't read as "m"
+_word = "|".join(sorted({*WEEKDAYS, *DAY_WORDS, *CLOCK_WORDS}, key=len, reverse=True))
+PART = re.compile(rf"""
+    \s*(?:(?:in|at|on|and|,)\s+|,\s*)?    # filler between parts
+    (?:
+        (?P<date>\d{{4}})-(?P<month>\d{{1,2}})-(?P<day>\d{{1,2}})
+      | (?P<hour>\d{{1,2}})(?::(?P<minute>\d{{2}}))?\s*(?P<meridiem>am|pm)
+      | (?P<hour24>\d{{1,2}}):(?P<minute24>\d{{2}})
+      | (?P<amount>\d+)\s*(?P<unit>{_unit})
+      | (?P<word>{_word})
+    )
+    (?![a-z])    # so that "1h30m" is two parts, but "5 minutes" isn't "5 m" and "inutes"
+""", re.VERBOSE)
+
+
+class Expression(NamedTuple):
+    """A parsed time expression; apply it to a time with `resolve`."""
+    delta: datetime.timedelta
+    months: int = 0    # months and years can't be timedeltas, they're added on the calendar
+    date: Optional[datetime.date] = None
+    days_ahead: Optional[int] = None    # today, tomorrow
+    weekday: Optional[int] = None
+    clock: Optional[Tuple[int, int]] = None    # hour, minute
+
+    @property
+    def is_relative(self) -> bool:
+        return self.date is None and self.days_ahead is None and self.weekday is None and self.clock is None
+
+    def resolve(self, now: datetime.datetime, tz: datetime.tzinfo = BOT_TZ) -> datetime.datetime:
+        """Returns the aware datetime the expression means, at `now` (aware) for someone in `tz`."""
+        local = now.astimezone(tz)
+        if not self.is_relative:
+            if self.date is not None:
+                day = self.date
+            elif self.weekday is not None:
+                day = local.date() + datetime.timedelta(days=(self.weekday - local.weekday()) % 7)
+            else:
+                day = local.date() + datetime.timedelta(days=self.days_ahead or 0)
+            clock = datetime.time(*self.clock) if self.clock is not None else datetime.time(local.hour, local.minute)
+            moment = localize(tz, datetime.datetime.combine(day, clock))
+            if moment <= now and self.date is None and self.days_ahead is None:
+                # a time of day or a weekday that has already passed means the next one
+                day += datetime.timedelta(days=7 if self.weekday is not None else 1)
+                moment = localize(tz, datetime.datetime.combine(day, clock))
+            local = moment
+        if self.months:
+            local = add_months(local, self.months, tz)
+        # elapsed time, whatever the clocks do in between
+        return (local.astimezone(datetime.timezone.utc) + self.delta).astimezone(tz)
+
+
+def localize(tz: datetime.tzinfo, naive: datetime.datetime) -> datetime.datetime:
+    return tz.localize(naive) if hasattr(tz, "localize") else naive.replace(tzinfo=tz)
+
+
+def add_months(moment: datetime.datetime, months: int, tz: datetime.tzinfo) -> datetime.datetime:
+    """Moves a local time by whole months, clamping the day: a month after 31 January is the end of February."""
+    month = moment.month - 1 + months
+    year, month = moment.year + month // 12, month % 12 + 1
+    day = min(moment.day, calendar.monthrange(year, month)[1])
+    return localize(tz, moment.replace(tzinfo=None, year=year, month=month, day=day))
+
+
+DAY_FIELDS = {"date", "days_ahead", "weekday"}    # an expression has at most one of these
+_head_word = "|".join(sorted({"in", "at", "on", "and", "am", "pm", *UNITS, *WEEKDAYS, *DAY_WORDS, *CLOCK_WORDS}, key=len, reverse=True))
+HEAD = re.compile(rf"(?:\W*(?:\d\w*|(?:{_head_word})(?!\w)))*")    # leading words that are numbers or time words
+
+
+def read_part(match: re.Match) -> Tuple[str, object]:
+    """Returns the field of an Expression a part sets, and its value. Raises ValueError if the value is out of range."""
+    if match["date"]:
+        return "date", datetime.date(int(match["date"]), int(match["month"]), int(match["day"]))
+    if match["meridiem"] or match["hour24"]:
+        if match["meridiem"]:
+            hour, minute = int(match["hour"]), int(match["minute"] or 0)
+            if not 1 <= hour <= 12:
+                raise ValueError(f"{hour}{match['meridiem']}")
+            hour = hour % 12 + (12 if match["meridiem"] == "pm" else 0)
         else:
-            units.append(unit_mapping["".join(group)])     # convert h -> hours, m -> minutes and so on
-    
-    return timedelta(**dict(zip(units, amts)))
+            hour, minute = int(match["hour24"]), int(match["minute24"])
+        if hour > 23 or minute > 59:
+            raise ValueError(f"{hour}:{minute:02d}")
+        return "clock", (hour, minute)
+    if match["unit"]:
+        unit, amount = UNITS[match["unit"]], int(match["amount"])
+        if unit in ("months", "years"):
+            return "months", amount * (12 if unit == "years" else 1)
+        try:
+            return "delta", datetime.timedelta(**{unit: amount})
+        except OverflowError:
+            raise ValueError(f"{amount} {unit}") from None
+    word = match["word"]
+    if word in DAY_WORDS:
+        return "days_ahead", DAY_WORDS[word]
+    if word in WEEKDAYS:
+        return "weekday", WEEKDAYS[word]
+    return "clock", CLOCK_WORDS[word]
+
+
+@functools.lru_cache(maxsize=2048)
+def scan_expression(text: str) -> Tuple[int, Optional[Expression]]:
+    """Reads the time expression at the start of (lowercase) `text`, in one pass. Returns how long it is, up to a word
+    boundary (a space or punctuation, so "tomorrow 9am, call mom" ends at the comma), and the expression, or None if
+    those parts don't make one ("9am 10am"). Memoized by `text`, so callers pass only the part of a text that could be
+    a time (see `head_length`), not the note after it."""
+    fields = {"delta": datetime.timedelta(), "months": 0}
+    valid, tonight = True, False
+    pos = length = 0
+    expression = None
+    while True:
+        match = PART.match(text, pos)
+        if match is None:
+            return length, expression
+        pos = match.end()
+        if valid:
+            try:
+                field, value = read_part(match)
+                if field in ("delta", "months"):
+                    fields[field] += value
+                elif field in fields or (field in DAY_FIELDS and fields.keys() & DAY_FIELDS):
+                    raise ValueError(f"two {field.replace('_', ' ')} parts")
+                else:
+                    fields[field] = value
+            except (ValueError, OverflowError):
+                valid = False
+            tonight = tonight or match["word"] == "tonight"
+        if pos == len(text) or not (text[pos].isalnum() or text[pos] == "_"):
+            length, expression = pos, (make_expression(fields, tonight) if valid else None)
+
+
+def make_expression(fields: dict, tonight: bool) -> Optional[Expression]:
+    expression = Expression(**fields)
+    if expression.clock is None and tonight:
+        expression = expression._replace(clock=TONIGHT)
+    if expression.days_ahead == 0 and expression.clock is None and not expression.delta and not expression.months:
+        return None    # "today" alone is now, and more likely the start of a note than a time
+    return expression
+
+
+def head_length(text: str) -> int:
+    """How much of the start of (lowercase) `text` could be a time expression: the leading words that are numbers or
+    time words, so "tomorrow 9am buy milk" gives "tomorrow 9am". Cheaper than a scan, and leaves the note out of the
+    key `scan_expression` is memoized by."""
+    return HEAD.match(text).end()
+
+
+def compile_expression(text: str) -> Optional[Expression]:
+    """Parses a whole (lowercase, stripped) expression, or returns None if it isn't one."""
+    length, expression = scan_expression(text)
+    return expression if length == len(text) else None
+
+
+def parse_time(text: str, *, now: datetime.datetime = None, tz: datetime.tzinfo = BOT_TZ) -> datetime.datetime:
+    """Returns the aware datetime an expression means. Raises ValueError if it isn't one."""
+    expression = compile_expression(text.lower().strip())
+    moment = resolve(expression, now, tz) if expression is not None else None
+    if moment is None:
+        raise ValueError(f"I don't understand the time `{text}`. Try something like `1h30m`, `tomorrow 9am` or `2026-12-01 18:00`.")
+    return moment
+
+
+def resolve(expression: Expression, now: Optional[datetime.datetime], tz: datetime.tzinfo) -> Optional[datetime.datetime]:
+    """Applies an expression to `now`, or returns None if the time it means is past the calendar (year 9999)."""
+    try:
+        return expression.resolve(now or datetime.datetime.now(datetime.timezone.utc), tz)
+    except (OverflowError, ValueError):
+        return None
+
+
+def split_time(text: str, *, now: datetime.datetime = None, tz: datetime.tzinfo = BOT_TZ) -> Tuple[Optional[datetime.datetime], str]:
+    """Reads a time expression off the start of `text`: "tomorrow 9am buy milk" is (tomorrow at 9, "buy milk").
+    Returns (None, text) if `text` doesn't start with one."""
+    lower = text.lower()
+    length, expression = scan_expression(lower[:head_length(lower)])
+    moment = resolve(expression, now, tz) if expression is not None else None
+    if moment is None:
+        return None, text
+    return moment, text[length:].lstrip(" ,:;-").strip()